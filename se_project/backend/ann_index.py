@@ -0,0 +1,278 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from embedding_matrix import EmbeddingMatrix
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+FORMAT_VERSION = 1
+
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_MIN_TRAIN = int(os.getenv("ANN_MIN_TRAIN", "1024"))
+
+
+class IVFIndex:
+    """
+    EmbeddingMatrix 위에 얹는 IVF(inverted file) 근사 최근접 이웃 색인.
+
+    - 정규화된 행들을 구면 k-means로 nlist개 클러스터에 나누고, 검색할 때는 질의와 가장 가까운
+      nprobe개 클러스터의 행만 내적합니다.
+    - 행은 EmbeddingMatrix가 그대로 보관하고 색인은 행 번호와 클러스터 배정만 가집니다.
+      행렬에 새 행이 생기면 sync()가 가장 가까운 클러스터에 붙임 (증분 추가)
+    - 학습 당시보다 행 수가 retrain_factor배 이상 늘면 클러스터를 백그라운드 스레드에서 다시 학습
+      (검색은 학습이 끝날 때까지 기존 클러스터로 계속 진행)
+    - 행 수가 min_train보다 적으면 학습하지 않고 전체를 내적 (이 크기에서는 그쪽이 빠름)
+    - allowed로 후보를 좁히면 허용 비율만큼 nprobe를 늘리고, 그래도 탐색할 행이 허용 행보다
+      많아지면 허용 행만 정확히 내적 (제한이 강할 때 recall이 떨어지지 않도록)
+    - 추가/저장/불러오기와 검색의 후보 선택은 잠금 안에서 (실행기 스레드와 save_cache가 동시에 호출).
+      k-means와 후보 행들의 내적은 잠금 밖에서 계산
+    """
+
+    def __init__(
+        self,
+        matrix: EmbeddingMatrix,
+        nprobe: int = ANN_NPROBE,
+        min_train: int = ANN_MIN_TRAIN,
+        retrain_factor: float = 4.0,
+        seed: int = 0,
+    ):
+        self.source = matrix
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_factor = retrain_factor
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self.assignments = np.zeros(0, dtype=np.int32)  # 행 번호 → 클러스터
+        self._lists: List[np.ndarray] = []  # 클러스터 → 행 번호들 (용량 두 배씩 증가)
+        self._list_sizes = np.zeros(0, dtype=np.int64)
+        self.dirty = False
+        self._lock = threading.RLock()
+        self._trainer: Optional[threading.Thread] = None
+        self._trainer_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.assignments)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    # ---- 학습/추가 ----
+
+    def train(self, iterations: int = 10):
+        """현재 행 전체(많으면 표본)로 구면 k-means를 돌려 클러스터를 새로 만듭니다 (동기)."""
+        size = len(self.source)
+        if size < self.min_train:
+            with self._lock:
+                self.centroids = None
+                self.assignments = np.zeros(0, dtype=np.int32)
+            return
+        # 학습과 행 배정은 잠금 밖에서 (그동안 검색은 기존 클러스터로 진행)
+        centroids = self._fit(size, iterations)
+        labels = np.argmax(self.source.dot(centroids.T, np.arange(size)), axis=1).astype(np.int32)
+
+        with self._lock:
+            nlist = len(centroids)
+            self.centroids = centroids
+            self.trained_size = size
+            self.assignments = np.zeros(0, dtype=np.int32)
+            self._lists = [np.zeros(0, dtype=np.int64) for _ in range(nlist)]
+            self._list_sizes = np.zeros(nlist, dtype=np.int64)
+            self._assign(0, size, labels)
+            # 학습하는 동안 추가된 행
+            self._assign(size, len(self.source))
+            self.dirty = True
+        logger.info(f"ANN 색인 학습: {size}개 행, {nlist}개 클러스터")
+
+    def _fit(self, size: int, iterations: int) -> np.ndarray:
+        nlist = max(16, int(4 * np.sqrt(size)))
+        rng = np.random.default_rng(self.seed)
+        sample = self.source.take(rng.choice(size, min(size, nlist * 16), replace=False))
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(labels, kind="stable")
+            clusters, first = np.unique(labels[order], return_index=True)
+            sums = np.add.reduceat(sample[order], first, axis=0)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # 빈 클러스터는 이전 중심을 유지
+            centroids[clusters] = sums / np.where(norms > 0, norms, 1)
+        return centroids.astype(np.float32)
+
+    def train_in_background(self):
+        """train()을 별도 스레드에서 실행 (이미 학습 중이면 아무것도 안 함)"""
+        with self._trainer_lock:
+            if self._trainer is not None and self._trainer.is_alive():
+                return
+            self._trainer = threading.Thread(target=self.train, name="ann-train", daemon=True)
+            self._trainer.start()
+
+    def sync(self, train_inline: bool = False):
+        """
+        행렬에 새로 추가된 행을 가장 가까운 클러스터에 붙입니다. (재)학습이 필요하면
+        백그라운드 스레드에서 시작하고 (train_inline=True면 끝날 때까지 기다림) 바로 돌아옵니다.
+        """
+        with self._lock:
+            size = len(self.source)
+            if self.trained:
+                needs_training = size >= self.trained_size * self.retrain_factor
+                if size > len(self.assignments):
+                    self._assign(len(self.assignments), size)
+                    self.dirty = True
+            else:
+                needs_training = size >= self.min_train
+        if needs_training:
+            if train_inline:
+                self.train()
+            else:
+                self.train_in_background()
+
+    def _assign(self, start: int, end: int, labels: Optional[np.ndarray] = None):
+        if end <= start:
+            return
+        if labels is None:
+            labels = np.argmax(self.source.dot(self.centroids.T, np.arange(start, end)), axis=1).astype(np.int32)
+        self.assignments = np.concatenate([self.assignments, labels])
+
+        rows = np.arange(start, end, dtype=np.int64)
+        order = np.argsort(labels, kind="stable")
+        clusters, first = np.unique(labels[order], return_index=True)
+        for cluster, group in zip(clusters, np.split(rows[order], first[1:])):
+            size = self._list_sizes[cluster]
+            needed = size + len(group)
+            if needed > len(self._lists[cluster]):
+                grown = np.zeros(max(16, needed, len(self._lists[cluster]) * 2), dtype=np.int64)
+                grown[:size] = self._lists[cluster][:size]
+                self._lists[cluster] = grown
+            self._lists[cluster][size:needed] = group
+            self._list_sizes[cluster] = needed
+
+    # ---- 검색 ----
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: Optional[int] = None,
+        threshold: float = -1.0,
+        allowed: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        정규화된 질의 벡터와 내적(코사인 유사도)이 threshold 이상인 행을 높은 순으로 최대 k개.
+        allowed(행 번호별 bool)를 주면 그 행들만 후보로 씁니다. allowed보다 뒤에 추가된 행은 제외
+        """
+        with self._lock:
+            self.sync()
+            size = len(self.source)
+            if not size:
+                return []
+            if allowed is not None and len(allowed) < size:
+                allowed = np.concatenate([allowed, np.zeros(size - len(allowed), dtype=bool)])
+            allowed_rows = None if allowed is None else np.flatnonzero(allowed[:size])
+
+            candidates = None
+            if self.trained:
+                nlist = len(self.centroids)
+                nprobe = min(self.nprobe, nlist)
+                if allowed_rows is not None:
+                    # 허용 행이 적을수록 더 많은 클러스터를 봐야 같은 수의 후보가 나옴
+                    nprobe = min(nlist, int(np.ceil(nprobe * size / max(len(allowed_rows), 1))))
+                # 탐색할 행 수(추정)가 허용 행 수보다 많으면 허용 행만 정확히 내적하는 편이 싸고 정확
+                if allowed_rows is None or len(allowed_rows) > nprobe * size / nlist:
+                    probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+                    # concatenate가 새 배열을 만들므로 잠금을 풀어도 이후 추가/재학습과 섞이지 않음
+                    candidates = np.concatenate([self._lists[c][: self._list_sizes[c]] for c in probe])
+                    if allowed is not None:
+                        candidates = candidates[allowed[candidates]]
+            if candidates is None:
+                candidates = np.arange(size) if allowed_rows is None else allowed_rows
+        scores = self.source.dot(query, candidates)
+
+        keep = scores >= threshold
+        candidates, scores = candidates[keep], scores[keep]
+        if k is not None and len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+    # ---- 저장/불러오기 ----
+
+    def save(self, path: Path, model: str = ""):
+        """클러스터 중심과 키별 배정을 path에 원자적으로 저장 (학습 전이면 저장하지 않음)"""
+        with self._lock:
+            self.sync()
+            if not self.trained or not self.dirty:
+                return
+            keys = self.source.keys[: len(self.assignments)]
+            meta = {"format": FORMAT_VERSION, "model": model, "dim": self.source.dim, "trained_size": self.trained_size}
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    meta=np.array(json.dumps(meta)),
+                    centroids=self.centroids,
+                    keys=np.array(keys, dtype=str),
+                    assignments=self.assignments,
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            self.dirty = False
+
+    def load(self, path: Path, model: str = "") -> bool:
+        """저장된 색인을 불러와 현재 행렬에 맞춥니다. 형식/모델/차원이 다르면 False"""
+        if not path.exists():
+            return False
+        try:
+            with np.load(path) as saved:
+                meta = json.loads(str(saved["meta"]))
+                if (
+                    meta.get("format") != FORMAT_VERSION
+                    or meta.get("dim") != self.source.dim
+                    or (model and meta.get("model") and meta["model"] != model)
+                ):
+                    logger.warning("ANN 색인 형식/모델이 달라 새로 만듭니다")
+                    return False
+                centroids = saved["centroids"].astype(np.float32)
+                keys = saved["keys"].tolist()
+                assignments = saved["assignments"]
+        except Exception as e:
+            logger.error(f"ANN 색인 로드 오류: {e}")
+            return False
+
+        # 행 순서가 저장 당시와 달라도 되도록 키로 배정을 옮기고, 없는 행은 새로 배정
+        with self._lock:
+            saved_labels = dict(zip(keys, assignments.tolist()))
+            size = len(self.source)
+            labels = np.fromiter((saved_labels.get(key, -1) for key in self.source.keys[:size]), dtype=np.int32, count=size)
+            missing = labels < 0
+            if missing.any():
+                labels[missing] = np.argmax(self.source.dot(centroids.T, np.flatnonzero(missing)), axis=1)
+
+            self.centroids = centroids
+            self.trained_size = int(meta.get("trained_size", len(keys)))
+            self.assignments = np.zeros(0, dtype=np.int32)
+            self._lists = [np.zeros(0, dtype=np.int64) for _ in range(len(centroids))]
+            self._list_sizes = np.zeros(len(centroids), dtype=np.int64)
+            self._assign(0, size, labels)
+            self.dirty = bool(missing.any())
+            logger.info(f"ANN 색인 로드: {size}개 행, {len(centroids)}개 클러스터")
+            return True
+
+    def status(self):
+        return {
+            "rows": len(self.assignments),
+            "trained": self.trained,
+            "clusters": 0 if self.centroids is None else len(self.centroids),
+            "nprobe": self.nprobe,
+        }
@@ -1,4 +1,7 @@
+from fastapi import Request
+
 import db
+from upstream import Upstream, upstreams
 
 def get_db():
     database = db.SessionLocal()
@@ -6,3 +9,13 @@ def get_db():
         yield database
     finally:
         database.close()
+
+def _get_upstream(request: Request, name: str) -> Upstream:
+    pools = getattr(request.app.state, "upstreams", upstreams)
+    return pools[name]
+
+def get_vlm_upstream(request: Request) -> Upstream:
+    return _get_upstream(request, "vlm")
+
+def get_llm_upstream(request: Request) -> Upstream:
+    return _get_upstream(request, "llm")
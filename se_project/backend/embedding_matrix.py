@@ -0,0 +1,213 @@
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 행 저장 정밀도. float16은 절반, int8은 행마다 scale(float32) 하나를 더해 약 1/4 크기
+PRECISIONS = ("float32", "float16", "int8")
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "float32")
+# float16/int8 행을 float32로 풀어 계산하는 단위 (전체 float32 사본을 만들지 않음)
+SCORE_BLOCK = 8192
+
+
+def quantize(vectors: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    float32 행들을 저장 형식으로 바꿉니다. int8은 행마다 scale = max|x| / 127로 나눠 반올림하고
+    (값, scale)을 돌려줍니다. 다른 정밀도는 scale이 None
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if precision == "float32":
+        return vectors, None
+    if precision == "float16":
+        return vectors.astype(np.float16), None
+    if precision == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127 if vectors.size else np.zeros(len(vectors), dtype=np.float32)
+        safe = np.where(scales > 0, scales, 1)
+        return np.rint(vectors / safe[:, None]).astype(np.int8), scales.astype(np.float32)
+    raise ValueError(f"지원하지 않는 임베딩 정밀도: {precision} (가능: {', '.join(PRECISIONS)})")
+
+
+def dequantize(values: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    rows = values.astype(np.float32)
+    if scales is not None:
+        rows *= scales[:, None]
+    return rows
+
+
+class EmbeddingMatrix:
+    """
+    재료 임베딩을 L2 정규화한 행렬로 보관합니다.
+    행끼리의 내적이 곧 코사인 유사도라서, 여러 재료 쌍의 유사도를 행렬곱 한 번으로 구할 수 있습니다.
+    행은 추가만 되고 용량은 두 배씩 늘립니다.
+
+    precision이 float16/int8이면 행을 그 형식으로 저장하고, dot()은 블록 단위로 풀어 계산합니다
+    (int8은 정수 값으로 곱한 뒤 행별 scale만 곱함). rows()/take()는 항상 float32를 돌려줍니다.
+
+    쓰기(add_array)는 호출하는 쪽이 한 번에 하나씩만 하고(IngredientSimilarityService._write_lock),
+    읽기는 잠금 없이 실행기 스레드에서 동시에 돌 수 있습니다. 그래서 (data, scales, 행 수)를 한 튜플로
+    만들어 한 번에 교체하고, 읽는 쪽은 그 튜플 하나를 잡아 씁니다. 새 행을 다 쓰고 튜플을 교체한 뒤에
+    index를 갱신하므로 index에서 찾은 행 번호는 항상 그 뒤에 잡은 튜플 안에 있습니다.
+    """
+
+    def __init__(self, dim: Optional[int] = None, precision: str = EMBEDDING_PRECISION):
+        if precision not in PRECISIONS:
+            raise ValueError(f"지원하지 않는 임베딩 정밀도: {precision} (가능: {', '.join(PRECISIONS)})")
+        self.dim = dim
+        self.precision = precision
+        self.index: Dict[str, int] = {}
+        self.keys: List[str] = []  # 행 번호 → 키
+        scales = np.zeros(0, dtype=np.float32) if precision == "int8" else None
+        self._state: Tuple[np.ndarray, Optional[np.ndarray], int] = (np.zeros((0, dim or 0), dtype=precision), scales, 0)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """현재 저장된 행들. float32면 복사 없는 뷰, 아니면 float32로 푼 사본"""
+        data, scales, size = self._state
+        if self.precision == "float32":
+            return data[:size]
+        return dequantize(data[:size], None if scales is None else scales[:size])
+
+    @property
+    def nbytes(self) -> int:
+        """저장된 행들이 차지하는 바이트 수 (int8은 scale 포함)"""
+        data, scales, size = self._state
+        return data[:size].nbytes + (0 if scales is None else scales[:size].nbytes)
+
+    def add(self, key: str, vector: Sequence[float]) -> Optional[int]:
+        """정규화해서 추가하고 행 번호를 돌려줍니다. 차원이 다르면 추가하지 않고 None"""
+        if key not in self.index:
+            self.add_array([key], np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        return self.index.get(key)
+
+    def add_many(self, items: Iterable):
+        for key, vector in items:
+            self.add(key, vector)
+
+    def add_array(self, keys: List[str], vectors: np.ndarray):
+        """여러 행을 한 번에 정규화해 추가 (시작 시 디스크 캐시 전체를 올릴 때)"""
+        if not keys:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        data, scales, start = self._state
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            data = np.zeros((0, self.dim), dtype=self.precision)
+        if vectors.shape[1] != self.dim:
+            return
+
+        new_keys = [i for i, key in enumerate(keys) if key not in self.index]
+        vectors = vectors[new_keys]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        values, new_scales = quantize(vectors, self.precision)
+
+        # 용량이 남으면 기존 배열의 빈 뒷부분에 씀 (읽는 쪽은 이전 행 수까지만 봄)
+        end = start + len(new_keys)
+        if end > data.shape[0]:
+            capacity = max(16, end, data.shape[0] * 2)
+            grown = np.zeros((capacity, self.dim), dtype=self.precision)
+            grown[:start] = data[:start]
+            data = grown
+            if scales is not None:
+                grown_scales = np.zeros(capacity, dtype=np.float32)
+                grown_scales[:start] = scales[:start]
+                scales = grown_scales
+        data[start:end] = values
+        if scales is not None:
+            scales[start:end] = new_scales
+        self._state = (data, scales, end)
+        for offset, i in enumerate(new_keys):
+            self.index[keys[i]] = start + offset
+            self.keys.append(keys[i])
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """행 번호들의 float32 행"""
+        data, scales, _ = self._state
+        return dequantize(data[positions], None if scales is None else scales[positions])
+
+    def dot(self, other: np.ndarray, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        저장된 행(또는 positions 행)들과 other의 내적.
+        other가 (dim,)이면 (n,), (dim, m)이면 (n, m) 모양의 float32
+        """
+        other = np.asarray(other, dtype=np.float32)
+        data, scales, size = self._state
+        if self.precision == "float32":
+            data = data[:size]
+            return (data if positions is None else data[positions]) @ other
+
+        count = size if positions is None else len(positions)
+        out = np.empty((count,) + other.shape[1:], dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK):
+            end = min(count, start + SCORE_BLOCK)
+            rows = slice(start, end) if positions is None else positions[start:end]
+            out[start:end] = data[rows].astype(np.float32) @ other
+            if scales is not None:
+                block_scales = scales[rows]
+                out[start:end] *= block_scales if other.ndim == 1 else block_scales[:, None]
+        return out
+
+    def rows(self, keys: List[str]) -> np.ndarray:
+        """keys 순서대로 정규화된 float32 행들. 없는 키는 0 벡터(모든 유사도 0)"""
+        result = np.zeros((len(keys), self.dim or 1), dtype=np.float32)
+        if not keys or self.dim is None:
+            return result
+        positions = np.fromiter((self.index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+        found = positions >= 0
+        result[found] = self.take(positions[found])
+        return result
+
+
+def compare_precisions(
+    vectors: np.ndarray,
+    k: int = 10,
+    queries: int = 200,
+    precisions: Sequence[str] = PRECISIONS,
+    seed: int = 0,
+) -> List[Dict]:
+    """
+    같은 임베딩을 정밀도별 EmbeddingMatrix에 넣고 메모리, 전체 검색 시간, float32 기준 recall@k(recall)를 잽니다.
+    질의는 행 중에서 뽑고, 자기 자신은 정답/결과 양쪽에서 뺍니다.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    keys = [str(i) for i in range(len(vectors))]
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(vectors), min(queries, len(vectors)), replace=False)
+    k = min(k, len(vectors) - 1)
+
+    def top_k(matrix: EmbeddingMatrix) -> Tuple[np.ndarray, float]:
+        query_rows = matrix.take(picked)
+        started = time.perf_counter()
+        scores = matrix.dot(query_rows.T)  # (행 수, 질의 수)
+        scores[picked, np.arange(len(picked))] = -np.inf
+        found = np.argpartition(-scores, k - 1, axis=0)[:k].T
+        return found, time.perf_counter() - started
+
+    reference = EmbeddingMatrix(precision="float32")
+    reference.add_array(keys, vectors)
+    expected, _ = top_k(reference)
+
+    results = []
+    for precision in precisions:
+        matrix = reference if precision == "float32" else EmbeddingMatrix(precision=precision)
+        if matrix is not reference:
+            matrix.add_array(keys, vectors)
+        found, seconds = top_k(matrix)
+        hits = sum(len(set(a) & set(b)) for a, b in zip(found.tolist(), expected.tolist()))
+        results.append({
+            "precision": precision,
+            "rows": len(matrix),
+            "bytes": matrix.nbytes,
+            "bytes_per_vector": matrix.nbytes / max(1, len(matrix)),
+            "query_ms": seconds / len(picked) * 1000,
+            "k": k,
+            "recall": hits / (len(picked) * k),
+        })
+    return results
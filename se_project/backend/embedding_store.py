@@ -0,0 +1,409 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embedding_matrix import EMBEDDING_PRECISION, PRECISIONS, dequantize, quantize
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+FORMAT_VERSION = 1
+# 정밀도별 행 파일 확장자
+VECTOR_SUFFIXES = {"float32": "f32", "float16": "f16", "int8": "q8"}
+
+
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path.parent)
+
+
+class EmbeddingStore:
+    """
+    재료 임베딩 디스크 캐시 (행 배열 + 키 목록, 추가 전용).
+
+    디렉터리 구성
+    - meta.json: {"format", "dim", "dtype", "model", "generation"} (항상 원자적으로 교체)
+    - vectors-<generation>.<f32|f16|q8>: dtype 형식의 행들을 이어 붙인 파일 (시작 시 memmap으로 매핑).
+      int8(q8)은 행마다 float32 scale 다음에 int8 값 dim개 (embedding_matrix.quantize 참고)
+    - keys-<generation>.jsonl: 행 순서대로 한 줄에 키 하나 (JSON 문자열)
+
+    조회 결과는 항상 float32입니다. 디스크의 dtype이 요청한 dtype과 다르면 열 때 compact()로 변환합니다.
+
+    새 임베딩은 두 파일 끝에 덧붙이기만 하고, fsync는 fsync_every개 또는 fsync_interval초마다
+    모아서 합니다. 중간에 죽어도 시작할 때 키/행 수가 맞는 지점까지 잘라 복구합니다.
+    compact()는 다음 세대 파일을 새로 쓰고 meta.json을 교체하는 방식이라 도중에 죽어도
+    이전 세대가 그대로 남습니다.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        model: str = "",
+        fsync_every: int = 64,
+        fsync_interval: float = 1.0,
+        compact_ratio: float = 0.25,
+        dtype: str = EMBEDDING_PRECISION,
+    ):
+        if dtype not in PRECISIONS:
+            raise ValueError(f"지원하지 않는 임베딩 정밀도: {dtype} (가능: {', '.join(PRECISIONS)})")
+        self.directory = Path(directory)
+        self.model = model
+        self.dtype = dtype
+        self._file_dtype = dtype  # 현재 세대 파일의 dtype
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_ratio = compact_ratio
+
+        self.dim: Optional[int] = None
+        self.generation = 0
+        self.index: Dict[str, int] = {}
+        self._rows = 0  # 파일에 있는 행 수 (중복 키 포함)
+        self._mapped: Optional[np.ndarray] = None
+        self._pending: List[np.ndarray] = []
+        self._vectors_file = None
+        self._keys_file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.RLock()
+
+        self.open()
+
+    # ---- 파일 경로 ----
+
+    @property
+    def meta_path(self) -> Path:
+        return self.directory / "meta.json"
+
+    def _vectors_path(self, generation: int, dtype: Optional[str] = None) -> Path:
+        return self.directory / f"vectors-{generation}.{VECTOR_SUFFIXES[dtype or self._file_dtype]}"
+
+    def _keys_path(self, generation: int) -> Path:
+        return self.directory / f"keys-{generation}.jsonl"
+
+    # ---- 열기/복구 ----
+
+    def open(self):
+        with self._lock:
+            self._close_files()
+            self.index = {}
+            self._rows = 0
+            self._mapped = None
+            self._pending = []
+            self.dim = None
+            self._file_dtype = self.dtype
+            # 새로 시작할 때는 남아 있는 어떤 파일과도 겹치지 않는 세대 번호를 사용
+            self.generation = self._unused_generation()
+
+            if not self.meta_path.exists():
+                return
+
+            try:
+                meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.error(f"임베딩 캐시 메타 파일 손상, 새로 시작: {e}")
+                return
+
+            if meta.get("format") != FORMAT_VERSION or meta.get("dtype") not in PRECISIONS:
+                logger.warning("임베딩 캐시 형식이 달라 새로 시작합니다")
+                return
+            if self.model and meta.get("model") and meta["model"] != self.model:
+                logger.warning(f"임베딩 모델이 바뀌어 캐시를 새로 시작합니다 ({meta['model']} → {self.model})")
+                return
+
+            self.dim = int(meta["dim"])
+            self.generation = int(meta.get("generation", 0))
+            self._file_dtype = meta["dtype"]
+            self._recover()
+
+            garbage = self._rows - len(self.index)
+            if self._file_dtype != self.dtype:
+                logger.info(f"임베딩 캐시 정밀도 변환: {self._file_dtype} → {self.dtype}")
+                self.compact()
+            elif self._rows and garbage / self._rows > self.compact_ratio:
+                self.compact()
+
+    def _unused_generation(self) -> int:
+        generations = [-1]
+        if self.directory.exists():
+            for path in self.directory.iterdir():
+                stem, _, number = path.name.split(".")[0].partition("-")
+                if stem in ("vectors", "keys") and number.isdigit():
+                    generations.append(int(number))
+        return max(generations) + 1
+
+    def _remove_stale_generations(self):
+        current = {self._vectors_path(self.generation).name, self._keys_path(self.generation).name}
+        for path in self.directory.iterdir():
+            if path.name.startswith(("vectors-", "keys-")) and path.name not in current:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _recover(self):
+        keys_path = self._keys_path(self.generation)
+        vectors_path = self._vectors_path(self.generation)
+        row_bytes = self._record_dtype().itemsize
+
+        keys: List[str] = []
+        line_ends: List[int] = []
+        if keys_path.exists():
+            offset = 0
+            for line in keys_path.read_bytes().split(b"\n")[:-1]:  # 마지막 조각은 줄바꿈이 없는 미완성 줄
+                try:
+                    keys.append(json.loads(line.decode("utf-8")))
+                except ValueError:
+                    break
+                offset += len(line) + 1
+                line_ends.append(offset)
+
+        vector_rows = vectors_path.stat().st_size // row_bytes if vectors_path.exists() else 0
+        rows = min(len(keys), vector_rows)
+        key_bytes = line_ends[rows - 1] if rows else 0
+
+        # 키와 행 수가 맞는 지점 이후(쓰다 만 데이터)는 잘라냄
+        if keys_path.exists() and keys_path.stat().st_size != key_bytes:
+            os.truncate(keys_path, key_bytes)
+        if vectors_path.exists() and vectors_path.stat().st_size != rows * row_bytes:
+            os.truncate(vectors_path, rows * row_bytes)
+
+        for row, key in enumerate(keys[:rows]):
+            self.index[key] = row  # 같은 키가 여러 번 있으면 마지막 행이 유효
+        self._rows = rows
+        self._remap()
+
+    def _remap(self):
+        vectors_path = self._vectors_path(self.generation)
+        if self._rows and vectors_path.exists():
+            self._mapped = np.memmap(vectors_path, dtype=self._record_dtype(), mode="r", shape=(self._rows,))
+        else:
+            self._mapped = None
+        self._pending = []
+
+    def _open_files(self):
+        if self._vectors_file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._vectors_file = open(self._vectors_path(self.generation), "ab")
+            self._keys_file = open(self._keys_path(self.generation), "ab")
+
+    def _close_files(self):
+        for f in (self._vectors_file, self._keys_file):
+            if f is not None:
+                f.close()
+        self._vectors_file = None
+        self._keys_file = None
+
+    def _write_meta(self):
+        meta = {
+            "format": FORMAT_VERSION,
+            "dim": self.dim,
+            "dtype": self._file_dtype,
+            "model": self.model,
+            "generation": self.generation,
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_atomic(self.meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    # ---- 행 형식 ----
+
+    def _record_dtype(self, dtype: Optional[str] = None) -> np.dtype:
+        """파일의 행 하나 형식 (int8은 scale + 값, 나머지는 dim개짜리 배열)"""
+        dtype = dtype or self._file_dtype
+        if dtype == "int8":
+            return np.dtype([("scale", "<f4"), ("values", "i1", (self.dim,))])
+        return np.dtype((np.dtype(dtype).newbyteorder("<"), (self.dim,)))
+
+    def _encode(self, vectors: np.ndarray, dtype: Optional[str] = None) -> np.ndarray:
+        dtype = dtype or self._file_dtype
+        values, scales = quantize(vectors, dtype)
+        if dtype != "int8":
+            return values
+        records = np.empty(len(values), dtype=self._record_dtype(dtype))
+        records["scale"] = scales
+        records["values"] = values
+        return records
+
+    def _decode(self, records: np.ndarray) -> np.ndarray:
+        """파일 형식의 행들 → float32 행들 (float32 파일이면 복사 없음)"""
+        if self._file_dtype == "int8":
+            return dequantize(records["values"], records["scale"])
+        return np.asarray(records, dtype=np.float32)
+
+    # ---- 조회 ----
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        with self._lock:
+            return self._row(self.index[key])
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self.index.get(key)
+            return None if row is None else self._row(row)
+
+    def _row(self, row: int) -> np.ndarray:
+        mapped = 0 if self._mapped is None else self._mapped.shape[0]
+        if row < mapped:
+            return self._decode(self._mapped[row:row + 1])[0]
+        return self._pending[row - mapped]
+
+    def keys(self) -> List[str]:
+        return list(self.index)
+
+    def items(self) -> Iterator[Tuple[str, np.ndarray]]:
+        for key, row in list(self.index.items()):
+            yield key, self._row(row)
+
+    def vectors(self) -> Tuple[List[str], np.ndarray]:
+        """(키 목록, 같은 순서의 행렬). 시작 시 행렬을 한 번에 만들 때 사용"""
+        with self._lock:
+            keys = list(self.index)
+            if not keys:
+                return keys, np.zeros((0, self.dim or 0), dtype=np.float32)
+            rows = np.fromiter(self.index.values(), dtype=np.int64, count=len(keys))
+            parts = []
+            if self._mapped is not None:
+                parts.append(self._decode(self._mapped))
+            if self._pending:
+                parts.append(np.stack(self._pending))
+            data = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            return keys, np.asarray(data[rows], dtype=np.float32)
+
+    # ---- 쓰기 ----
+
+    def put(self, key: str, vector: Sequence[float], replace: bool = False) -> bool:
+        """
+        새 임베딩을 덧붙입니다. 이미 있는 키면 False (replace=True면 새 행을 덧붙이고
+        이전 행은 다음 compact() 때 정리). 차원이 다르면 False
+        """
+        row = np.asarray(vector, dtype=np.float32).ravel()
+        with self._lock:
+            if key in self.index and not replace:
+                return False
+            if self.dim is None:
+                self.dim = row.shape[0]
+                self._write_meta()
+                self._remove_stale_generations()
+            if row.shape[0] != self.dim:
+                return False
+
+            record = self._encode(row[None])
+            self._open_files()
+            self._vectors_file.write(record.tobytes())
+            self._keys_file.write(json.dumps(key, ensure_ascii=False).encode("utf-8") + b"\n")
+
+            self.index[key] = self._rows
+            self._rows += 1
+            # 조회 결과가 매핑 이후와 같도록 저장 형식을 거친 값을 보관
+            self._pending.append(self._decode(record)[0])
+            self._unsynced += 1
+
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.flush()
+            return True
+
+    def put_many(self, items: Iterable[Tuple[str, Sequence[float]]]) -> int:
+        added = 0
+        with self._lock:
+            for key, vector in items:
+                added += self.put(key, vector)
+            self.flush()
+        return added
+
+    def flush(self, fsync: bool = True):
+        """버퍼를 비우고 (기본) fsync합니다. 교체된 행이 많이 쌓였으면 compact()"""
+        with self._lock:
+            self._sync(fsync)
+            if self._rows and (self._rows - len(self.index)) / self._rows > self.compact_ratio:
+                self.compact()
+
+    def _sync(self, fsync: bool = True):
+        # 행 데이터를 먼저 동기화해 키가 행보다 앞서지 않게 함
+        with self._lock:
+            if self._vectors_file is None:
+                return
+            self._vectors_file.flush()
+            if fsync:
+                os.fsync(self._vectors_file.fileno())
+            self._keys_file.flush()
+            if fsync:
+                os.fsync(self._keys_file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+            if self._pending:
+                self._remap()
+
+    def compact(self):
+        """살아 있는 키만 다음 세대 파일(요청한 dtype)로 옮기고 meta.json을 교체합니다."""
+        with self._lock:
+            if self.dim is None:
+                return
+            self._sync()
+            keys, data = self.vectors()
+            next_generation = self.generation + 1
+            vectors_path = self._vectors_path(next_generation, self.dtype)
+            keys_path = self._keys_path(next_generation)
+
+            with open(vectors_path, "wb") as f:
+                f.write(np.ascontiguousarray(self._encode(data, self.dtype)).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(keys_path, "wb") as f:
+                f.write(b"".join(json.dumps(key, ensure_ascii=False).encode("utf-8") + b"\n" for key in keys))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._close_files()
+            self._mapped = None
+            self.generation = next_generation
+            self._file_dtype = self.dtype
+            self._write_meta()  # 이 시점부터 새 세대가 유효
+            self._remove_stale_generations()
+
+            self.index = {key: row for row, key in enumerate(keys)}
+            self._rows = len(keys)
+            self._remap()
+            logger.info(f"임베딩 캐시 정리: {len(keys)}개 항목 (generation {next_generation})")
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._close_files()
+
+    def status(self):
+        return {
+            "path": str(self.directory),
+            "entries": len(self.index),
+            "rows": self._rows,
+            "dim": self.dim,
+            "dtype": self._file_dtype,
+            "generation": self.generation,
+        }
@@ -1,25 +1,41 @@
+from contextlib import asynccontextmanager
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Optional
-import json
-import os
+from typing import List, Dict, Optional, Tuple
+import asyncio
 import sys
 from pathlib import Path
 
 current_dir = Path(__file__).parent
 sys.path.append(str(current_dir))
 
+import metrics
+from ingredient_normalizer import normalizer
+from recipe_catalog import catalog
+from result_cache import canonical_ingredients, enhanced_recommend_cache
+from structured_logging import get_logger
+from upstream import upstreams
+
+logger = get_logger(__name__)
+
 try:
     from ingredient_similarity import IngredientSimilarityService
 except ImportError as e:
-    print(f"⚠️ ingredient_similarity 모듈 import 실패: {e}")
+    logger.warning(f"⚠️ ingredient_similarity 모듈 import 실패: {e}")
     # 기본 클래스 정의 (fallback)
     class IngredientSimilarityService:
         def __init__(self):
             self.similarity_threshold = 0.7
         
-        def enhanced_recipe_matching(self, user_ingredients, recipes):
-            return recipes
+        def enhanced_recipe_matching(self, user_ingredients, recipes, threshold=None, top_k=None, match_index=None):
+            return recipes if top_k is None else recipes[:top_k]
+        
+        async def aenhanced_recipe_matching(self, user_ingredients, recipes, threshold=None, top_k=None, match_index=None):
+            return recipes if top_k is None else recipes[:top_k]
+        
+        @asynccontextmanager
+        async def adeferred_cache_save(self):
+            yield
         
         def test_similarity(self, ing1, ing2):
             return 0.5
@@ -28,11 +44,20 @@ router = APIRouter()
 
 try:
     similarity_service = IngredientSimilarityService()
-    print("✅ 유사도 서비스 초기화 성공")
+    logger.info("✅ 유사도 서비스 초기화 성공")
 except Exception as e:
-    print(f"⚠️ 유사도 서비스 초기화 실패: {e}")
+    logger.warning(f"⚠️ 유사도 서비스 초기화 실패: {e}")
     similarity_service = IngredientSimilarityService()  # fallback
 
+# Ollama 커넥션 풀도 다른 업스트림과 함께 lifespan에서 정리하고 /health에 표시
+if hasattr(similarity_service, 'ollama'):
+    upstreams.setdefault("ollama", similarity_service.ollama)
+
+DIFFICULTY_MAP = {"초급": 1, "중급": 2, "고급": 3}
+MAX_BATCH_SIZE = 1000
+# 요청당 돌려주는 추천 레시피 수
+TOP_RECIPES = 5
+
 class EnhancedRecommendRequest(BaseModel):
     ingredients: List[str]
     max_time: int = 60
@@ -46,6 +71,7 @@ class IngredientMatch(BaseModel):
     match_type: str
 
 class EnhancedRecipe(BaseModel):
+    id: Optional[str] = None
     name: str
     summary: Optional[str] = None
     time: int
@@ -58,28 +84,23 @@ class EnhancedRecipe(BaseModel):
     total_user_ingredients: int
     ingredient_matches: Dict[str, List[List]]
 
+class EnhancedBatchRequest(BaseModel):
+    requests: List[EnhancedRecommendRequest]
+
+class EnhancedBatchResult(BaseModel):
+    index: int
+    recipes: List[EnhancedRecipe] = []
+    error: Optional[str] = None
+
+class EnhancedBatchResponse(BaseModel):
+    results: List[EnhancedBatchResult]
+
 def load_recipes_with_path_fallback():
-    possible_paths = [
-        Path("/app/data/recipes_updated.json"),  # Docker
-        Path("./data/recipes_updated.json"),     # 현재 디렉토리
-        Path("../data/recipes_updated.json"),    # 상위 디렉토리
-        Path("../../data/recipes_updated.json"), # 상위상위 디렉토리
-        Path("../../../data/recipes_updated.json"), # 프로젝트 루트
-        current_dir.parent.parent.parent / "data" / "recipes_updated.json",  # 절대 경로
-    ]
-    
-    for path in possible_paths:
-        if path.exists():
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    recipes = json.load(f)
-                print(f"✅ 레시피 파일 로드: {path} ({len(recipes)}개)")
-                return recipes
-            except Exception as e:
-                print(f"❌ 레시피 파일 로드 실패 {path}: {e}")
-                continue
+    recipes = catalog.get().recipes
+    if recipes:
+        return recipes
     
-    print("❌ 레시피 파일을 찾을 수 없음, 기본 레시피 사용")
+    logger.error("❌ 레시피 파일을 찾을 수 없음, 기본 레시피 사용")
     return get_default_recipes()
 
 def get_default_recipes():
@@ -128,91 +149,199 @@ async def enhanced_recommend(req: EnhancedRecommendRequest):
     if not req.ingredients:
         raise HTTPException(status_code=400, detail="재료 목록이 비어있습니다.")
     
+    async def compute() -> Tuple[List[EnhancedRecipe], bool]:
+        return await compute_enhanced_recommendations(req)
+    
     try:
-        all_recipes = load_recipes_with_path_fallback()
-        
-        print(f"📝 사용자 재료: {req.ingredients}")
-        print(f"🔍 총 {len(all_recipes)}개 레시피에서 검색")
+        # 같은 재료/조건 요청은 캐시 결과를 공유 (유사도 서비스 장애로 기본 매칭을 쓴 결과는 캐시하지 않음)
+        result, degraded = await enhanced_recommend_cache.get_or_compute(
+            request_cache_key(req), compute, version=catalog.get().version, cacheable=lambda value: not value[1]
+        )
+        return result
         
-        filtered_recipes = []
-        for recipe in all_recipes:
-            recipe_time = recipe.get('time', 30)
-            difficulty_map = {"초급": 1, "중급": 2, "고급": 3}
-            recipe_difficulty = difficulty_map.get(recipe.get('difficulty', '중급'), 2)
+    except Exception as e:
+        logger.exception(f"❌ 추천 중 오류: {e}")
+        raise HTTPException(status_code=500, detail=f"레시피 추천 중 오류가 발생했습니다: {str(e)}")
+
+@router.post("/enhanced-recommend/batch", response_model=EnhancedBatchResponse)
+async def enhanced_recommend_batch(batch: EnhancedBatchRequest):
+    """
+    여러 재료 목록을 한 번에 추천합니다. results는 요청과 같은 순서(index)입니다.
+    카탈로그 조회/시간·난이도 필터링은 조건별로 한 번만 하고, 같은 요청은 한 번만 계산합니다.
+    배치 전체의 사용자 재료 임베딩은 매칭 전에 한 번에 받아 두고, 임베딩 캐시 파일은 배치가
+    끝날 때 스레드 풀에서 한 번만 저장합니다.
+    """
+    if len(batch.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"한 번에 최대 {MAX_BATCH_SIZE}개까지 추천할 수 있습니다.")
+    
+    all_recipes = load_recipes_with_path_fallback()
+    version = catalog.get().version
+    constraints = recipe_constraints(all_recipes)
+    filtered_by_constraint: Dict[Tuple[int, int], List[Dict]] = {}
+    recipes_by_key: Dict[Tuple, Optional[List[EnhancedRecipe]]] = {}
+    results: List[EnhancedBatchResult] = []
+    
+    async with similarity_service.adeferred_cache_save():
+        await prefetch_user_ingredients(batch.requests)
+        for index, req in enumerate(batch.requests):
+            if not req.ingredients:
+                results.append(EnhancedBatchResult(index=index, error="재료 목록이 비어있습니다."))
+                continue
             
-            if recipe_time <= req.max_time and recipe_difficulty <= req.difficulty_max:
-                filtered_recipes.append(recipe)
-        
-        print(f"⏰ 시간/난이도 필터링 후: {len(filtered_recipes)}개")
-        
-        if req.use_similarity and hasattr(similarity_service, 'enhanced_recipe_matching'):
-            try:
-                similarity_service.similarity_threshold = req.similarity_threshold
-                enhanced_recipes = similarity_service.enhanced_recipe_matching(
-                    req.ingredients, 
-                    filtered_recipes
-                )
+            key = request_cache_key(req)
+            if key not in recipes_by_key:
+                bounds = (req.max_time, req.difficulty_max)
+                if bounds not in filtered_by_constraint:
+                    filtered_by_constraint[bounds] = filter_recipes(all_recipes, constraints, *bounds)
+                filtered = filtered_by_constraint[bounds]
                 
-                matched_recipes = [r for r in enhanced_recipes if r.get("similarity_score", 0) > 0]
-                print(f"🎯 유사도 기반 매칭: {len(matched_recipes)}개")
+                async def compute(req=req, filtered=filtered) -> Tuple[List[EnhancedRecipe], bool]:
+                    return await compute_enhanced_recommendations(req, filtered)
                 
-            except Exception as e:
-                print(f"⚠️ 유사도 매칭 오류: {e}, 기본 방식 사용")
-                matched_recipes = basic_recipe_matching(req.ingredients, filtered_recipes)
-        else:
-            matched_recipes = basic_recipe_matching(req.ingredients, filtered_recipes)
-        
-        print(f"🎯 최종 매칭된 레시피: {len(matched_recipes)}개")
-        
-        top_recipes = matched_recipes[:5]
-        
-        result = []
-        for recipe in top_recipes:
-            # difficulty를 숫자로 변환
-            difficulty_num = recipe.get('difficulty_num', recipe.get('difficulty', 2))
-            if isinstance(difficulty_num, str):
-                difficulty_map = {"초급": 1, "중급": 2, "고급": 3}
-                difficulty_num = difficulty_map.get(difficulty_num, 2)
+                try:
+                    recipes_by_key[key], degraded = await enhanced_recommend_cache.get_or_compute(
+                        key, compute, version=version, cacheable=lambda value: not value[1]
+                    )
+                except Exception as e:
+                    logger.exception(f"❌ 배치 추천 중 오류 (index {index}): {e}")
+                    recipes_by_key[key] = None
+                # 긴 배치가 이벤트 루프를 독점하지 않도록 요청 사이에 양보
+                await asyncio.sleep(0)
             
-            enhanced_recipe = EnhancedRecipe(
-                name=recipe.get('name', ''),
-                summary=recipe.get('summary', f"{recipe.get('name', '')} - 맛있는 요리"),
-                time=recipe.get('time', 30),
-                difficulty=difficulty_num,
-                ingredients=recipe.get('ingredients', []),
-                steps=recipe.get('steps', ["조리 방법이 준비 중입니다."]),
-                similarity_score=recipe.get('similarity_score', 0.0),
-                match_rate=recipe.get('match_rate', 0.0),
-                matched_ingredients_count=recipe.get('matched_ingredients_count', 0),
-                total_user_ingredients=recipe.get('total_user_ingredients', len(req.ingredients)),
-                ingredient_matches=recipe.get('ingredient_matches', {})
-            )
-            result.append(enhanced_recipe)
-        
-        return result
-        
+            recipes = recipes_by_key[key]
+            if recipes is None:
+                results.append(EnhancedBatchResult(index=index, error="레시피 추천 중 오류가 발생했습니다."))
+            else:
+                results.append(EnhancedBatchResult(index=index, recipes=recipes))
+    
+    logger.info("📦 배치 추천: 요청 %d개, 서로 다른 요청 %d개", len(batch.requests), len(recipes_by_key))
+    return EnhancedBatchResponse(results=results)
+
+async def prefetch_user_ingredients(requests: List[EnhancedRecommendRequest]):
+    """배치에서 유사도 매칭을 쓰는 요청들의 사용자 재료 임베딩을 한 번의 호출로 받아 둠"""
+    texts = list(dict.fromkeys(ing for req in requests if req.use_similarity for ing in req.ingredients))
+    if not texts or not hasattr(similarity_service, 'aget_embeddings'):
+        return
+    try:
+        await similarity_service.aget_embeddings(texts)
     except Exception as e:
-        print(f"❌ 추천 중 오류: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"레시피 추천 중 오류가 발생했습니다: {str(e)}")
+        # 받지 못한 임베딩은 요청별 매칭에서 다시 시도
+        logger.warning(f"⚠️ 배치 재료 임베딩 미리 받기 실패: {e}")
+
+def request_cache_key(req: EnhancedRecommendRequest) -> Tuple:
+    return (
+        canonical_ingredients(req.ingredients),
+        req.max_time,
+        req.difficulty_max,
+        req.use_similarity,
+        req.similarity_threshold,
+    )
+
+def recipe_constraints(recipes: List[Dict]) -> List[Tuple[int, int]]:
+    """레시피별 (조리시간, 난이도 숫자). 배치에서는 카탈로그당 한 번만 계산"""
+    return [
+        (recipe.get('time', 30), DIFFICULTY_MAP.get(recipe.get('difficulty', '중급'), 2))
+        for recipe in recipes
+    ]
+
+def filter_recipes(recipes: List[Dict], constraints: List[Tuple[int, int]], max_time: int, difficulty_max: int) -> List[Dict]:
+    return [
+        recipe for recipe, (recipe_time, recipe_difficulty) in zip(recipes, constraints)
+        if recipe_time <= max_time and recipe_difficulty <= difficulty_max
+    ]
+
+async def compute_enhanced_recommendations(
+    req: EnhancedRecommendRequest,
+    filtered_recipes: Optional[List[Dict]] = None,
+) -> Tuple[List[EnhancedRecipe], bool]:
+    """추천 결과와 기본 매칭으로 대체했는지 여부를 돌려줍니다."""
+    degraded = False
+    logger.debug("📝 사용자 재료: %s", req.ingredients)
+    
+    if filtered_recipes is None:
+        all_recipes = load_recipes_with_path_fallback()
+        logger.debug("🔍 총 %d개 레시피에서 검색", len(all_recipes))
+        filtered_recipes = filter_recipes(all_recipes, recipe_constraints(all_recipes), req.max_time, req.difficulty_max)
+    
+    logger.debug("⏰ 시간/난이도 필터링 후: %d개", len(filtered_recipes))
+    
+    if req.use_similarity and hasattr(similarity_service, 'aenhanced_recipe_matching'):
+        try:
+            # 임계값은 요청별 인자로만 넘김 (공유 서비스의 similarity_threshold는 바꾸지 않음)
+            # 상위 TOP_RECIPES개만 쓰므로 전체 정렬 대신 top-k 선택 (점수 0인 레시피는 아래에서 제외)
+            with metrics.time_stage("similarity_scoring"):
+                enhanced_recipes = await similarity_service.aenhanced_recipe_matching(
+                    req.ingredients, 
+                    filtered_recipes,
+                    threshold=req.similarity_threshold,
+                    top_k=TOP_RECIPES,
+                    # 카탈로그 역색인으로 사용자 재료가 건드리는 레시피만 확인 (기본 레시피면 전체를 훑음)
+                    match_index=catalog.get().match_index,
+                )
+            
+            matched_recipes = [r for r in enhanced_recipes if r.get("similarity_score", 0) > 0]
+            logger.debug("🎯 유사도 기반 매칭: %d개", len(matched_recipes))
+            # Ollama 백오프 중이면 임베딩 없이(직접/동의어 매칭만) 계산한 결과라 캐시하지 않음
+            if hasattr(similarity_service, 'embeddings_available') and not similarity_service.embeddings_available():
+                degraded = True
+            
+        except Exception as e:
+            logger.warning(f"⚠️ 유사도 매칭 오류: {e}, 기본 방식 사용")
+            metrics.count_fallback("similarity_scoring", "basic_matching")
+            degraded = True
+            matched_recipes = basic_recipe_matching(req.ingredients, filtered_recipes)
+    else:
+        matched_recipes = basic_recipe_matching(req.ingredients, filtered_recipes)
+    
+    logger.info("🎯 최종 매칭된 레시피: %d개", len(matched_recipes))
+    
+    top_recipes = matched_recipes[:TOP_RECIPES]
+    
+    result = []
+    for recipe in top_recipes:
+        # difficulty를 숫자로 변환
+        difficulty_num = recipe.get('difficulty_num', recipe.get('difficulty', 2))
+        if isinstance(difficulty_num, str):
+            difficulty_num = DIFFICULTY_MAP.get(difficulty_num, 2)
+        
+        enhanced_recipe = EnhancedRecipe(
+            id=recipe.get('id'),
+            name=recipe.get('name', ''),
+            summary=recipe.get('summary', f"{recipe.get('name', '')} - 맛있는 요리"),
+            time=recipe.get('time', 30),
+            difficulty=difficulty_num,
+            ingredients=recipe.get('ingredients', []),
+            steps=recipe.get('steps', ["조리 방법이 준비 중입니다."]),
+            similarity_score=recipe.get('similarity_score', 0.0),
+            match_rate=recipe.get('match_rate', 0.0),
+            matched_ingredients_count=recipe.get('matched_ingredients_count', 0),
+            total_user_ingredients=recipe.get('total_user_ingredients', len(req.ingredients)),
+            ingredient_matches=recipe.get('ingredient_matches', {})
+        )
+        result.append(enhanced_recipe)
+    
+    return result, degraded
 
 def basic_recipe_matching(user_ingredients: List[str], recipes: List[Dict]) -> List[Dict]:
+    """
+    한쪽 재료 이름이 다른 쪽에 포함되거나("고기" ↔ "돼지고기 200g"), 정규 재료 ID가 겹치면
+    (표기 차이/대체 재료, 카탈로그 레시피는 로드 시 계산한 집합 사용) 일치로 보는 기본 매칭
+    """
     matched_recipes = []
+    snapshot = catalog.get()
+    user_ids = [(user_ing, user_ing.lower(), normalizer.query_ids(user_ing)) for user_ing in user_ingredients]
     
     for recipe in recipes:
-        recipe_ingredients = recipe.get('ingredients', [])
-        matches = 0
-        matched_user_ingredients = []
-        
-        for user_ing in user_ingredients:
-            for recipe_ing in recipe_ingredients:
-                if user_ing.lower() in recipe_ing.lower() or recipe_ing.lower() in user_ing.lower():
-                    matches += 1
-                    matched_user_ingredients.append(user_ing)
-                    break
+        ids = snapshot.canonical_ids(recipe)
+        recipe_ingredients = [ing.lower() for ing in recipe.get('ingredients', []) if isinstance(ing, str)]
+        matched_user_ingredients = [
+            user_ing for user_ing, user_lower, query in user_ids
+            if query & ids or any(user_lower in ing or ing in user_lower for ing in recipe_ingredients)
+        ]
+        matches = len(matched_user_ingredients)
         
         if matches > 0:
+            recipe = dict(recipe)  # 카탈로그의 공유 dict는 수정하지 않음
             recipe['similarity_score'] = matches / len(user_ingredients)
             recipe['match_rate'] = matches / len(user_ingredients)
             recipe['matched_ingredients_count'] = matches
@@ -231,8 +360,8 @@ async def test_ingredient_similarity(ingredients: List[str]):
     try:
         ingredient1, ingredient2 = ingredients
         
-        if hasattr(similarity_service, 'test_similarity'):
-            similarity = similarity_service.test_similarity(ingredient1, ingredient2)
+        if hasattr(similarity_service, 'asimilarity'):
+            similarity = await similarity_service.asimilarity(ingredient1, ingredient2)
         else:
             similarity = 0.8 if ingredient1.lower() in ingredient2.lower() or ingredient2.lower() in ingredient1.lower() else 0.3
         
@@ -251,9 +380,24 @@ async def get_similarity_status():
     try:
         status = {
             "service_available": hasattr(similarity_service, 'enhanced_recipe_matching'),
-            "ollama_available": getattr(similarity_service, 'use_ollama', False) if hasattr(similarity_service, 'use_ollama') else False,
+            "ollama_available": hasattr(similarity_service, 'embeddings_available') and similarity_service.embeddings_available(),
             "cache_count": len(getattr(similarity_service, 'ingredient_embeddings', {})),
             "similarity_threshold": getattr(similarity_service, 'similarity_threshold', 0.7),
+            "embedding_precision": getattr(similarity_service, 'embedding_precision', None),
+        }
+        if hasattr(similarity_service, 'embedding_matrix'):
+            status["embedding_matrix_bytes"] = similarity_service.embedding_matrix.nbytes
+        # Ollama 장애 시 "degraded": 백오프가 끝날 때까지 임베딩 없이 직접/동의어 매칭만 사용
+        if hasattr(similarity_service, 'embedding_status'):
+            status["embedding"] = similarity_service.embedding_status()
+            status["degraded"] = status["embedding"]["mode"] == "degraded"
+        # 오프라인 빌드 산출물(--build-index/--warm-cache)과, 그 뒤로 카탈로그가 바뀌었는지
+        manifest = getattr(similarity_service, 'artifact_manifest', None)
+        status["artifact"] = manifest and {
+            "built_at": manifest.get("built_at"),
+            "catalog_version": manifest["catalog"]["version"],
+            "embeddings": manifest.get("embeddings"),
+            "stale": manifest["catalog"]["version"] != catalog.get().version,
         }
         return status
     except Exception as e:
@@ -0,0 +1,170 @@
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+def ingredient_tokens(text: str) -> List[str]:
+    """재료 문자열을 소문자 공백 단위 토큰으로 나눕니다 ("체다 치즈 100g" → ["체다", "치즈", "100g"])"""
+    return str(text).lower().split()
+
+
+def _substrings(word: str) -> Iterable[str]:
+    length = len(word)
+    for start in range(length):
+        for end in range(start + 1, length + 1):
+            yield word[start:end]
+
+
+class IngredientTokenIndex:
+    """
+    재료 토큰 → 레시피 위치(카탈로그 내 인덱스) 역색인.
+
+    기존 로컬 매칭 규칙("사용자 재료의 단어가 레시피 재료 토큰에 포함되거나,
+    레시피 재료 토큰이 사용자 재료에 포함되면 일치")을 그대로 따르되,
+    레시피 전체를 훑는 대신 사용자 재료가 건드리는 posting list만 읽습니다.
+
+    - postings: 토큰 → 그 토큰을 가진 레시피 위치 집합
+    - _containing: 부분 문자열 → 그 부분 문자열을 포함하는 토큰 집합
+      (레시피 수가 아니라 서로 다른 토큰 수에 비례하므로 카탈로그가 커져도 작게 유지됨)
+    """
+
+    def __init__(self, recipes: List[Dict]):
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        for position, recipe in enumerate(recipes):
+            for ingredient in recipe.get("ingredients", []):
+                for token in ingredient_tokens(ingredient):
+                    self.postings[token].add(position)
+        self.postings = dict(self.postings)
+
+        self._containing: Dict[str, Set[str]] = defaultdict(set)
+        for token in self.postings:
+            for sub in _substrings(token):
+                self._containing[sub].add(token)
+        self._containing = dict(self._containing)
+
+    def __len__(self) -> int:
+        return len(self.postings)
+
+    def matching_tokens(self, user_ingredient: str) -> Set[str]:
+        tokens: Set[str] = set()
+        for word in ingredient_tokens(user_ingredient):
+            # 사용자 단어가 레시피 토큰에 포함되는 경우
+            tokens |= self._containing.get(word, set())
+            # 레시피 토큰이 사용자 단어에 포함되는 경우
+            for sub in _substrings(word):
+                if sub in self.postings:
+                    tokens.add(sub)
+        return tokens
+
+    def match_positions(self, user_ingredient: str) -> Set[int]:
+        positions: Set[int] = set()
+        for token in self.matching_tokens(user_ingredient):
+            positions |= self.postings[token]
+        return positions
+
+    def score(self, user_ingredients: List[str]) -> Counter:
+        """레시피 위치별로 일치한 사용자 재료 수를 셉니다 (히트한 posting list만 순회)"""
+        scores: Counter = Counter()
+        for user_ingredient in dict.fromkeys(ing.strip() for ing in user_ingredients if ing.strip()):
+            scores.update(self.match_positions(user_ingredient))
+        return scores
+
+
+class RecipeMatchIndex:
+    """
+    레시피 재료 문자열 → 레시피 위치 역색인 (유사도 top-k 후보 선정용).
+
+    IngredientSimilarityService._direct_matches의 규칙(소문자로 바꾼 사용자 재료와 레시피 재료
+    문자열 중 한쪽이 다른 쪽에 포함되면 일치, 동의어 그룹을 공유하면 동의어 일치)을 그대로 따르되
+    레시피 전체를 훑는 대신 사용자 재료가 건드리는 레시피만 찾습니다.
+
+    - texts: 서로 다른 레시피 재료 문자열. texts_of[레시피 위치]는 그 레시피의 문자열 번호들
+    - recipes_of[문자열 번호]: 그 문자열이 들어 있는 레시피 위치 배열
+    - _by_char: 글자 → 그 글자를 포함하는 문자열 번호 (사용자 재료를 포함하는 문자열 후보)
+    - _by_lower: 소문자 문자열 → 문자열 번호 (사용자 재료에 포함되는 문자열)
+    - _group_recipes: 동의어 그룹 → 그 그룹 재료가 들어 있는 레시피 위치 배열
+    """
+
+    def __init__(self, recipes: List[Dict], matcher, max_cached_queries: int = 50_000):
+        self.recipes = recipes
+        self.texts: List[str] = []
+        self.texts_of: List[Tuple[int, ...]] = []
+        text_ids: Dict[str, int] = {}
+        postings: List[List[int]] = []
+        for position, recipe in enumerate(recipes):
+            ids: List[int] = []
+            for ingredient in recipe.get("ingredients", []):
+                if not isinstance(ingredient, str):
+                    continue
+                text_id = text_ids.get(ingredient)
+                if text_id is None:
+                    text_id = text_ids[ingredient] = len(self.texts)
+                    self.texts.append(ingredient)
+                    postings.append([])
+                if text_id not in ids:
+                    ids.append(text_id)
+                    postings[text_id].append(position)
+            self.texts_of.append(tuple(ids))
+        self.recipes_of = [np.asarray(positions, dtype=np.int64) for positions in postings]
+
+        self._lowered = [text.lower() for text in self.texts]
+        self._by_lower: Dict[str, List[int]] = defaultdict(list)
+        self._by_char: Dict[str, List[int]] = defaultdict(list)
+        group_texts: Dict[int, List[int]] = defaultdict(list)
+        for text_id, lowered in enumerate(self._lowered):
+            self._by_lower[lowered].append(text_id)
+            for char in set(lowered):
+                self._by_char[char].append(text_id)
+            for group in matcher.groups_in(self.texts[text_id]):
+                group_texts[group].append(text_id)
+        self._by_lower = dict(self._by_lower)
+        self._by_char = dict(self._by_char)
+        self._group_recipes = {group: self._union(ids) for group, ids in group_texts.items()}
+
+        self._position = {id(recipe): position for position, recipe in enumerate(recipes)}
+        self.max_cached_queries = max_cached_queries
+        self._exact: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def _union(self, text_ids: Iterable[int]) -> np.ndarray:
+        arrays = [self.recipes_of[text_id] for text_id in text_ids]
+        return np.unique(np.concatenate(arrays)) if arrays else np.zeros(0, dtype=np.int64)
+
+    def positions_of(self, recipes: List[Dict]) -> Optional[np.ndarray]:
+        """recipes(이 색인 레시피들의 부분 목록)의 위치. 이 색인의 레시피가 아닌 것이 섞여 있으면 None"""
+        if recipes is self.recipes:
+            return np.arange(len(recipes), dtype=np.int64)
+        positions = np.fromiter((self._position.get(id(recipe), -1) for recipe in recipes), dtype=np.int64, count=len(recipes))
+        if (positions < 0).any() or len(np.unique(positions)) < len(positions):
+            return None
+        return positions
+
+    def exact_recipes(self, user_ingredient: str) -> np.ndarray:
+        """사용자 재료가 포함되거나 사용자 재료에 포함되는 재료 문자열을 가진 레시피 위치"""
+        found = self._exact.get(user_ingredient)
+        if found is not None:
+            return found
+        lowered = user_ingredient.lower()
+        if lowered:
+            # 사용자 재료를 포함하는 문자열은 가장 드문 글자의 posting만 확인
+            rarest = min(set(lowered), key=lambda char: len(self._by_char.get(char, ())))
+            text_ids = {text_id for text_id in self._by_char.get(rarest, ()) if lowered in self._lowered[text_id]}
+        else:
+            text_ids = set(range(len(self.texts)))
+        for sub in _substrings(lowered):
+            text_ids.update(self._by_lower.get(sub, ()))
+        found = self._union(sorted(text_ids))
+        if len(self._exact) >= self.max_cached_queries:
+            self._exact.clear()
+        self._exact[user_ingredient] = found
+        return found
+
+    def synonym_recipes(self, groups: Iterable[int]) -> np.ndarray:
+        """동의어 그룹들 중 하나라도 가진 재료 문자열이 들어 있는 레시피 위치"""
+        arrays = [self._group_recipes[group] for group in groups if group in self._group_recipes]
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays)) if arrays else np.zeros(0, dtype=np.int64)
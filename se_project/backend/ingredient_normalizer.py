@@ -0,0 +1,118 @@
+import re
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+# 레시피 재료 문자열("계란 3개", "식용유 2스푼", "체다 치즈 또는 모짜렐라 치즈 100g")을
+# 수량/단위를 뺀 정규 재료 이름과 정수 ID로 바꿉니다. 백엔드와 LLM 서버가 함께 사용합니다.
+
+# 괄호 안 설명 ("(선택)", "(약 200g)", "(다진 것)")
+_NOTES = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+# 대체 재료 구분자 ("A 또는 B", "A/B", "A, B"). 1/2 같은 분수의 /는 제외
+_ALTERNATIVES = re.compile(r"\s*(?:또는|혹은|\bor\b|,|(?<!\d)/(?!\d))\s*")
+# 숫자로 시작하는 수량 토큰 ("3개", "1/2컵", "1~2장", "0.5스푼", "100g")
+_QUANTITY = re.compile(r"^[\d.,/~\-½⅓¼¾]+")
+
+UNITS = {
+    "개", "스푼", "스픈", "숟가락", "큰술", "작은술", "티스푼", "컵", "공기", "꼬집", "장", "대", "모",
+    "쪽", "팩", "봉지", "봉", "인분", "단", "줌", "덩이", "조각", "톨", "알", "마리", "줄기", "뿌리",
+    "포기", "캔", "병", "g", "kg", "ml", "l", "t", "tbsp", "tsp", "cup", "cups",
+}
+AMOUNT_WORDS = {"약간", "적당량", "적당히", "조금", "소량", "넉넉히", "약", "한", "두", "세", "반", "한줌", "취향껏"}
+# 붙여 써도 떼어 내는 수식어 ("다진마늘" → "마늘"도 정규 이름에 포함)
+PREFIX_MODIFIERS = ("다진", "냉동", "슬라이스", "시판")
+# 손질/상태를 나타내는 단어. 따로 떨어져 있어도 재료 이름이 아니므로 단어별 정규 이름으로 쓰지 않음
+# ("다진 마늘"과 "다진 양파"가 "다진"으로 맞지 않도록)
+MODIFIER_WORDS = set(PREFIX_MODIFIERS) | {"손질한", "채", "썬", "데친", "말린", "국산", "수입산", "깐", "볶은", "삶은", "익힌", "얇게", "잘게"}
+# 표기만 다른 같은 재료
+ALIASES = {
+    "달걀": "계란",
+    "소세지": "소시지",
+    "비엔나소세지": "비엔나소시지",
+    "케찹": "케첩",
+    "후춧가루": "후추",
+}
+
+
+def _strip_quantities(words: List[str]) -> List[str]:
+    kept = []
+    after_amount = False
+    for word in words:
+        if _QUANTITY.match(word) or word in AMOUNT_WORDS:
+            after_amount = True
+            continue
+        if after_amount and word in UNITS:
+            continue
+        after_amount = False
+        kept.append(word)
+    return kept
+
+
+def canonical_names(text: str) -> Tuple[str, ...]:
+    """
+    재료 문자열의 정규 이름들 (메모 없음).
+    대체 재료마다 공백을 뺀 전체 이름, 단어별 이름(수식어 단어 제외), 수식어를 뗀 이름을 모두 포함합니다.
+    "다진 마늘 1스푼" → ("다진마늘", "마늘")
+    """
+    text = _NOTES.sub(" ", str(text).casefold())
+    names: Dict[str, None] = {}
+    for alternative in _ALTERNATIVES.split(text):
+        words = _strip_quantities(alternative.split())
+        if not words:
+            continue
+        # 한글 재료는 띄어쓰기가 제각각이라 붙여 쓴 형태로 통일 ("방울 토마토" → "방울토마토")
+        joined = " ".join(words) if alternative.isascii() else "".join(words)
+        candidates = [joined] + ([word for word in words if word not in MODIFIER_WORDS] if len(words) > 1 else [])
+        for name in candidates:
+            names[ALIASES.get(name, name)] = None
+            for prefix in PREFIX_MODIFIERS:
+                if name.startswith(prefix) and len(name) > len(prefix):
+                    stripped = name[len(prefix):]
+                    names[ALIASES.get(stripped, stripped)] = None
+    return tuple(names)
+
+
+class IngredientNormalizer:
+    """
+    canonical_names() 결과를 문자열별로 메모하고, 정규 이름마다 정수 ID를 붙입니다.
+    카탈로그 재료는 로드 시 recipe_ids()로 ID 집합을 미리 만들어 두고, 요청 시점에는
+    사용자 재료의 ID 집합(query_ids, 사전을 늘리지 않음)과 교집합만 구합니다.
+    """
+
+    def __init__(self, max_cached_texts: int = 200_000):
+        self.ids: Dict[str, int] = {}
+        self.max_cached_texts = max_cached_texts
+        self._names_by_text: Dict[str, Tuple[str, ...]] = {}
+        # 카탈로그 로드/스레드 풀 실행기에서 동시에 ID를 붙이므로 새 이름 추가는 잠금 안에서
+        self._ids_lock = threading.Lock()
+
+    def names(self, text: str) -> Tuple[str, ...]:
+        names = self._names_by_text.get(text)
+        if names is None:
+            if len(self._names_by_text) >= self.max_cached_texts:
+                self._names_by_text.clear()
+            names = self._names_by_text[text] = canonical_names(text)
+        return names
+
+    def ingredient_ids(self, text: str) -> FrozenSet[int]:
+        """재료 하나의 ID 집합 (처음 보는 정규 이름은 사전에 추가)"""
+        return frozenset(self._id(name) for name in self.names(text))
+
+    def _id(self, name: str) -> int:
+        id_ = self.ids.get(name)
+        if id_ is None:
+            with self._ids_lock:
+                id_ = self.ids.setdefault(name, len(self.ids))
+        return id_
+
+    def recipe_ids(self, ingredients: Iterable[str]) -> FrozenSet[int]:
+        ids = set()
+        for ingredient in ingredients:
+            ids |= self.ingredient_ids(ingredient)
+        return frozenset(ids)
+
+    def query_ids(self, text: str) -> FrozenSet[int]:
+        """사용자 재료의 ID 집합. 사전에 없는 이름은 어떤 레시피와도 맞지 않으므로 뺌"""
+        return frozenset(self.ids[name] for name in self.names(text) if name in self.ids)
+
+
+normalizer = IngredientNormalizer()
@@ -1,92 +1,406 @@
+import asyncio
+import heapq
 import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import os
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
-import logging
+import threading
+
+import httpx
+
+import metrics
+from ann_index import IVFIndex
+from embedding_matrix import EMBEDDING_PRECISION, PRECISIONS, EmbeddingMatrix, compare_precisions
+from embedding_store import EmbeddingStore
+from ingredient_index import RecipeMatchIndex
+from resilience import Backoff, CircuitBreakerOpen, NegativeCache
+from similarity_artifacts import build_artifacts, load_synonym_table, read_manifest
+from structured_logging import get_logger, setup_logging
+from synonym_matcher import KOREAN_INGREDIENT_GROUPS, korean_synonyms
+from upstream import Upstream
+
+logger = get_logger(__name__)
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_TIMEOUT = (3.0, float(os.getenv("EMBED_TIMEOUT", "30")))  # (연결, 읽기) 초
+FALLBACK_DIMENSIONS = 768  # 캐시가 비어 있을 때 임베딩 실패 시 돌려주는 0 벡터 차원 (nomic-embed-text 차원수)
+# Ollama에 닿지 못하면 전역 지수 백오프 (그동안은 임베딩 없이 직접/동의어 매칭만)
+EMBED_BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "1"))
+EMBED_BACKOFF_MAX = float(os.getenv("EMBED_BACKOFF_MAX", "60"))
+# Ollama가 응답했는데 임베딩을 못 받은 재료는 TTL 동안 다시 요청하지 않음 (반복 실패 시 TTL 증가)
+EMBED_NEGATIVE_TTL = float(os.getenv("EMBED_NEGATIVE_TTL", "30"))
+EMBED_NEGATIVE_MAX_TTL = float(os.getenv("EMBED_NEGATIVE_MAX_TTL", "600"))
+# 비동기 경로에서 행렬 계산을 돌리는 스레드 수
+SIMILARITY_WORKERS = int(os.getenv("SIMILARITY_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 임베딩 매칭 한 건이 낼 수 있는 최대 점수 (코사인 ≤ 1, float32 반올림 여유 포함)
+EMBEDDING_SCORE_BOUND = 1.0 + 1e-3
+# 후보가 이만큼 많으면 전체를 내적하지 않고 ANN 색인으로 찾음
+ANN_MIN_CANDIDATES = int(os.getenv("ANN_MIN_CANDIDATES", "2048"))
+# 카탈로그 재료 중 임계값 이상 유사한 재료 목록을 기억해 두는 (사용자 재료, 임계값) 수
+CATALOG_SIMILAR_MEMO = int(os.getenv("CATALOG_SIMILAR_MEMO", "20000"))
+BACKEND_DIR = Path(__file__).parent
+# 임베딩 캐시 등을 두는 데이터 폴더: DATA_DIR, 없으면 Docker 볼륨(/app/data), 그다음 프로젝트 data 폴더
+DATA_DIR = Path(os.getenv("DATA_DIR") or (BACKEND_DIR / "data" if (BACKEND_DIR / "data").is_dir() else BACKEND_DIR.parent / "data"))
+
+
+def _unreachable(error: Exception) -> bool:
+    """Ollama에 닿지 못한 실패인지 (연결/타임아웃/5xx/차단기 open). 재료 하나의 문제와 구분"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, httpx.TransportError, CircuitBreakerOpen)):
+        return True
+    response = getattr(error, "response", None)
+    return isinstance(error, (requests.HTTPError, httpx.HTTPStatusError)) and response is not None and response.status_code >= 500
+
+
+class CatalogSimilarity:
+    """
+    카탈로그 재료 문자열(RecipeMatchIndex.texts)과 사용자 재료 사이의 임베딩 유사도 메모.
+    사용자 재료마다 임계값 이상인 카탈로그 재료 (문자열 번호, 점수)를 한 번만 구해 두고,
+    요청에서는 그 목록으로 레시피별 임베딩 점수의 상한과 정확한 값을 읽습니다.
+    """
+    
+    def __init__(self, index: RecipeMatchIndex, matrix: EmbeddingMatrix, max_entries: int = CATALOG_SIMILAR_MEMO):
+        self.index = index
+        self.matrix = matrix
+        self.max_entries = max_entries
+        self.rows = np.full(len(index.texts), -1, dtype=np.int64)  # 문자열 번호 → 행렬 행 번호 (없으면 -1)
+        self._checked_size = -1
+        self._similar: Dict[Tuple[str, float], Tuple[np.ndarray, np.ndarray]] = {}
+    
+    def missing_texts(self) -> List[str]:
+        """아직 임베딩이 없는 카탈로그 재료 문자열 (행렬에 행이 늘었을 때만 다시 확인)"""
+        size = len(self.matrix)
+        if size != self._checked_size:
+            for text_id in np.flatnonzero(self.rows < 0):
+                self.rows[text_id] = self.matrix.index.get(self.index.texts[text_id], -1)
+            self._checked_size = size
+        return [self.index.texts[text_id] for text_id in np.flatnonzero(self.rows < 0)]
+    
+    def similar(self, user_ingredients: List[str], threshold: float) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        사용자 재료별로 코사인 유사도가 threshold 이상인 카탈로그 재료 (문자열 번호, 점수).
+        기억해 두지 않은 재료들은 행렬곱 한 번으로 구합니다 (행렬을 재료마다 다시 읽지 않음)
+        """
+        # 임베딩이 없으면 0 벡터라 어떤 재료와도 임계값을 넘지 않음 (나중에 받을 수 있으니 기억하지 않음)
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+        found = {user_ing: self._similar.get((user_ing, threshold), empty) for user_ing in user_ingredients}
+        todo = [user_ing for user_ing in found if (user_ing, threshold) not in self._similar and user_ing in self.matrix]
+        if not todo:
+            return found
+        
+        complete = not self.missing_texts()
+        present = np.flatnonzero(self.rows >= 0)
+        user_rows = self.matrix.take(np.array([self.matrix.index[user_ing] for user_ing in todo]))
+        with metrics.time_stage("similarity_matrix"):
+            scores = self.matrix.dot(user_rows.T)[self.rows[present]]
+        for column, user_ing in enumerate(todo):
+            keep = scores[:, column] >= threshold
+            found[user_ing] = (present[keep], scores[keep, column])
+            if complete:
+                if len(self._similar) >= self.max_entries:
+                    self._similar.clear()
+                self._similar[(user_ing, threshold)] = found[user_ing]
+        return found
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
 
 class IngredientSimilarityService:
-    def __init__(self, ollama_host: str = "http://localhost:11434"):
-        self.ollama_host = ollama_host
+    def __init__(self, ollama_host: Optional[str] = None, precision: Optional[str] = None):
+        self.ollama_host = (ollama_host or os.getenv("OLLAMA_HOST", "http://localhost:11434")).rstrip("/")
         self.embedding_model = "nomic-embed-text"  # 또는 "mxbai-embed-large"
         self.similarity_threshold = 0.7  # 유사도 임계값
+        # 임베딩 저장 정밀도 (float32/float16/int8). 디스크 캐시와 메모리 행렬에 함께 적용
+        self.embedding_precision = precision or EMBEDDING_PRECISION
+        
+        # Ollama 호출용 keep-alive 커넥션 풀
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=EMBED_CONCURRENCY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # /api/embed(배치) 지원 여부. 구버전 Ollama면 /api/embeddings 병렬 호출로 전환
+        self._batch_endpoint = True
+        
+        # 비동기 경로: Ollama 호출은 upstream.Upstream 커넥션 풀(차단기 포함)로,
+        # 행렬 계산은 전용 스레드 풀로 보내 이벤트 루프를 막지 않음
+        self.ollama = Upstream("ollama", self.ollama_host, timeout=EMBED_TIMEOUT[1], connect_timeout=EMBED_TIMEOUT[0])
+        self.executor = ThreadPoolExecutor(max_workers=SIMILARITY_WORKERS, thread_name_prefix="similarity")
+        # 캐시/행렬에 임베딩을 넣는 작업은 한 번에 하나씩
+        self._write_lock = threading.Lock()
+        # Ollama 장애 시 매 요청이 타임아웃을 기다리지 않도록 전역 백오프 + 재료별 음성 캐시
+        self.embedding_backoff = Backoff("ollama 임베딩", base=EMBED_BACKOFF_BASE, max_delay=EMBED_BACKOFF_MAX)
+        self.negative_cache = NegativeCache(ttl=EMBED_NEGATIVE_TTL, max_ttl=EMBED_NEGATIVE_MAX_TTL)
         
-        self.ingredient_embeddings = {}
-        self.cache_file = Path("ingredient_embeddings_cache.json")
+        # 임베딩 디스크 캐시 (추가 전용 행 파일, embedding_store.py 참고)
+        # (소스 트리/작업 디렉터리가 아닌 데이터 폴더 아래, 첫 저장 때 만들어짐)
+        self.cache_dir = Path(os.getenv("EMBEDDING_CACHE_DIR") or DATA_DIR / "ingredient_embeddings_cache")
+        # 이전 버전의 JSON 캐시 (새 캐시가 비어 있을 때 import_legacy_cache()가 한 번만 가져옴)
+        self.cache_file = BACKEND_DIR / "ingredient_embeddings_cache.json"
+        # 정규화된 행렬 (캐시된 임베딩과 같은 내용, 유사도 계산용)
+        self.embedding_matrix = EmbeddingMatrix(precision=self.embedding_precision)
+        # 행렬 위의 근사 최근접 이웃 색인 (임베딩 캐시 디렉터리에 함께 저장)
+        self.ann_index_path = self.cache_dir / "ann-index.npz"
         self.load_cache()
         
         self.korean_ingredients = self._load_korean_ingredients()
+        # 동의어 → 그룹 역색인 + Aho-Corasick 오토마톤 (카탈로그 로드 시 레시피 재료를 미리 스캔)
+        self.synonym_matcher = korean_synonyms
+        # --build-index/--warm-cache로 미리 계산해 둔 재료별 동의어 그룹이 있으면 그대로 사용
+        preloaded = load_synonym_table(self.cache_dir, self.synonym_matcher)
+        if preloaded:
+            logger.info(f"동의어 표 로드: {preloaded}개 재료")
+        # 카탈로그 스냅샷별 사용자 재료 ↔ 카탈로그 재료 유사도 메모 (스냅샷이나 행렬이 바뀌면 새로 만듦)
+        self._catalog_similarity: Optional[CatalogSimilarity] = None
     
     def _load_korean_ingredients(self) -> Dict[str, List[str]]:
+        return {base: list(synonyms) for base, synonyms in KOREAN_INGREDIENT_GROUPS.items()}
+    
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
+    
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        texts 순서대로 임베딩을 돌려줍니다. 캐시에 없는 재료만 모아 Ollama에 한 번에 요청하고
+        결과를 캐시에 한꺼번에 넣습니다. 실패한 재료와 백오프/음성 캐시로 건너뛴 재료는 0 벡터.
+        """
+        misses = [text for text in dict.fromkeys(texts) if text not in self.ingredient_embeddings]
+        if len(texts) > len(misses):
+            metrics.count_cache("embedding", hit=True, amount=len(texts) - len(misses))
+        
+        fetched: Dict[str, List[float]] = {}
+        if misses:
+            metrics.count_cache("embedding", hit=False, amount=len(misses))
+            requested = self._fetchable(misses)
+            if requested:
+                fetched, errors = self._fetch_embeddings(requested)
+                self._settle(requested, fetched, errors)
+                self._remember(fetched)
+        return self._collect(texts, fetched)
+    
+    def _fetchable(self, misses: List[str]) -> List[str]:
+        """
+        misses 중 실제로 Ollama에 요청할 재료. 음성 캐시에 있는 재료는 TTL이 끝날 때까지 빼고,
+        전역 백오프 중이면 아무것도 요청하지 않음 (임베딩 없이 직접/동의어 매칭만 하게 됨)
+        """
+        requested = [text for text in misses if text not in self.negative_cache]
+        if len(requested) < len(misses):
+            metrics.count_fallback("embedding", "negative_cache")
+        if requested and not self.embedding_backoff.allow():
+            metrics.count_fallback("embedding", "backoff")
+            return []
+        return requested
+    
+    def _settle(self, requested: List[str], fetched: Dict[str, List[float]], errors: List[Exception]):
+        """요청 결과를 백오프/음성 캐시에 반영. Ollama에 닿았을 때만 받지 못한 재료를 음성 캐시에 넣음"""
+        if fetched or any(not _unreachable(error) for error in errors):
+            self.embedding_backoff.record_success()
+            for text in requested:
+                if text in fetched:
+                    self.negative_cache.record_success(text)
+                else:
+                    self.negative_cache.record_failure(text)
+        elif errors:
+            self.embedding_backoff.record_failure()
+    
+    def embeddings_available(self) -> bool:
+        """지금 Ollama에 새 임베딩을 요청하는지 (False면 캐시된 임베딩과 직접/동의어 매칭만 사용)"""
+        return not self.embedding_backoff.blocked()
+    
+    def embedding_status(self) -> Dict:
         return {
-            "두부": ["두부", "순두부", "연두부", "부침두부", "모두부"],
-            "돼지고기": ["돼지고기", "삼겹살", "목살", "항정살", "등심", "안심", "앞다리살"],
-            "소고기": ["소고기", "등심", "안심", "갈비", "불고기용고기", "스테이크용고기"],
-            "닭고기": ["닭고기", "닭가슴살", "닭다리살", "닭날개", "통닭"],
-            "양파": ["양파", "대파", "쪽파", "실파", "양파즙"],
-            "마늘": ["마늘", "다진마늘", "마늘즙", "깐마늘"],
-            "고추": ["고추", "청양고추", "홍고추", "풋고추", "건고추"],
-            "버섯": ["버섯", "느타리버섯", "팽이버섯", "새송이버섯", "표고버섯", "양송이버섯"],
-            "감자": ["감자", "새감자", "자주감자", "수미감자"],
-            "당근": ["당근", "mini당근", "베이비당근"],
-            "배추": ["배추", "절임배추", "배추김치", "얼갈이배추"],
-            "무": ["무", "열무", "총각무", "무즙"],
-            "콩": ["콩", "완두콩", "검은콩", "백태", "서리태", "콩나물"],
-            "계란": ["계란", "달걀", "메추리알", "계란흰자", "계란노른자"],
-            "우유": ["우유", "저지방우유", "무지방우유", "연유", "생크림"],
-            "치즈": ["치즈", "모짜렐라치즈", "체다치즈", "크림치즈", "파마산치즈"],
-            "쌀": ["쌀", "현미", "찹쌀", "보리", "밥"],
-            "면": ["면", "라면", "우동면", "소바면", "스파게티면", "국수"],
-            "기름": ["기름", "올리브오일", "참기름", "들기름", "포도씨오일", "카놀라오일"],
-            "간장": ["간장", "진간장", "국간장", "양조간장"],
-            "된장": ["된장", "쌈장", "고추장", "춘장"],
-            "식초": ["식초", "사과식초", "현미식초", "발사믹식초"],
-            "설탕": ["설탕", "백설탕", "흑설탕", "올리고당", "꿀", "물엿"],
-            "소금": ["소금", "굵은소금", "천일염", "맛소금"],
-            "후추": ["후추", "흰후추", "검은후추", "후춧가루"],
-            "토마토": ["토마토", "방울토마토", "대추방울토마토", "토마토페이스트"],
-            "오이": ["오이", "미니오이", "피클"],
-            "상추": ["상추", "깻잎", "시금치", "양상추", "로메인"],
-            "생강": ["생강", "생강즙", "생강가루"],
-            "레몬": ["레몬", "라임", "레몬즙", "라임즙"],
-            "사과": ["사과", "사과즙", "건사과"],
-            "바나나": ["바나나", "바나나칩"],
-            "딸기": ["딸기", "냉동딸기", "딸기잼"],
-            "고구마": ["고구마", "밤고구마", "호박고구마", "자색고구마"],
-            "호박": ["호박", "애호박", "단호박", "늙은호박"]
+            "available": self.embeddings_available(),
+            "mode": "normal" if self.embeddings_available() else "degraded",
+            "backoff": self.embedding_backoff.status(),
+            "negative_cache": self.negative_cache.status(),
         }
     
-    def get_embedding(self, text: str) -> List[float]:
+    def _collect(self, texts: List[str], fetched: Dict[str, List[float]]) -> List[List[float]]:
+        results = []
+        for text in texts:
+            if text in fetched:
+                results.append(fetched[text])
+            elif text in self.ingredient_embeddings:
+                results.append(self.ingredient_embeddings[text])
+            else:
+                results.append([0.0] * (self.embedding_matrix.dim or FALLBACK_DIMENSIONS))
+        return results
+    
+    def _remember(self, embeddings: Dict[str, List[float]]):
+        if not embeddings:
+            return
+        with self._write_lock:
+            if isinstance(self.ingredient_embeddings, EmbeddingStore):
+                # 파일 끝에 덧붙이기만 하고 fsync는 저장소가 모아서 처리
+                for text, embedding in embeddings.items():
+                    self.ingredient_embeddings.put(text, embedding)
+            else:
+                self.ingredient_embeddings.update(embeddings)
+            keys = list(embeddings)
+            self.embedding_matrix.add_array(keys, np.asarray([embeddings[key] for key in keys], dtype=np.float32))
+        # 새 행의 클러스터 배정은 추가할 때 (재학습이 필요하면 색인이 백그라운드에서 시작)
+        self.ann_index.sync()
+    
+    async def aget_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """get_embeddings의 비동기 버전 (Ollama 호출을 기다리는 동안 이벤트 루프를 막지 않음)"""
+        misses = [text for text in dict.fromkeys(texts) if text not in self.ingredient_embeddings]
+        if len(texts) > len(misses):
+            metrics.count_cache("embedding", hit=True, amount=len(texts) - len(misses))
+        fetched: Dict[str, List[float]] = {}
+        if misses:
+            metrics.count_cache("embedding", hit=False, amount=len(misses))
+            requested = self._fetchable(misses)
+            if requested:
+                fetched, errors = await self._afetch_embeddings(requested)
+                self._settle(requested, fetched, errors)
+                await self._run(self._remember, fetched)
+        return self._collect(texts, fetched)
+    
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+    
+    async def _afetch_embeddings(self, texts: List[str]) -> Tuple[Dict[str, List[float]], List[Exception]]:
+        """(받은 임베딩, 발생한 오류들). 실패한 묶음/재료가 있어도 나머지 결과는 돌려줌"""
+        semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
         
-        if text in self.ingredient_embeddings:
-            return self.ingredient_embeddings[text]
+        async def bounded(call, *args):
+            async with semaphore:
+                return await call(*args)
         
-        try:
-            payload = {
-                "model": self.embedding_model,
-                "prompt": text
-            }
-            response = requests.post(
+        async def each(items: List[str]):
+            outcomes = await asyncio.gather(*(bounded(self._aembed_one, text) for text in items), return_exceptions=True)
+            return self._split_outcomes(items, outcomes)
+        
+        if not self._batch_endpoint:
+            return await each(texts)
+        
+        chunks = [texts[start:start + EMBED_BATCH_SIZE] for start in range(0, len(texts), EMBED_BATCH_SIZE)]
+        batches = await asyncio.gather(*(bounded(self._aembed_batch, chunk) for chunk in chunks), return_exceptions=True)
+        if any(isinstance(batch, httpx.HTTPStatusError) and batch.response.status_code == 404 for batch in batches):
+            logger.warning("Ollama가 /api/embed를 지원하지 않아 /api/embeddings 병렬 호출로 전환합니다")
+            self._batch_endpoint = False
+            return await each(texts)
+        
+        results, errors, retry = {}, [], []
+        for chunk, batch in zip(chunks, batches):
+            if not isinstance(batch, Exception):
+                results.update(zip(chunk, batch))
+                continue
+            logger.error(f"배치 임베딩 생성 오류 ({len(chunk)}개): {batch}")
+            if _unreachable(batch) or len(chunk) == 1:
+                errors.append(batch)
+            else:
+                # 재료 하나 때문에 묶음 전체가 거절됐을 수 있으므로 하나씩 다시 요청
+                retry.extend(chunk)
+        if retry and not any(_unreachable(error) for error in errors):
+            more, more_errors = await each(retry)
+            results.update(more)
+            errors.extend(more_errors)
+        return results, errors
+    
+    def _split_outcomes(self, texts: List[str], outcomes: List) -> Tuple[Dict[str, List[float]], List[Exception]]:
+        results, errors = {}, []
+        for text, outcome in zip(texts, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"임베딩 생성 오류 ({text}): {outcome}")
+                errors.append(outcome)
+            else:
+                results[text] = outcome
+        return results, errors
+    
+    async def _aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        with metrics.time_stage("ollama_embedding"):
+            response = await self.ollama.post("/api/embed", json={"model": self.embedding_model, "input": texts})
+        response.raise_for_status()
+        embeddings = response.json()["embeddings"]
+        if len(embeddings) != len(texts):
+            raise ValueError(f"임베딩 개수 불일치: 요청 {len(texts)}개, 응답 {len(embeddings)}개")
+        return embeddings
+    
+    async def _aembed_one(self, text: str) -> List[float]:
+        with metrics.time_stage("ollama_embedding"):
+            response = await self.ollama.post("/api/embeddings", json={"model": self.embedding_model, "prompt": text})
+        response.raise_for_status()
+        return response.json()["embedding"]
+    
+    def _fetch_embeddings(self, texts: List[str]) -> Tuple[Dict[str, List[float]], List[Exception]]:
+        """(받은 임베딩, 발생한 오류들). Ollama에 닿지 못하면 남은 묶음은 요청하지 않음"""
+        if not self._batch_endpoint:
+            return self._embed_each(texts)
+        
+        results, errors, retry = {}, [], []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            chunk = texts[start:start + EMBED_BATCH_SIZE]
+            try:
+                results.update(zip(chunk, self._embed_batch(chunk)))
+                continue
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404 and not results:
+                    logger.warning("Ollama가 /api/embed를 지원하지 않아 /api/embeddings 병렬 호출로 전환합니다")
+                    self._batch_endpoint = False
+                    return self._embed_each(texts)
+                error = e
+            except Exception as e:
+                error = e
+            logger.error(f"배치 임베딩 생성 오류 ({len(chunk)}개): {error}")
+            if _unreachable(error):
+                # 남은 묶음도 같은 타임아웃을 기다리게 되므로 중단
+                errors.append(error)
+                return results, errors
+            if len(chunk) == 1:
+                errors.append(error)
+            else:
+                # 재료 하나 때문에 묶음 전체가 거절됐을 수 있으므로 하나씩 다시 요청
+                retry.extend(chunk)
+        
+        if retry:
+            more, more_errors = self._embed_each(retry)
+            results.update(more)
+            errors.extend(more_errors)
+        return results, errors
+    
+    def _embed_each(self, texts: List[str]) -> Tuple[Dict[str, List[float]], List[Exception]]:
+        """/api/embeddings로 재료마다 병렬 요청"""
+        def attempt(text: str):
+            try:
+                return self._embed_one(text)
+            except Exception as e:
+                return e
+        
+        if len(texts) == 1:
+            return self._split_outcomes(texts, [attempt(texts[0])])
+        with ThreadPoolExecutor(max_workers=min(EMBED_CONCURRENCY, len(texts))) as pool:
+            return self._split_outcomes(texts, list(pool.map(attempt, texts)))
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        with metrics.time_stage("ollama_embedding"):
+            response = self.session.post(
+                f"{self.ollama_host}/api/embed",
+                json={"model": self.embedding_model, "input": texts},
+                timeout=EMBED_TIMEOUT
+            )
+        response.raise_for_status()
+        embeddings = response.json()["embeddings"]
+        if len(embeddings) != len(texts):
+            raise ValueError(f"임베딩 개수 불일치: 요청 {len(texts)}개, 응답 {len(embeddings)}개")
+        return embeddings
+    
+    def _embed_one(self, text: str) -> List[float]:
+        payload = {
+            "model": self.embedding_model,
+            "prompt": text
+        }
+        with metrics.time_stage("ollama_embedding"):
+            response = self.session.post(
                 f"{self.ollama_host}/api/embeddings",
                 json=payload,
-                timeout=30
+                timeout=EMBED_TIMEOUT
             )
-            response.raise_for_status()
-            
-            embedding = response.json()["embedding"]
-            
-            self.ingredient_embeddings[text] = embedding
-            self.save_cache()
-            
-            return embedding
-            
-        except Exception as e:
-            logger.error(f"임베딩 생성 오류 ({text}): {e}")
-            return [0.0] * 384  # nomic-embed-text 차원수
+        response.raise_for_status()
+        return response.json()["embedding"]
     
     def calculate_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
 
@@ -108,63 +422,180 @@ class IngredientSimilarityService:
             logger.error(f"유사도 계산 오류: {e}")
             return 0.0
     
-    def find_similar_ingredients(self, target_ingredient: str, ingredient_list: List[str]) -> List[Tuple[str, float]]:
-        target_embedding = self.get_embedding(target_ingredient)
-        similarities = []
+    def embedding_rows(self, texts: List[str], fetch: bool = True) -> np.ndarray:
+        """
+        texts 순서대로 정규화된 임베딩 행렬 (없는 임베딩은 한 번에 생성, 실패한 재료는 0 벡터).
+        fetch=False면 Ollama를 부르지 않고 이미 있는 임베딩만 사용
+        """
+        missing = [text for text in dict.fromkeys(texts) if text not in self.embedding_matrix]
+        if missing and fetch:
+            self.get_embeddings(missing)
+        return self.embedding_matrix.rows(texts)
+    
+    def _top_similar(
+        self,
+        candidates: List[str],
+        target: str,
+        scores: np.ndarray,
+        limit: Optional[int] = None,
+        threshold: Optional[float] = None,
+    ) -> List[Tuple[str, float]]:
+        """임계값 이상인 후보를 유사도 내림차순으로 (같은 점수는 원래 순서 유지, 자기 자신 제외)"""
+        keep = scores >= (self.similarity_threshold if threshold is None else threshold)
+        keep &= np.fromiter((candidate != target for candidate in candidates), dtype=bool, count=len(candidates))
+        positions = np.flatnonzero(keep)
+        order = positions[np.argsort(-scores[positions], kind="stable")]
+        if limit is not None:
+            order = order[:limit]
+        return [(candidates[i], float(scores[i])) for i in order]
+    
+    def find_similar_ingredients(
+        self,
+        target_ingredient: str,
+        ingredient_list: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        threshold: Optional[float] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        임계값(기본 similarity_threshold) 이상으로 유사한 재료를 유사도 내림차순으로 돌려줍니다.
+        ingredient_list가 없으면 캐시된 전체 재료에서, 후보가 ANN_MIN_CANDIDATES개 이상이면
+        ANN 색인으로 찾습니다 (근사 결과).
+        """
+        threshold = self.similarity_threshold if threshold is None else threshold
+        if ingredient_list is not None and not ingredient_list:
+            return []
+        target_row = self.embedding_rows([target_ingredient])[0]
         
-        for ingredient in ingredient_list:
-            if ingredient == target_ingredient:
-                continue
-                
-            ingredient_embedding = self.get_embedding(ingredient)
-            similarity = self.calculate_similarity(target_embedding, ingredient_embedding)
-            
-            if similarity >= self.similarity_threshold:
-                similarities.append((ingredient, similarity))
+        if ingredient_list is not None and len(ingredient_list) < ANN_MIN_CANDIDATES:
+            scores = self.embedding_rows(ingredient_list) @ target_row
+            return self._top_similar(ingredient_list, target_ingredient, scores, limit, threshold)
         
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities
+        allowed = None
+        if ingredient_list is not None:
+            self.embedding_rows(ingredient_list)
+            allowed = np.zeros(len(self.embedding_matrix), dtype=bool)
+            positions = [self.embedding_matrix.index.get(text) for text in ingredient_list]
+            allowed[[position for position in positions if position is not None]] = True
+        
+        with metrics.time_stage("ann_search"):
+            # 자기 자신이 결과에 끼어 있을 수 있으니 하나 더 찾고 뺌
+            found = self.ann_index.search(
+                target_row,
+                k=None if limit is None else limit + 1,
+                threshold=threshold,
+                allowed=allowed,
+            )
+        keys = self.embedding_matrix.keys
+        similar = [(keys[row], score) for row, score in found if keys[row] != target_ingredient]
+        return similar if limit is None else similar[:limit]
     
-    def match_user_ingredients_to_recipes(self, user_ingredients: List[str], recipe_ingredients: List[str]) -> Dict:
-        matches = {}
-        similarity_scores = {}
+    def _direct_matches(self, user_ing: str, recipe_ingredients: List[str]) -> List[Tuple[str, float, str]]:
+        """문자열 포함/동의어 매칭 (임베딩이 필요 없는 단계)"""
+        best_matches = []
         
-        for user_ing in user_ingredients:
-            best_matches = []
-            
+        for recipe_ing in recipe_ingredients:
+            if user_ing.lower() in recipe_ing.lower() or recipe_ing.lower() in user_ing.lower():
+                best_matches.append((recipe_ing, 1.0, "exact"))
+                continue
+        
+        for group in self.synonym_matcher.groups_of.get(user_ing, ()):
             for recipe_ing in recipe_ingredients:
-                if user_ing.lower() in recipe_ing.lower() or recipe_ing.lower() in user_ing.lower():
-                    best_matches.append((recipe_ing, 1.0, "exact"))
-                    continue
-            
-            for base_ingredient, synonyms in self.korean_ingredients.items():
-                if user_ing in synonyms:
-                    for recipe_ing in recipe_ingredients:
-                        if any(syn in recipe_ing for syn in synonyms):
-                            best_matches.append((recipe_ing, 0.95, "synonym"))
+                if group in self.synonym_matcher.groups_in(recipe_ing):
+                    best_matches.append((recipe_ing, 0.95, "synonym"))
+        
+        return best_matches
+    
+    def _plan_matches(self, user_ingredients: List[str], recipe_ingredient_lists: List[List[str]]) -> Tuple[List[Dict], List[Tuple[int, str]]]:
+        """직접 매칭 결과와, 직접 매칭이 안 돼 임베딩으로 비교할 (레시피 위치, 사용자 재료) 쌍"""
+        direct = []
+        pending = []  # (레시피 위치, 사용자 재료)
+        for position, recipe_ingredients in enumerate(recipe_ingredient_lists):
+            recipe_matches = {}
+            for user_ing in user_ingredients:
+                best_matches = self._direct_matches(user_ing, recipe_ingredients)
+                recipe_matches[user_ing] = best_matches
+                if not best_matches and recipe_ingredients:
+                    pending.append((position, user_ing))
+            direct.append(recipe_matches)
+        return direct, pending
+    
+    def _pending_texts(self, recipe_ingredient_lists: List[List[str]], pending: List[Tuple[int, str]]) -> Tuple[List[str], List[str]]:
+        user_texts = list(dict.fromkeys(user_ing for _, user_ing in pending))
+        recipe_texts = list(dict.fromkeys(
+            ing for position in dict.fromkeys(p for p, _ in pending) for ing in recipe_ingredient_lists[position]
+        ))
+        return user_texts, recipe_texts
+    
+    def _score_matches(
+        self,
+        user_ingredients: List[str],
+        recipe_ingredient_lists: List[List[str]],
+        direct: List[Dict],
+        pending: List[Tuple[int, str]],
+        threshold: Optional[float] = None,
+        fetch: bool = True,
+    ) -> List[Dict]:
+        if pending:
+            user_texts, recipe_texts = self._pending_texts(recipe_ingredient_lists, pending)
+            user_row = {text: i for i, text in enumerate(user_texts)}
+            recipe_column = {text: i for i, text in enumerate(recipe_texts)}
             
-            if not best_matches:
-                similar_ingredients = self.find_similar_ingredients(user_ing, recipe_ingredients)
-                for ingredient, score in similar_ingredients[:3]:  # 상위 3개만
-                    best_matches.append((ingredient, score, "embedding"))
+            with metrics.time_stage("similarity_matrix"):
+                similarity = self.embedding_rows(user_texts, fetch) @ self.embedding_rows(recipe_texts, fetch).T
             
-            if best_matches:
-                matches[user_ing] = best_matches
-                similarity_scores[user_ing] = max(match[1] for match in best_matches)
+            for position, user_ing in pending:
+                recipe_ingredients = recipe_ingredient_lists[position]
+                columns = [recipe_column[ing] for ing in recipe_ingredients]
+                scores = similarity[user_row[user_ing], columns]
+                for ingredient, score in self._top_similar(recipe_ingredients, user_ing, scores, limit=3, threshold=threshold):  # 상위 3개만
+                    direct[position][user_ing].append((ingredient, score, "embedding"))
         
-        return {
-            "matches": matches,
-            "similarity_scores": similarity_scores,
-            "match_rate": len(matches) / len(user_ingredients) if user_ingredients else 0
-        }
+        results = []
+        for recipe_matches in direct:
+            matches = {user_ing: best for user_ing, best in recipe_matches.items() if best}
+            results.append({
+                "matches": matches,
+                "similarity_scores": {user_ing: max(match[1] for match in best) for user_ing, best in matches.items()},
+                "match_rate": len(matches) / len(user_ingredients) if user_ingredients else 0
+            })
+        return results
+    
+    def match_many(self, user_ingredients: List[str], recipe_ingredient_lists: List[List[str]], threshold: Optional[float] = None) -> List[Dict]:
+        """
+        여러 레시피에 대해 match_user_ingredients_to_recipes를 한 번에 계산합니다.
+        직접 매칭이 안 된 (사용자 재료, 레시피) 쌍만 모아 사용자 재료 × 레시피 재료
+        유사도를 행렬곱 한 번으로 구합니다. threshold를 주지 않으면 similarity_threshold
+        """
+        direct, pending = self._plan_matches(user_ingredients, recipe_ingredient_lists)
+        return self._score_matches(user_ingredients, recipe_ingredient_lists, direct, pending, threshold)
     
-    def enhanced_recipe_matching(self, user_ingredients: List[str], recipes: List[Dict]) -> List[Dict]:
+    async def amatch_many(self, user_ingredients: List[str], recipe_ingredient_lists: List[List[str]], threshold: Optional[float] = None) -> List[Dict]:
+        """
+        match_many의 비동기 버전. 문자열 매칭과 행렬 계산은 스레드 풀에서, 없는 임베딩은
+        비동기 HTTP로 한 번에 받아 옵니다 (받지 못한 재료는 0 벡터로 계산).
+        """
+        direct, pending = await self._run(self._plan_matches, user_ingredients, recipe_ingredient_lists)
+        await self._aprefetch(recipe_ingredient_lists, pending)
+        return await self._run(
+            self._score_matches, user_ingredients, recipe_ingredient_lists, direct, pending, threshold, False
+        )
+    
+    async def _aprefetch(self, recipe_ingredient_lists: List[List[str]], pending: List[Tuple[int, str]]):
+        """pending 쌍을 비교하는 데 필요한데 아직 없는 임베딩을 비동기로 받아 둠"""
+        if not pending:
+            return
+        user_texts, recipe_texts = self._pending_texts(recipe_ingredient_lists, pending)
+        missing = [text for text in dict.fromkeys(user_texts + recipe_texts) if text not in self.embedding_matrix]
+        if missing:
+            await self.aget_embeddings(missing)
+    
+    def match_user_ingredients_to_recipes(self, user_ingredients: List[str], recipe_ingredients: List[str], threshold: Optional[float] = None) -> Dict:
+        return self.match_many(user_ingredients, [recipe_ingredients], threshold)[0]
+    
+    def _rank_recipes(self, user_ingredients: List[str], recipes: List[Dict], match_results: List[Dict]) -> List[Dict]:
         enhanced_recipes = []
         
-        for recipe in recipes:
-            recipe_ingredients = recipe.get("ingredients", [])
-            
-            match_result = self.match_user_ingredients_to_recipes(user_ingredients, recipe_ingredients)
+        for recipe, match_result in zip(recipes, match_results):
             
             total_score = 0
             matched_count = 0
@@ -190,20 +621,331 @@ class IngredientSimilarityService:
         
         return enhanced_recipes
     
+    def _top_k_candidates(
+        self,
+        user_ingredients: List[str],
+        recipe_ingredient_lists: List[List[str]],
+        top_k: int,
+    ) -> Tuple[List[Dict], List[Tuple[int, str]], List[int]]:
+        """
+        직접(포함/동의어) 매칭만으로 레시피별 점수 하한과 상한을 구해, 상한이 k번째 하한보다
+        낮아 상위 k개에 들 수 없는 레시피를 임베딩 계산 전에 제외합니다.
+        하한 = 직접 매칭 점수 합, 상한 = 하한 + 직접 매칭이 안 된 사용자 재료 수 × 임베딩 최대 점수
+        레시피를 모두 훑으므로 카탈로그 역색인이 없는 레시피 목록(기본 레시피 등)에만 씁니다.
+        """
+        direct, pending = self._plan_matches(user_ingredients, recipe_ingredient_lists)
+        lower = [
+            sum(max(match[1] for match in matches) for matches in recipe_matches.values() if matches)
+            for recipe_matches in direct
+        ]
+        pending_count = Counter(position for position, _ in pending)
+        upper = [bound + pending_count[position] * EMBEDDING_SCORE_BOUND for position, bound in enumerate(lower)]
+        
+        floor = heapq.nlargest(top_k, lower)[-1] if len(lower) >= top_k else float("-inf")
+        survivors = [position for position, bound in enumerate(upper) if bound >= floor]
+        pending = [(position, user_ing) for position, user_ing in pending if upper[position] >= floor]
+        return direct, pending, survivors
+    
+    def _best_embedding_scores(
+        self,
+        recipe_ingredient_lists: List[List[str]],
+        pending: List[Tuple[int, str]],
+        threshold: Optional[float] = None,
+        fetch: bool = True,
+    ) -> Dict[Tuple[int, str], float]:
+        """(레시피 위치, 사용자 재료)별 임계값 이상 최고 임베딩 유사도 (사용자 재료마다 행렬 한 줄로 계산)"""
+        if not pending:
+            return {}
+        threshold = self.similarity_threshold if threshold is None else threshold
+        user_texts, recipe_texts = self._pending_texts(recipe_ingredient_lists, pending)
+        recipe_column = {text: i for i, text in enumerate(recipe_texts)}
+        with metrics.time_stage("similarity_matrix"):
+            similarity = self.embedding_rows(user_texts, fetch) @ self.embedding_rows(recipe_texts, fetch).T
+        
+        positions_by_user: Dict[str, List[int]] = {}
+        for position, user_ing in pending:
+            positions_by_user.setdefault(user_ing, []).append(position)
+        
+        best = {}
+        for row, user_ing in enumerate(user_texts):
+            positions = positions_by_user[user_ing]
+            columns = [recipe_column[ing] for position in positions for ing in recipe_ingredient_lists[position]]
+            scores = similarity[row, columns]
+            # 임계값 미만은 매칭이 아님 (자기 자신은 직접 매칭이라 pending에 없음)
+            scores = np.where(scores >= threshold, scores, -np.inf)
+            offsets = np.cumsum([0] + [len(recipe_ingredient_lists[position]) for position in positions[:-1]])
+            for position, score in zip(positions, np.maximum.reduceat(scores, offsets)):
+                if score > -np.inf:
+                    best[(position, user_ing)] = float(score)
+        return best
+    
+    def _select_top_k(
+        self,
+        user_ingredients: List[str],
+        recipes: List[Dict],
+        recipe_ingredient_lists: List[List[str]],
+        candidates: Tuple[List[Dict], List[Tuple[int, str]], List[int]],
+        top_k: int,
+        threshold: Optional[float] = None,
+        fetch: bool = True,
+    ) -> List[Dict]:
+        """남은 후보의 정확한 점수로 크기 k인 힙을 채우고, 상위 k개만 매칭 상세를 만들어 정렬"""
+        direct, pending, survivors = candidates
+        best = self._best_embedding_scores(recipe_ingredient_lists, pending, threshold, fetch)
+        
+        heap: List[Tuple[float, int]] = []  # (점수, -위치): 점수가 같으면 앞 레시피 우선 (전체 정렬과 같은 순서)
+        for position in survivors:
+            total = 0.0
+            for user_ing, matches in direct[position].items():
+                if matches:
+                    total += max(match[1] for match in matches)
+                elif (position, user_ing) in best:
+                    total += best[(position, user_ing)]
+            item = (total / len(user_ingredients) if user_ingredients else 0, -position)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        
+        chosen = sorted(-negative for _, negative in heap)
+        index = {position: i for i, position in enumerate(chosen)}
+        match_results = self._score_matches(
+            user_ingredients,
+            [recipe_ingredient_lists[position] for position in chosen],
+            [direct[position] for position in chosen],
+            [(index[position], user_ing) for position, user_ing in pending if position in index],
+            threshold,
+            fetch,
+        )
+        return self._rank_recipes(user_ingredients, [recipes[position] for position in chosen], match_results)
+    
+    def _catalog_similarity_for(self, index: RecipeMatchIndex) -> CatalogSimilarity:
+        similarity = self._catalog_similarity
+        if similarity is None or similarity.index is not index or similarity.matrix is not self.embedding_matrix:
+            similarity = self._catalog_similarity = CatalogSimilarity(index, self.embedding_matrix)
+        return similarity
+    
+    def _indexed_plan(
+        self,
+        user_ingredients: List[str],
+        recipes: List[Dict],
+        threshold: Optional[float],
+        match_index: Optional[RecipeMatchIndex],
+    ) -> Optional[Tuple[CatalogSimilarity, np.ndarray, List[str]]]:
+        """
+        recipes가 match_index 카탈로그의 레시피들이면 (유사도 메모, 카탈로그 위치, 아직 없는 임베딩).
+        아니면 None (레시피를 모두 훑는 _top_k_candidates 경로)
+        """
+        threshold = self.similarity_threshold if threshold is None else threshold
+        if match_index is None or threshold <= 0:
+            return None
+        positions = match_index.positions_of(recipes)
+        if positions is None:
+            return None
+        similarity = self._catalog_similarity_for(match_index)
+        missing = [text for text in dict.fromkeys(user_ingredients) if text not in self.embedding_matrix]
+        return similarity, positions, missing + similarity.missing_texts()
+    
+    def _indexed_top_k(
+        self,
+        user_ingredients: List[str],
+        recipes: List[Dict],
+        plan: Tuple[CatalogSimilarity, np.ndarray, List[str]],
+        top_k: int,
+        threshold: Optional[float] = None,
+        fetch: bool = True,
+    ) -> List[Dict]:
+        """
+        카탈로그 역색인으로 사용자 재료가 건드리는 레시피만 골라 점수 상한을 구하고, 상한이 큰
+        레시피부터 정확한 점수를 계산하다가 다음 상한이 k번째 점수보다 낮아지면 멈춥니다.
+        상한 = 사용자 재료별 (직접 매칭 점수, 없으면 그 재료의 카탈로그 최고 임베딩 유사도) 합.
+        아무 레시피도 건드리지 않은 레시피는 0점이므로 보지 않습니다 (결과는 전체 정렬의 앞 k개와 같음)
+        """
+        similarity, positions, missing = plan
+        threshold = self.similarity_threshold if threshold is None else threshold
+        if fetch and missing:
+            self.get_embeddings(missing)
+        index = similarity.index
+        
+        local = np.full(len(index), -1, dtype=np.int64)  # 카탈로그 위치 → recipes 위치
+        local[positions] = np.arange(len(positions))
+        upper = np.zeros(len(index))
+        direct_scores, embedding_scores = [], []
+        for user_ing, (text_ids, scores) in similarity.similar(list(dict.fromkeys(user_ingredients)), threshold).items():
+            bound = np.zeros(len(index))
+            if len(text_ids):
+                bound[np.concatenate([index.recipes_of[text_id] for text_id in text_ids])] = float(scores.max())
+            direct = np.zeros(len(index))
+            direct[index.synonym_recipes(self.synonym_matcher.groups_of.get(user_ing, ()))] = 0.95
+            direct[index.exact_recipes(user_ing)] = 1.0
+            # 직접 매칭이 있으면 임베딩은 보지 않으므로 그 재료의 항은 직접 매칭 점수 그대로
+            upper += np.where(direct > 0, direct, bound)
+            direct_scores.append(direct)
+            embedding_scores.append(dict(zip(text_ids.tolist(), scores.tolist())))
+        
+        candidates = np.flatnonzero((upper > 0) & (local >= 0))
+        order = candidates[np.lexsort((local[candidates], -upper[candidates]))]
+        size = len(user_ingredients)
+        heap: List[Tuple[float, int]] = []  # (점수, -위치): 점수가 같으면 앞 레시피 우선 (전체 정렬과 같은 순서)
+        for position in order.tolist():
+            if len(heap) == top_k and upper[position] / size < heap[0][0]:
+                break
+            total = 0.0
+            for direct, scores in zip(direct_scores, embedding_scores):
+                if direct[position]:
+                    total += float(direct[position])
+                elif scores:
+                    total += max((scores.get(text_id, 0.0) for text_id in index.texts_of[position]), default=0.0)
+            item = (total / size, -int(local[position]))
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        
+        chosen = {-negative for _, negative in heap}
+        # 후보를 다 봤는데도 k개가 안 되면 나머지는 모두 0점이므로 앞 레시피부터 채움
+        for position in range(len(recipes)):
+            if len(chosen) >= top_k:
+                break
+            chosen.add(position)
+        chosen = sorted(chosen)
+        
+        recipe_ingredient_lists = [recipes[position].get("ingredients", []) for position in chosen]
+        direct, pending = self._plan_matches(user_ingredients, recipe_ingredient_lists)
+        match_results = self._score_matches(user_ingredients, recipe_ingredient_lists, direct, pending, threshold, fetch)
+        return self._rank_recipes(user_ingredients, [recipes[position] for position in chosen], match_results)
+    
+    def enhanced_recipe_matching(
+        self,
+        user_ingredients: List[str],
+        recipes: List[Dict],
+        threshold: Optional[float] = None,
+        top_k: Optional[int] = None,
+        match_index: Optional[RecipeMatchIndex] = None,
+    ) -> List[Dict]:
+        """
+        레시피를 유사도 점수 내림차순으로 돌려줍니다. top_k를 주면 상위 k개만 (전체 정렬의
+        앞 k개와 같은 결과)을 상한 가지치기로 계산합니다. recipes가 카탈로그 스냅샷의 레시피들이면
+        match_index(CatalogSnapshot.match_index)를 넘겨 사용자 재료가 건드리는 레시피만 보게 합니다.
+        """
+        if top_k is not None and top_k < len(recipes):
+            plan = self._indexed_plan(user_ingredients, recipes, threshold, match_index)
+            if plan is not None:
+                return self._indexed_top_k(user_ingredients, recipes, plan, top_k, threshold)
+        recipe_ingredient_lists = [recipe.get("ingredients", []) for recipe in recipes]
+        if top_k is not None and top_k < len(recipes):
+            candidates = self._top_k_candidates(user_ingredients, recipe_ingredient_lists, top_k)
+            return self._select_top_k(user_ingredients, recipes, recipe_ingredient_lists, candidates, top_k, threshold)
+        match_results = self.match_many(user_ingredients, recipe_ingredient_lists, threshold)
+        return self._rank_recipes(user_ingredients, recipes, match_results)
+    
+    async def aenhanced_recipe_matching(
+        self,
+        user_ingredients: List[str],
+        recipes: List[Dict],
+        threshold: Optional[float] = None,
+        top_k: Optional[int] = None,
+        match_index: Optional[RecipeMatchIndex] = None,
+    ) -> List[Dict]:
+        """
+        enhanced_recipe_matching의 비동기 버전. 요청마다 threshold를 넘기면 되고
+        공유 상태(similarity_threshold)는 바꾸지 않습니다.
+        """
+        if top_k is not None and top_k < len(recipes):
+            plan = await self._run(self._indexed_plan, user_ingredients, recipes, threshold, match_index)
+            if plan is not None:
+                if plan[2]:
+                    await self.aget_embeddings(plan[2])
+                return await self._run(
+                    self._indexed_top_k, user_ingredients, recipes, plan, top_k, threshold, False
+                )
+        recipe_ingredient_lists = [recipe.get("ingredients", []) for recipe in recipes]
+        if top_k is not None and top_k < len(recipes):
+            candidates = await self._run(self._top_k_candidates, user_ingredients, recipe_ingredient_lists, top_k)
+            await self._aprefetch(recipe_ingredient_lists, candidates[1])
+            return await self._run(
+                self._select_top_k, user_ingredients, recipes, recipe_ingredient_lists, candidates, top_k, threshold, False
+            )
+        match_results = await self.amatch_many(user_ingredients, recipe_ingredient_lists, threshold)
+        return await self._run(self._rank_recipes, user_ingredients, recipes, match_results)
+    
+    async def asimilarity(self, ingredient1: str, ingredient2: str) -> float:
+        embedding1, embedding2 = await self.aget_embeddings([ingredient1, ingredient2])
+        return self.calculate_similarity(embedding1, embedding2)
+    
+    async def aclose(self):
+        await self.ollama.close()
+    
+    @contextmanager
+    def deferred_cache_save(self):
+        """배치 처리가 끝나면 그동안 덧붙인 임베딩을 한 번에 디스크에 동기화"""
+        try:
+            yield
+        finally:
+            self.save_cache()
+    
+    @asynccontextmanager
+    async def adeferred_cache_save(self):
+        """deferred_cache_save의 비동기 버전 (fsync와 ANN 색인 저장은 스레드 풀에서)"""
+        try:
+            yield
+        finally:
+            await self._run(self.save_cache)
+    
     def load_cache(self):
         try:
-            if self.cache_file.exists():
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    self.ingredient_embeddings = json.load(f)
-                logger.info(f"임베딩 캐시 로드: {len(self.ingredient_embeddings)}개 항목")
+            self.ingredient_embeddings = EmbeddingStore(self.cache_dir, model=self.embedding_model, dtype=self.embedding_precision)
+            logger.info(f"임베딩 캐시 로드: {len(self.ingredient_embeddings)}개 항목")
         except Exception as e:
             logger.error(f"캐시 로드 오류: {e}")
             self.ingredient_embeddings = {}
+        
+        self.embedding_matrix = EmbeddingMatrix(precision=self.embedding_precision)
+        if isinstance(self.ingredient_embeddings, EmbeddingStore):
+            self.embedding_matrix.add_array(*self.ingredient_embeddings.vectors())
+        
+        self.ann_index = IVFIndex(self.embedding_matrix)
+        if len(self.embedding_matrix):
+            self.ann_index.load(self.ann_index_path, model=self.embedding_model)
+        
+        # 오프라인 빌드 매니페스트 (similarity_artifacts.py). 없으면 요청 중에 임베딩을 채워 감
+        self.artifact_manifest = read_manifest(self.cache_dir)
+        if self.artifact_manifest is None:
+            logger.info("빌드된 유사도 산출물 없음 (python ingredient_similarity.py --build-index로 미리 만들 수 있음)")
+        elif self.artifact_manifest.get("model") != self.embedding_model:
+            logger.warning(f"유사도 산출물 모델({self.artifact_manifest.get('model')})이 현재 모델과 다릅니다")
+        else:
+            logger.info(
+                f"유사도 산출물 로드: 카탈로그 {self.artifact_manifest['catalog']['version']}, "
+                f"빌드 {self.artifact_manifest.get('built_at')}"
+            )
+    
+    def import_legacy_cache(self) -> int:
+        """
+        이전 버전의 JSON 캐시를 임베딩 저장소로 한 번 옮깁니다 (저장소가 비어 있을 때만).
+        서비스 생성(모듈 import) 중에는 디스크에 쓰지 않도록 앱 시작 시/명령줄에서 따로 호출합니다.
+        """
+        if not isinstance(self.ingredient_embeddings, EmbeddingStore) or len(self.ingredient_embeddings):
+            return 0
+        if not self.cache_file.exists():
+            return 0
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+            with self._write_lock:
+                added = self.ingredient_embeddings.put_many(legacy.items())
+                self.embedding_matrix.add_array(*self.ingredient_embeddings.vectors())
+        except Exception as e:
+            logger.error(f"JSON 임베딩 캐시 가져오기 오류: {e}")
+            return 0
+        logger.info(f"JSON 임베딩 캐시 가져오기: {added}개 항목 ({self.cache_file} → {self.cache_dir})")
+        return added
     
     def save_cache(self):
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.ingredient_embeddings, f, ensure_ascii=False, indent=2)
+            if isinstance(self.ingredient_embeddings, EmbeddingStore):
+                self.ingredient_embeddings.flush()
+                self.ann_index.save(self.ann_index_path, model=self.embedding_model)
         except Exception as e:
             logger.error(f"캐시 저장 오류: {e}")
     
@@ -220,15 +962,60 @@ class IngredientSimilarityService:
 def main():
     import argparse
     
-    parser = argparse.ArgumentParser(description="재료 유사도 판단 테스트")
+    # 앱(main.py)에서는 앱이 로깅을 설정하고, 명령줄로 실행할 때만 여기서 설정
+    setup_logging("ingredient-similarity")
+    
+    parser = argparse.ArgumentParser(description="재료 유사도 판단 테스트 / 배포 전 산출물 빌드")
     parser.add_argument("--test-pair", nargs=2, help="두 재료의 유사도 테스트 (예: --test-pair 두부 순두부)")
     parser.add_argument("--find-similar", help="유사한 재료 찾기 (예: --find-similar 두부)")
     parser.add_argument("--match-recipe", help="사용자 재료로 레시피 매칭 테스트")
-    parser.add_argument("--ollama-host", default="http://localhost:11434", help="Ollama 서버 주소")
+    parser.add_argument("--build-index", action="store_true",
+                        help="카탈로그 전체 재료의 임베딩을 채우고 ANN 색인을 새로 학습해 동의어 표/매니페스트와 함께 저장")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="카탈로그 재료 중 없는 임베딩만 받아 캐시를 채움 (ANN 색인은 증분 반영)")
+    parser.add_argument("--recipes", type=Path, help="레시피 JSON 경로 (기본: RECIPES_FILE 또는 data/recipes_updated.json)")
+    parser.add_argument("--cache-dir", help="산출물 디렉터리 (기본: EMBEDDING_CACHE_DIR 또는 DATA_DIR/ingredient_embeddings_cache)")
+    parser.add_argument("--workers", type=int, help="정규화/동의어 계산 프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--precision", choices=PRECISIONS,
+                        help="임베딩 저장 정밀도 (기본: EMBEDDING_PRECISION 또는 float32). 기존 캐시는 열 때 변환")
+    parser.add_argument("--benchmark-precision", action="store_true",
+                        help="캐시된 임베딩으로 정밀도별 메모리/검색 시간/float32 대비 recall@k 비교")
+    parser.add_argument("--benchmark-k", type=int, default=10, help="--benchmark-precision의 k")
+    parser.add_argument("--benchmark-size", type=int, default=50000,
+                        help="캐시가 1000개 미만일 때 대신 쓸 합성 임베딩 수")
+    parser.add_argument("--ollama-host", help="Ollama 서버 주소 (기본: OLLAMA_HOST 또는 http://localhost:11434)")
     
     args = parser.parse_args()
     
-    service = IngredientSimilarityService(ollama_host=args.ollama_host)
+    if args.cache_dir:
+        os.environ["EMBEDDING_CACHE_DIR"] = args.cache_dir
+    service = IngredientSimilarityService(ollama_host=args.ollama_host, precision=args.precision)
+    service.import_legacy_cache()
+    
+    if args.benchmark_precision:
+        vectors = np.zeros((0, 0), dtype=np.float32)
+        if isinstance(service.ingredient_embeddings, EmbeddingStore):
+            _, vectors = service.ingredient_embeddings.vectors()
+        if len(vectors) < 1000:
+            # 캐시가 작으면 클러스터가 있는 합성 임베딩으로 대신 측정
+            rng = np.random.default_rng(0)
+            centers = rng.standard_normal((max(1, args.benchmark_size // 50), FALLBACK_DIMENSIONS)).astype(np.float32)
+            vectors = centers[rng.integers(len(centers), size=args.benchmark_size)]
+            vectors += 0.5 * rng.standard_normal(vectors.shape).astype(np.float32)
+            print(f"캐시 임베딩이 부족해 합성 임베딩 {len(vectors)}개로 측정합니다")
+        for result in compare_precisions(vectors, k=args.benchmark_k):
+            print(
+                f"{result['precision']:>8}: {result['bytes'] / 2**20:8.1f} MB "
+                f"({result['bytes_per_vector']:.0f} B/벡터), 질의당 {result['query_ms']:.2f} ms, "
+                f"recall@{result['k']} {result['recall']:.4f}"
+            )
+        return 0
+    
+    if args.build_index or args.warm_cache:
+        manifest = build_artifacts(service, args.recipes, rebuild_index=args.build_index, workers=args.workers)
+        print(json.dumps(manifest, ensure_ascii=False, indent=2))
+        # 임베딩을 다 받지 못했으면 배포 스크립트가 알 수 있도록 실패로 종료
+        return 1 if manifest["failed"] else 0
     
     if args.test_pair:
         ingredient1, ingredient2 = args.test_pair
@@ -292,4 +1079,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,64 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# 이 모듈은 표준 라이브러리만 사용합니다. VLM 서버도 같은 파일을 그대로 import 합니다
+# (docker-compose.yml에서 vlm-server 컨테이너에 마운트).
+
+_SEPARATORS = re.compile(r"[\s_\-]+")
+
+
+def normalize_key(text: str) -> str:
+    """대소문자/공백/구분자 차이를 없앤 번역 키 ("  Green_Beans " → "green beans")"""
+    return _SEPARATORS.sub(" ", str(text).strip().lower()).strip()
+
+
+def singular_forms(key: str) -> List[str]:
+    """영어 복수형의 단수 후보들 (마지막 단어만 변형: "green beans" → ["green bean", ...])"""
+    head, _, last = key.rpartition(" ")
+    prefix = f"{head} " if head else ""
+    forms = []
+    if last.endswith("ies") and len(last) > 3:
+        forms.append(last[:-3] + "y")
+    if last.endswith(("oes", "ches", "shes", "xes", "ses")):
+        forms.append(last[:-2])
+    if last.endswith("s") and not last.endswith("ss") and len(last) > 1:
+        forms.append(last[:-1])
+    return [prefix + form for form in forms]
+
+
+class IngredientTranslator:
+    """
+    영어 재료명 → 한글 재료명 번역 인덱스.
+    맵을 한 번만 정규화해 두고, 조회 시에는 정규화 키와 단수형 후보만 해시 조회합니다.
+    """
+
+    def __init__(self, mapping: Optional[Dict[str, str]] = None):
+        self.index: Dict[str, str] = {}
+        for key, value in (mapping or {}).items():
+            self.index.setdefault(normalize_key(key), value)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def lookup(self, ingredient: str) -> Optional[str]:
+        key = normalize_key(ingredient)
+        if key in self.index:
+            return self.index[key]
+        for form in singular_forms(key):
+            if form in self.index:
+                return self.index[form]
+        return None
+
+    def translate(self, ingredient: str) -> str:
+        """번역이 없으면 원문을 그대로 돌려줍니다."""
+        return self.lookup(ingredient) or ingredient
+
+    def translate_many(self, ingredients: Iterable[str]) -> List[str]:
+        return [self.translate(ingredient) for ingredient in ingredients]
+
+
+def load_translator(path: Path) -> IngredientTranslator:
+    with open(path, "r", encoding="utf-8") as f:
+        return IngredientTranslator(json.load(f))
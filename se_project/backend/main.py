@@ -1,8 +1,43 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from structured_logging import RequestIdMiddleware, get_logger, setup_logging
+
+# 다른 모듈이 import 시점에 남기는 로그도 큐 핸들러를 타도록 가장 먼저 설정
+setup_logging("backend")
+logger = get_logger("main")
+
+import metrics
 import routes
+from recipe_catalog import catalog, ingredient_map_file
+from result_cache import caches
+from upstream import close_upstreams, start_upstreams, upstreams
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 레시피/번역 데이터는 시작 시 한 번 로드하고 이후에는 파일이 바뀔 때만 다시 읽음
+    # (파싱과 색인 빌드는 스레드에서, 이벤트 루프를 막지 않음)
+    await asyncio.to_thread(catalog.reload)
+    await asyncio.to_thread(ingredient_map_file.reload)
+    # 이전 JSON 임베딩 캐시는 import 시점이 아니라 앱 시작 시 한 번 옮김 (디스크 쓰기)
+    if enhanced_features:
+        from enhanced_routes import similarity_service
+        if hasattr(similarity_service, "import_legacy_cache"):
+            await asyncio.to_thread(similarity_service.import_legacy_cache)
+    # VLM/LLM 서버별 커넥션 풀을 앱 수명 동안 유지하고 종료 시 정리
+    app.state.upstreams = upstreams
+    await start_upstreams()
+    try:
+        yield
+    finally:
+        await close_upstreams()
 
-app = FastAPI(title="Recipe Recommendation API")
+app = FastAPI(
+    title="Recipe Recommendation API",
+    lifespan=lifespan,
+    default_response_class=metrics.TimedJSONResponse,
+)
 
 origins = [
     "http://localhost:3000", 
@@ -17,7 +52,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(RequestIdMiddleware)
 
 app.include_router(routes.router, prefix="/backend", tags=["Backend"])
 
@@ -25,9 +62,9 @@ try:
     from enhanced_routes import router as enhanced_router
     app.include_router(enhanced_router, prefix="/api/v2", tags=["Enhanced API"])
     enhanced_features = ["similarity_matching", "llm_embedding"]
-    print("✅ Enhanced routes loaded successfully")
+    logger.info("✅ Enhanced routes loaded successfully")
 except ImportError as e:
-    print(f"⚠️ Enhanced routes not available: {e}")
+    logger.warning(f"⚠️ Enhanced routes not available: {e}")
     enhanced_features = []
 
 @app.get("/")
@@ -42,5 +79,15 @@ async def health_check():
     return {
         "status": "healthy", 
         "timestamp": "2025-06-21",
-        "features": ["basic_recommendation"] + enhanced_features
+        "features": ["basic_recommendation"] + enhanced_features,
+        "catalog": {
+            "version": catalog.get().version,
+            "recipes": len(catalog.get()),
+        },
+        "upstreams": {name: upstream.status() for name, upstream in upstreams.items()},
+        "caches": {name: cache.status() for name, cache in caches.items()},
     }
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return metrics.metrics_response()
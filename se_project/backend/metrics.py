@@ -0,0 +1,187 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from starlette.responses import JSONResponse, Response
+
+# 세 서비스(backend, LLM, VLM)가 같이 쓰는 Prometheus 텍스트 포맷 메트릭 모듈.
+# 외부 의존성 없이 동작하도록 직접 구현했고, LLM/VLM 이미지에는 각 dockerfile에서 COPY합니다
+# (docker-compose.yml의 마운트는 개발 중 수정을 바로 반영하기 위한 것).
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+SERVICE = os.getenv("SERVICE_NAME", "backend")
+
+STAGE_SECONDS = registry.histogram(
+    "recipe_pipeline_stage_seconds", "파이프라인 단계별 처리 시간(초)", ("service", "stage")
+)
+RETRIES = registry.counter(
+    "recipe_pipeline_retries_total", "단계별 재시도(헤지 포함) 횟수", ("service", "stage")
+)
+FALLBACKS = registry.counter(
+    "recipe_pipeline_fallbacks_total", "대체 경로로 전환한 횟수", ("service", "stage", "reason")
+)
+CACHE_HITS = registry.counter("recipe_cache_hits_total", "캐시 적중 횟수", ("service", "cache"))
+CACHE_MISSES = registry.counter("recipe_cache_misses_total", "캐시 미스 횟수", ("service", "cache"))
+
+
+def set_service(name: str):
+    """LLM/VLM 서버처럼 모듈을 공유하는 다른 서비스가 service 라벨을 지정할 때 사용"""
+    global SERVICE
+    SERVICE = name
+
+
+def time_stage(stage: str):
+    """with metrics.time_stage("llm_call"): ... 형태로 단계 처리 시간을 기록"""
+    return STAGE_SECONDS.time(service=SERVICE, stage=stage)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, service=SERVICE, stage=stage)
+
+
+def count_retry(stage: str, amount: int = 1):
+    RETRIES.inc(amount, service=SERVICE, stage=stage)
+
+
+def count_fallback(stage: str, reason: str):
+    FALLBACKS.inc(service=SERVICE, stage=stage, reason=reason)
+
+
+def count_cache(cache: str, hit: bool, amount: int = 1):
+    (CACHE_HITS if hit else CACHE_MISSES).inc(amount, service=SERVICE, cache=cache)
+
+
+def metrics_response() -> Response:
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+class TimedJSONResponse(JSONResponse):
+    """응답 JSON 직렬화 시간을 response_serialization 단계로 기록하는 기본 응답 클래스"""
+
+    def render(self, content) -> bytes:
+        with time_stage("response_serialization"):
+            return super().render(content)
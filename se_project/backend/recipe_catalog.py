@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import metrics
+from ingredient_index import IngredientTokenIndex, RecipeMatchIndex
+from ingredient_normalizer import normalizer
+from ingredient_translation import IngredientTranslator
+from recipe_ids import make_recipe_id, normalize_recipe_name
+from structured_logging import get_logger
+from synonym_matcher import korean_synonyms
+
+BACKEND_DIR = Path(__file__).parent
+
+POSSIBLE_RECIPE_PATHS = [
+    Path("/app/data/recipes_updated.json"),                 # Docker 볼륨 마운트
+    Path("/app/project/data/recipes_updated.json"),
+    BACKEND_DIR.parent / "data" / "recipes_updated.json",   # 프로젝트 data 폴더
+    BACKEND_DIR / "data" / "recipes_updated.json",
+    Path("data/recipes_updated.json"),                      # 현재 디렉토리 기준
+    Path("../data/recipes_updated.json"),
+]
+
+POSSIBLE_INGREDIENT_MAP_PATHS = [
+    Path("/app/data/ingredient_kor_map.json"),
+    BACKEND_DIR.parent / "data" / "ingredient_kor_map.json",
+    Path("data/ingredient_kor_map.json"),
+]
+
+# 파일 변경 여부(mtime/size)를 확인하는 최소 간격(초)
+CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "1.0"))
+
+logger = get_logger(__name__)
+
+
+class FileSnapshot:
+    """한 번 파싱된 JSON 파일의 불변 스냅샷"""
+
+    def __init__(self, data: Any, path: Optional[Path], version: str, signature: Optional[Tuple[int, int]]):
+        self.data = data
+        self.path = path
+        self.version = version
+        self.signature = signature
+        self.loaded_at = time.time()
+
+
+class HotReloadJsonFile:
+    """
+    JSON 파일을 프로세스당 한 번만 파싱해 두고, 파일의 mtime/size가 바뀐 경우에만
+    다시 읽어 스냅샷을 통째로 교체합니다. 요청 처리 중에는 get()이 돌려준 스냅샷만
+    사용하므로 리로드 도중에도 항상 일관된 데이터를 보게 됩니다.
+    파일이 바뀌면 get()은 새 스냅샷(파싱 + 색인 빌드)을 백그라운드 스레드에서 만들고,
+    준비될 때까지 기존 스냅샷을 그대로 돌려줍니다 (요청/이벤트 루프에서 빌드하지 않음).
+    """
+
+    def __init__(self, candidates: Sequence[Path], name: str, check_interval: float = CHECK_INTERVAL, stage: str = "file_load"):
+        env_path = os.getenv(f"{name.upper()}_FILE")
+        self.candidates = [Path(env_path)] + list(candidates) if env_path else list(candidates)
+        self.name = name
+        self.stage = stage
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # 백그라운드 리로드 스레드 (빌드 중에 _lock을 잡고 있으므로 확인용 락은 따로 둠)
+        self._reloader: Optional[threading.Thread] = None
+        self._reloader_lock = threading.Lock()
+        self._snapshot = self._empty_snapshot()
+        self._last_check = 0.0
+        self._missing_reported = False
+
+    def find_file(self) -> Optional[Path]:
+        for path in self.candidates:
+            if path.is_file():
+                return path
+        return None
+
+    def get(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return self._snapshot
+        self._last_check = now
+
+        path, signature = self._stat()
+        snapshot = self._snapshot
+        if path == snapshot.path and signature == snapshot.signature:
+            return snapshot
+        if snapshot.path is None:
+            # 아직 아무것도 로드하지 않았으면 돌려줄 스냅샷이 없으므로 바로 읽음
+            return self.reload()
+        self.reload_in_background()
+        return snapshot
+
+    def reload_in_background(self):
+        """새 스냅샷을 별도 스레드에서 만들고 완성되면 교체 (이미 진행 중이면 아무것도 안 함)"""
+        with self._reloader_lock:
+            if self._reloader is not None and self._reloader.is_alive():
+                return
+            self._reloader = threading.Thread(target=self.reload, name=f"{self.name}-reload", daemon=True)
+            self._reloader.start()
+
+    def reload(self):
+        """파일이 바뀌었으면 새 스냅샷을 만들어 교체하고 돌려줌 (동기, 시작 시/백그라운드 스레드에서 호출)"""
+        with self._lock:
+            path, signature = self._stat()
+            current = self._snapshot
+            if path is not None and path == current.path and signature == current.signature:
+                return current
+
+            if path is None:
+                if not self._missing_reported:
+                    logger.error(
+                        f"❌ {self.name} 파일을 찾을 수 없음. 확인한 경로들: {', '.join(str(c) for c in self.candidates)}"
+                    )
+                    self._missing_reported = True
+                return current
+
+            try:
+                with metrics.time_stage(self.stage):
+                    raw = path.read_bytes()
+                    data = json.loads(raw.decode("utf-8"))
+                    version = hashlib.sha1(raw).hexdigest()[:16]
+                    snapshot = self._build_snapshot(data, path, version, signature)
+            except Exception as e:
+                # 쓰는 도중의 파일 등 파싱 실패 시 기존 스냅샷을 유지하고 다음 확인 때 재시도
+                logger.error(f"❌ {self.name} 파일 로드 실패 {path}: {e}")
+                return current
+
+            self._snapshot = snapshot
+            self._missing_reported = False
+            logger.info(f"✅ {self.name} 로드: {path} (version {version})")
+            return snapshot
+
+    def _stat(self) -> Tuple[Optional[Path], Optional[Tuple[int, int]]]:
+        path = self._snapshot.path
+        if path is None or not path.is_file():
+            path = self.find_file()
+        if path is None:
+            return None, None
+        try:
+            stat = path.stat()
+        except OSError:
+            return None, None
+        return path, (stat.st_mtime_ns, stat.st_size)
+
+    def _empty_snapshot(self):
+        return FileSnapshot(None, None, "empty", None)
+
+    def _build_snapshot(self, data: Any, path: Path, version: str, signature: Tuple[int, int]):
+        return FileSnapshot(data, path, version, signature)
+
+
+class CatalogSnapshot(FileSnapshot):
+    """레시피 목록 스냅샷. recipes는 모든 요청이 공유하므로 수정하면 안 됩니다."""
+
+    def __init__(self, recipes: List[Dict], path: Optional[Path], version: str, signature: Optional[Tuple[int, int]]):
+        self.recipes = []
+        self.by_id: Dict[str, Dict] = {}
+        self.by_name: Dict[str, Dict] = {}
+        self.position_by_id: Dict[str, int] = {}
+
+        for recipe in recipes:
+            if not isinstance(recipe, dict):
+                continue
+            recipe_id = str(recipe.get("id") or make_recipe_id(recipe.get("name", "")))
+            if recipe_id in self.by_id:
+                # 이름이 중복된 레시피는 등장 순서대로 접미사를 붙여 구분
+                suffix = 2
+                while f"{recipe_id}-{suffix}" in self.by_id:
+                    suffix += 1
+                recipe_id = f"{recipe_id}-{suffix}"
+
+            recipe = dict(recipe, id=recipe_id)
+            self.position_by_id[recipe_id] = len(self.recipes)
+            self.recipes.append(recipe)
+            self.by_id[recipe_id] = recipe
+            self.by_name.setdefault(normalize_recipe_name(recipe.get("name", "")), recipe)
+
+        # 로컬 추천용 재료 토큰 역색인 (요청 시점에는 posting list 조회만 수행)
+        self.ingredient_index = IngredientTokenIndex(self.recipes)
+        # 레시피별 정규 재료 ID 집합 (수량/단위 제거, "또는" 분리. 요청 시점에는 교집합만 계산)
+        self.canonical_ingredients: List[FrozenSet[int]] = [
+            normalizer.recipe_ids(ingredient for ingredient in recipe.get("ingredients", []) if isinstance(ingredient, str))
+            for recipe in self.recipes
+        ]
+        # 레시피 재료별 동의어 그룹을 미리 계산 (요청 시점에는 집합 비교만 수행)
+        korean_synonyms.warm(
+            ingredient for recipe in self.recipes for ingredient in recipe.get("ingredients", []) if isinstance(ingredient, str)
+        )
+        # 유사도 top-k용 재료 문자열/동의어 그룹 → 레시피 역색인 (요청 시점에는 건드린 레시피만 확인)
+        self.match_index = RecipeMatchIndex(self.recipes, korean_synonyms)
+
+        super().__init__(self.recipes, path, version, signature)
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def get_by_id(self, recipe_id: Optional[str]) -> Optional[Dict]:
+        if not recipe_id:
+            return None
+        return self.by_id.get(recipe_id)
+
+    def find_by_name(self, name: Optional[str]) -> Optional[Dict]:
+        if not name:
+            return None
+        return self.by_name.get(normalize_recipe_name(name))
+
+    def canonical_ids(self, recipe: Dict) -> FrozenSet[int]:
+        """레시피의 정규 재료 ID 집합. 이 스냅샷의 레시피가 아니면(기본 레시피 등) 그 자리에서 계산"""
+        position = self.position_by_id.get(recipe.get("id"))
+        if position is not None and self.recipes[position] is recipe:
+            return self.canonical_ingredients[position]
+        return normalizer.recipe_ids(ingredient for ingredient in recipe.get("ingredients", []) if isinstance(ingredient, str))
+
+    def lookup_many(self, items: List[Dict]) -> List[Optional[Dict]]:
+        """
+        LLM 응답처럼 id 또는 title/name을 가진 항목들을 한 번에 카탈로그 레시피로 매핑합니다.
+        항목당 해시 조회 1~2회이므로 전체 비용은 O(k)입니다.
+        """
+        results = []
+        for item in items:
+            recipe = self.get_by_id(item.get("id"))
+            if recipe is None:
+                recipe = self.find_by_name(item.get("title") or item.get("name"))
+            results.append(recipe)
+        return results
+
+
+class RecipeCatalog(HotReloadJsonFile):
+
+    def __init__(self, candidates: Sequence[Path] = POSSIBLE_RECIPE_PATHS, check_interval: float = CHECK_INTERVAL):
+        super().__init__(candidates, "recipes", check_interval, stage="catalog_load")
+
+    def _empty_snapshot(self):
+        return CatalogSnapshot([], None, "empty", None)
+
+    def _build_snapshot(self, data: Any, path: Path, version: str, signature: Tuple[int, int]):
+        if not isinstance(data, list):
+            raise ValueError("레시피 파일은 JSON 배열이어야 합니다")
+        return CatalogSnapshot(data, path, version, signature)
+
+    @property
+    def recipes(self) -> List[Dict]:
+        return self.get().recipes
+
+
+class TranslationSnapshot(FileSnapshot):
+    """영→한 재료 번역 맵 스냅샷. 정규화된 키로 컴파일된 translator를 함께 보관합니다."""
+
+    def __init__(self, mapping: Dict[str, str], path: Optional[Path], version: str, signature: Optional[Tuple[int, int]]):
+        super().__init__(mapping, path, version, signature)
+        self.translator = IngredientTranslator(mapping)
+
+
+class IngredientMapFile(HotReloadJsonFile):
+
+    def __init__(self, candidates: Sequence[Path] = POSSIBLE_INGREDIENT_MAP_PATHS, check_interval: float = CHECK_INTERVAL):
+        super().__init__(candidates, "ingredient_map", check_interval, stage="ingredient_map_load")
+
+    def _empty_snapshot(self):
+        return TranslationSnapshot({}, None, "empty", None)
+
+    def _build_snapshot(self, data: Any, path: Path, version: str, signature: Tuple[int, int]):
+        if not isinstance(data, dict):
+            raise ValueError("번역 맵 파일은 JSON 객체여야 합니다")
+        return TranslationSnapshot(data, path, version, signature)
+
+    @property
+    def translator(self) -> IngredientTranslator:
+        return self.get().translator
+
+
+# 프로세스 전역 인스턴스 (main.py의 lifespan에서 미리 로드)
+catalog = RecipeCatalog()
+ingredient_map_file = IngredientMapFile()
@@ -0,0 +1,17 @@
+import hashlib
+
+# 레시피 ID 규칙. 백엔드(recipe_catalog.py)와 LLM 서버가 함께 사용합니다.
+
+
+def normalize_recipe_name(name: str) -> str:
+    """대소문자/공백 차이를 없앤 레시피 이름 (이름 인덱스 키)"""
+    return " ".join(str(name).casefold().split())
+
+
+def make_recipe_id(name: str) -> str:
+    """
+    레시피 이름에서 안정적인 ID를 만듭니다. 파일 내 순서나 리로드와 무관하게 같은 이름은
+    항상 같은 ID가 되므로 두 서비스가 같은 레시피를 같은 ID로 가리킵니다.
+    """
+    digest = hashlib.sha1(normalize_recipe_name(name).encode("utf-8")).hexdigest()
+    return f"r{digest[:12]}"
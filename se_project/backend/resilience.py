@@ -0,0 +1,311 @@
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+T = TypeVar("T")
+
+
+class CircuitBreakerOpen(Exception):
+    """차단기가 열려 있어 업스트림 호출을 시도하지 않은 경우"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open (retry after {retry_after:.1f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class RequestAborted(Exception):
+    """호출 측 사정(클라이언트 연결 끊김, 업로드 크기 초과 등)으로 업스트림 호출을 중단한 경우.
+    업스트림의 실패가 아니므로 차단기 통계에 넣지 않습니다."""
+
+
+class CircuitBreaker:
+    """
+    최근 window_size개 호출의 실패율/지연율로 동작하는 closed → open → half_open 차단기.
+
+    - closed: 모든 요청 허용. 최소 min_calls 이상 쌓인 상태에서 실패율이나
+      느린 호출(slow_call_threshold초 이상) 비율이 임계값을 넘으면 open
+    - open: open_duration초 동안 호출 없이 바로 거절 (호출 측은 로컬 대체 경로 사용)
+    - half_open: 시험 호출 half_open_max_calls개만 허용. 성공하면 closed, 실패하면 다시 open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 20,
+        min_calls: int = 5,
+        failure_rate_threshold: float = 0.5,
+        slow_call_threshold: float = 10.0,
+        slow_call_rate_threshold: float = 0.8,
+        open_duration: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = self.CLOSED
+        self._results = deque(maxlen=window_size)  # (failed, slow)
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self.open_count = 0
+        self.rejected_count = 0
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_duration:
+                self.rejected_count += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._half_open_in_flight >= self.half_open_max_calls:
+                self.rejected_count += 1
+                return False
+            self._half_open_in_flight += 1
+
+        return True
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.open_duration - (time.monotonic() - self._opened_at))
+
+    def record_success(self, latency: float):
+        slow = latency >= self.slow_call_threshold
+        if self.state == self.HALF_OPEN:
+            if slow:
+                self._open()
+            else:
+                self._close()
+            return
+        self._results.append((False, slow))
+        self._evaluate()
+
+    def record_failure(self, latency: float = 0.0):
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self._results.append((True, latency >= self.slow_call_threshold))
+        self._evaluate()
+
+    def record_cancelled(self):
+        if self.state == self.HALF_OPEN and self._half_open_in_flight > 0:
+            self._half_open_in_flight -= 1
+
+    def _evaluate(self):
+        if self.state != self.CLOSED or len(self._results) < self.min_calls:
+            return
+        calls = len(self._results)
+        failure_rate = sum(1 for failed, _ in self._results if failed) / calls
+        slow_rate = sum(1 for _, slow in self._results if slow) / calls
+        if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._half_open_in_flight = 0
+        self.open_count += 1
+        logger.warning(f"⚠️ {self.name} 차단기 open ({self.open_duration:.0f}초 동안 로컬 대체 경로 사용)")
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._results.clear()
+        self._half_open_in_flight = 0
+        logger.info(f"✅ {self.name} 차단기 closed")
+
+    def status(self) -> Dict:
+        calls = len(self._results)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "failure_rate": round(sum(1 for failed, _ in self._results if failed) / calls, 3) if calls else 0.0,
+            "slow_call_rate": round(sum(1 for _, slow in self._results if slow) / calls, 3) if calls else 0.0,
+            "retry_after": round(self.retry_after(), 1),
+            "open_count": self.open_count,
+            "rejected_count": self.rejected_count,
+        }
+
+
+class LatencyTracker:
+    """최근 성공 호출들의 지연 시간(초)을 보관하고 백분위수를 계산합니다."""
+
+    def __init__(self, window_size: int = 200):
+        self._samples = deque(maxlen=window_size)
+
+    def record(self, latency: float):
+        self._samples.append(latency)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+
+class Backoff:
+    """
+    업스트림 전체에 대한 지수 백오프 (스레드 안전).
+
+    - 실패하면 base초, 이후 연속 실패마다 factor배씩 (최대 max_delay초, ±jitter) 호출을 막음
+    - 대기가 끝나면 allow()가 시험 호출 하나만 통과시키고, 결과가 나올 때까지(또는 다음 대기 시간이
+      지날 때까지) 나머지는 계속 막음. 시험 호출이 성공하면 초기화, 실패하면 대기 시간이 늘어남
+    - 이미 막힌 동안 도착한 실패(같은 장애로 동시에 실패한 다른 호출)는 대기 시간을 늘리지 않음
+    """
+
+    def __init__(self, name: str, base: float = 1.0, factor: float = 2.0, max_delay: float = 60.0, jitter: float = 0.1):
+        self.name = name
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+        self.failures = 0
+        self.skipped_count = 0
+        self._until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _delay(self) -> float:
+        delay = min(self.max_delay, self.base * self.factor ** max(0, self.failures - 1))
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def blocked(self) -> bool:
+        """호출을 건너뛰어야 하는 상태인지 (시험 호출 권한을 가져가지 않음)"""
+        return self.failures > 0 and time.monotonic() < self._until
+
+    def allow(self) -> bool:
+        with self._lock:
+            if not self.failures:
+                return True
+            now = time.monotonic()
+            if now < self._until:
+                self.skipped_count += 1
+                return False
+            # 시험 호출: 결과가 늦어져도 다음 대기 시간이 지나면 다시 시도할 수 있도록 기한을 둠
+            self._probing = True
+            self._until = now + self._delay()
+            return True
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.failures and not self._probing and now < self._until:
+                return
+            self.failures += 1
+            self._probing = False
+            delay = self._delay()
+            self._until = now + delay
+        logger.warning(f"⚠️ {self.name} 호출 실패 {self.failures}회 연속, {delay:.1f}초 동안 건너뜀")
+
+    def record_success(self):
+        with self._lock:
+            recovered = self.failures > 0
+            self.failures = 0
+            self._probing = False
+            self._until = 0.0
+        if recovered:
+            logger.info(f"✅ {self.name} 호출 복구")
+
+    def retry_after(self) -> float:
+        return max(0.0, self._until - time.monotonic()) if self.failures else 0.0
+
+    def status(self) -> Dict:
+        return {
+            "blocked": self.blocked(),
+            "consecutive_failures": self.failures,
+            "retry_after": round(self.retry_after(), 1),
+            "skipped_count": self.skipped_count,
+        }
+
+
+class NegativeCache:
+    """
+    실패한 키를 TTL 동안 기억해 다시 시도하지 않게 합니다 (스레드 안전).
+    같은 키가 또 실패하면 TTL이 ttl × factor^(실패 횟수 - 1)로 늘어나고 (최대 max_ttl),
+    성공하면 지웁니다. max_entries를 넘으면 가장 오래 갱신되지 않은 키부터 버립니다.
+    """
+
+    def __init__(self, ttl: float = 30.0, factor: float = 2.0, max_ttl: float = 600.0, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.factor = factor
+        self.max_ttl = max_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # 키 → (실패 횟수, 만료 시각)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        """key가 아직 TTL 안에 있는지 (만료돼도 실패 횟수는 다음 TTL 계산을 위해 남겨 둠)"""
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() < entry[1]
+
+    def record_failure(self, key: str):
+        with self._lock:
+            failures = self._entries.pop(key, (0, 0.0))[0] + 1
+            ttl = min(self.max_ttl, self.ttl * self.factor ** (failures - 1))
+            self._entries[key] = (failures, time.monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_success(self, key: str):
+        if key in self._entries:
+            with self._lock:
+                self._entries.pop(key, None)
+
+    def status(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            active = sum(1 for _, until in self._entries.values() if now < until)
+        return {"entries": len(self._entries), "active": active, "ttl": self.ttl, "max_ttl": self.max_ttl}
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay: float, on_hedge: Optional[Callable[[], None]] = None) -> T:
+    """
+    call()을 실행하고 delay초 안에 끝나지 않으면 같은 호출을 한 번 더 보냅니다.
+    먼저 성공한 결과를 돌려주고 나머지는 취소합니다. 둘 다 실패하면 마지막 예외를 다시 던집니다.
+    """
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return tasks[0].result()
+
+        if on_hedge:
+            on_hedge()
+        tasks.append(asyncio.ensure_future(call()))
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import metrics
+
+
+def canonical_ingredients(ingredients: Iterable[str]) -> Tuple[str, ...]:
+    """순서/대소문자/공백/중복 차이를 없앤 재료 튜플 (캐시 키용)"""
+    normalized = {" ".join(str(ingredient).casefold().split()) for ingredient in ingredients}
+    normalized.discard("")
+    return tuple(sorted(normalized))
+
+
+class ResultCache:
+    """
+    추천 결과용 LRU + TTL 캐시.
+
+    - 최대 max_entries개를 보관하고 ttl초가 지나면 만료
+    - 같은 키로 동시에 들어온 요청은 하나의 계산(single-flight)을 함께 기다림.
+      계산은 별도 태스크에서 돌기 때문에 먼저 온 클라이언트가 끊어도 나머지 요청은 결과를 받음
+    - version(카탈로그 버전)이 바뀌면 저장된 결과를 모두 버림
+    """
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl: float = 300.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # (version, key) → 진행 중 계산. 리로드 뒤 요청이 이전 스냅샷으로 시작한 계산에 합류하지 않도록
+        self._inflight: Dict[Tuple[Optional[str], Hashable], asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, version: Optional[str]):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        version: Optional[str] = None,
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """캐시된 값을 돌려주거나, 진행 중인 같은 계산에 합류하거나, 새로 계산합니다."""
+        self._check_version(version)
+
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            metrics.count_cache(self.name, hit=True)
+            return value
+
+        inflight_key = (version, key)
+        task = self._inflight.get(inflight_key)
+        if task is not None:
+            self.coalesced += 1
+            metrics.count_cache(self.name, hit=True)
+        else:
+            self.misses += 1
+            metrics.count_cache(self.name, hit=False)
+            task = asyncio.ensure_future(compute())
+            self._inflight[inflight_key] = task
+
+            def on_done(done: asyncio.Task):
+                self._inflight.pop(inflight_key, None)
+                if done.cancelled() or done.exception() is not None:
+                    return
+                # 계산 도중 카탈로그가 바뀌었으면 이전 버전 결과는 저장하지 않음
+                if self.version == version and cacheable(done.result()):
+                    self.put(key, done.result())
+
+            task.add_done_callback(on_done)
+
+        return await asyncio.shield(task)
+
+    def clear(self):
+        self._entries.clear()
+
+    def status(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+MAX_ENTRIES = _env_int("RESULT_CACHE_SIZE", 1024)
+TTL_SECONDS = _env_float("RESULT_CACHE_TTL", 300.0)
+
+recommend_cache = ResultCache("recommend", MAX_ENTRIES, TTL_SECONDS)
+enhanced_recommend_cache = ResultCache("enhanced_recommend", MAX_ENTRIES, TTL_SECONDS)
+
+caches: Dict[str, ResultCache] = {
+    cache.name: cache for cache in (recommend_cache, enhanced_recommend_cache)
+}
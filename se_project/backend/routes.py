@@ -1,37 +1,27 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, Query, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
 import asyncio
-import httpx
+import base64
+import hashlib
+import heapq
 import json
-import os
-from pathlib import Path
-
-router = APIRouter()
-
-VLM_SERVER_URL = os.getenv("VLM_SERVER_URL", "http://vlm-server:8001") 
-LLM_SERVER_URL = os.getenv("LLM_SERVER_URL", "http://llm-server:8002")
+import httpx
 
+import metrics
+from dependencies import get_llm_upstream, get_vlm_upstream
+from recipe_catalog import catalog, ingredient_map_file
+from resilience import CircuitBreakerOpen, RequestAborted
+from result_cache import canonical_ingredients, recommend_cache
+from structured_logging import get_logger, sampled
+from upload_proxy import SIZE_ERROR, UploadStream, UploadTooLarge
+from upstream import Upstream
 
-POSSIBLE_RECIPE_PATHS = [
-    Path("/app/data/recipes_updated.json"),           
-    Path("/app/project/data/recipes_updated.json"),   
-    Path(__file__).parent.parent / "data" / "recipes_updated.json",  
-    Path(__file__).parent / "data" / "recipes_updated.json",     
-    Path("data/recipes_updated.json"),  
-]
+router = APIRouter()
 
-def find_recipes_file():
-    for path in POSSIBLE_RECIPE_PATHS:
-        if path.exists():
-            print(f"✅ 레시피 파일 발견: {path}")
-            return path
-    print(f"❌ 레시피 파일을 찾을 수 없음. 확인한 경로들:")
-    for path in POSSIBLE_RECIPE_PATHS:
-        print(f"   - {path} (존재: {path.exists()})")
-    return None
+logger = get_logger(__name__)
 
-RECIPES_FILE = find_recipes_file()
 
 class RecommendRequest(BaseModel):
     ingredients: List[str]
@@ -39,270 +29,326 @@ class RecommendRequest(BaseModel):
     difficulty_max: int = 3
 
 class Recipe(BaseModel):
+    id: Optional[str] = None
     name: str
     ingredients: List[str]
     time: int
     difficulty: str
     steps: List[str]
 
-@router.post("/recognize")
-async def recognize_ingredients(file: UploadFile = File(...)):
-    # 파일 검증
-    if not file.content_type or not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail="이미지 파일만 업로드 가능합니다.")
+# 본문을 직접 스트리밍하므로 문서(OpenAPI)에만 업로드 형식을 명시
+RECOGNIZE_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+@router.post("/recognize", openapi_extra=RECOGNIZE_OPENAPI)
+async def recognize_ingredients(
+    request: Request,
+    vlm: Upstream = Depends(get_vlm_upstream),
+):
+    # 업로드를 메모리에 모으지 않고 multipart 본문 그대로 VLM 서버로 흘려보냄
+    upload = UploadStream(request)
     
     try:
-        # VLM 서버로 이미지 전송
-        files = {"file": (file.filename, await file.read(), file.content_type)}
+        # 파일 검증 (첫 파트 헤더만 미리 읽음)
+        await upload.inspect()
         
-        # 연결 재시도 로직
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                print(f"VLM 서버 연결 시도 {attempt + 1}/{max_retries}: {VLM_SERVER_URL}")
+        try:
+            # VLM 서버로 이미지 전송 (재시도 대신 차단기가 실패를 판단)
+            logger.debug(f"VLM 서버 호출: {vlm.base_url}")
+            response = await vlm.post("/recognize", content=upload.body(), headers=upload.headers())
+            
+            if response.status_code == 200:
+                data = response.json()
+                ingredients = data.get("ingredients", [])
                 
-                async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0)) as client:
-                    response = await client.post(f"{VLM_SERVER_URL}/recognize", files=files)
-                    
-                if response.status_code == 200:
-                    data = response.json()
-                    ingredients = data.get("ingredients", [])
-                    
-                    if ingredients:
-                        print(f"VLM 서버에서 재료 인식 성공: {ingredients}")
-                        return {"ingredients": ingredients}
-                    else:
-                        print("VLM 서버 응답에 재료 데이터가 없음")
-                        
+                if ingredients:
+                    logger.info(f"VLM 서버에서 재료 인식 성공: {ingredients}")
+                    return {"ingredients": ingredients}
                 else:
-                    print(f"VLM 서버 HTTP 오류: {response.status_code} - {response.text}")
-                    
-            except httpx.ConnectError as e:
-                print(f"VLM 서버 연결 실패 (시도 {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2)  # 2초 대기 후 재시도
-                    continue
+                    logger.warning("VLM 서버 응답에 재료 데이터가 없음")
                     
-            except httpx.TimeoutException:
-                print(f"VLM 서버 타임아웃 (시도 {attempt + 1})")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
-                    continue
-                    
-            except Exception as e:
-                print(f"VLM 서버 기타 오류 (시도 {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
-                    continue
+            else:
+                logger.warning(f"VLM 서버 HTTP 오류: {response.status_code} - {response.text}")
+                metrics.count_fallback("vlm_call", f"http_{response.status_code}")
+                
+        except CircuitBreakerOpen as e:
+            logger.warning(f"VLM 서버 차단 상태, 호출 생략: {e}")
+            metrics.count_fallback("vlm_call", "circuit_open")
+            
+        except httpx.ConnectError as e:
+            logger.warning(f"VLM 서버 연결 실패: {e}")
+            metrics.count_fallback("vlm_call", "connect_error")
+            
+        except httpx.TimeoutException:
+            logger.warning("VLM 서버 타임아웃")
+            metrics.count_fallback("vlm_call", "timeout")
+            
+        except httpx.HTTPError as e:
+            logger.warning(f"VLM 서버 기타 오류: {e}")
+            metrics.count_fallback("vlm_call", "http_error")
         
-        # 모든 재시도 실패 시
         raise HTTPException(
             status_code=503, 
             detail="이미지 인식 서버에 연결할 수 없습니다. VLM 서버가 실행 중인지 확인해주세요."
         )
         
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail=SIZE_ERROR)
+    except RequestAborted as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
-        print(f"이미지 처리 중 예상치 못한 오류: {e}")
+        logger.error(f"이미지 처리 중 예상치 못한 오류: {e}")
         raise HTTPException(status_code=500, detail=f"이미지 처리 중 오류가 발생했습니다: {str(e)}")
 
 @router.post("/recommend")
-async def recommend_recipes(req: RecommendRequest):
+async def recommend_recipes(req: RecommendRequest, llm: Upstream = Depends(get_llm_upstream)):
     """
     Recommend recipes based on recognized ingredients.
     """
     if not req.ingredients:
         raise HTTPException(status_code=400, detail="재료 목록이 비어있습니다.")
     
+    async def compute() -> Optional[List[Dict]]:
+        data = await fetch_llm_recommendations(req, llm)
+        return format_llm_recipes(data) if data else None
+    
     try:
-        # LLM 서버에 레시피 추천 요청
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                print(f"LLM 서버 연결 시도 {attempt + 1}/{max_retries}: {LLM_SERVER_URL}")
-                
-                async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0)) as client:
-                    response = await client.post(
-                        f"{LLM_SERVER_URL}/recommend",
-                        json={
-                            "ingredients": req.ingredients,
-                            "max_time": req.max_time,
-                            "difficulty_max": req.difficulty_max
-                        }
-                    )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    print(f"LLM 서버에서 레시피 추천 성공: {len(data)}개 레시피")
-                    print(f"LLM 응답 데이터 구조: {data}")
-                    
-                    formatted_recipes = []
-                    for i, recipe in enumerate(data):
-                        print(f"레시피 {i+1} 원본 데이터: {recipe}")
-                        
-                        recipe_name = recipe.get("title", recipe.get("name", ""))
-                        
-                        local_recipe = await find_local_recipe_by_name(recipe_name)
-                        
-                        if local_recipe:
-                            recipe_ingredients = local_recipe.get("ingredients", [])
-                            recipe_steps = local_recipe.get("steps", [])
-                            print(f"로컬에서 {recipe_name} 데이터 보완 완료")
-                        else:
-                            recipe_ingredients = ["재료 정보를 준비 중입니다"]
-                            recipe_steps = ["조리 방법을 준비 중입니다"]
-                            print(f"로컬에서 {recipe_name} 데이터를 찾지 못함")
-                        
-                        formatted_recipe = {
-                            "name": recipe_name,
-                            "summary": recipe.get("summary", "맛있는 요리"),
-                            "time": recipe.get("cook_time_min", recipe.get("time", 30)),
-                            "difficulty": recipe.get("difficulty", 2),
-                            "ingredients": recipe_ingredients,  # 로컬에서 가져온 실제 재료
-                            "steps": recipe_steps  # 로컬에서 가져온 실제 조리법
-                        }
-                        
-                        print(f"최종 변환된 레시피 {i+1}: {formatted_recipe['name']} - 재료 {len(formatted_recipe['ingredients'])}개, 조리법 {len(formatted_recipe['steps'])}단계")
-                        formatted_recipes.append(formatted_recipe)
-                    
-                    if formatted_recipes:
-                        return {"recipes": formatted_recipes}
-                    else:
-                        print("LLM 서버 응답에 레시피 데이터가 없음")
-                        
-                else:
-                    print(f"LLM 서버 HTTP 오류: {response.status_code} - {response.text}")
-                    
-            except httpx.ConnectError as e:
-                print(f"LLM 서버 연결 실패 (시도 {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2)
-                    continue
-                    
-            except httpx.TimeoutException:
-                print(f"LLM 서버 타임아웃 (시도 {attempt + 1})")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
-                    continue
-                    
-            except Exception as e:
-                print(f"LLM 서버 기타 오류 (시도 {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
-                    continue
+        # 같은 재료/조건 요청은 캐시된 LLM 결과를 쓰고, 동시에 들어온 요청은 한 번만 LLM을 호출
+        # (로컬 대체 결과는 LLM이 복구되면 바로 반영되도록 캐시하지 않음)
+        key = (canonical_ingredients(req.ingredients), req.max_time, req.difficulty_max)
+        formatted_recipes = await recommend_cache.get_or_compute(
+            key, compute, version=catalog.get().version, cacheable=bool
+        )
+        if formatted_recipes:
+            return {"recipes": formatted_recipes}
         
         # LLM 서버 연결 실패 시 로컬 레시피 데이터 사용
-        print("LLM 서버 연결 실패, 로컬 레시피 데이터 사용")
+        logger.info("LLM 서버 결과 없음, 로컬 레시피 데이터 사용")
+        metrics.count_fallback("recommend", "local_matching")
         return await get_local_recipes_with_smart_matching(req)
             
     except Exception as e:
-        print(f"레시피 추천 중 예상치 못한 오류: {e}")
+        logger.error(f"레시피 추천 중 예상치 못한 오류: {e}")
+        metrics.count_fallback("recommend", "error")
         return await get_local_recipes_with_smart_matching(req)
 
-async def find_local_recipe_by_name(recipe_name: str):
-    try:
-        current_recipes_file = find_recipes_file()
-        if not current_recipes_file:
-            return None
+@router.post("/recommend/stream")
+async def recommend_recipes_stream(
+    req: RecommendRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$"),
+    llm: Upstream = Depends(get_llm_upstream),
+):
+    """
+    /recommend의 스트리밍 버전. 카탈로그 기반 로컬 매칭 결과를 먼저 보내고,
+    LLM 결과는 하나씩 보완되는 대로 보낸 뒤 마지막에 완료 프레임을 보냅니다.
+
+    프레임: {"type": "local", "recipes": [...]} → {"type": "recipe", "index": i, "recipe": {...}} ...
+            → {"type": "done", "source": "llm" | "local", "count": n}
+    format=sse이면 같은 프레임을 `event: <type>` / `data: <json>` 형식으로 보냅니다.
+    """
+    if not req.ingredients:
+        raise HTTPException(status_code=400, detail="재료 목록이 비어있습니다.")
+    
+    def frame(payload: Dict) -> str:
+        data = json.dumps(payload, ensure_ascii=False)
+        if format == "sse":
+            return f"event: {payload['type']}\ndata: {data}\n\n"
+        return data + "\n"
+    
+    async def generate():
+        # LLM 호출은 바로 시작해 두고, 그동안 로컬 매칭 결과를 먼저 보냄
+        llm_task = asyncio.ensure_future(fetch_llm_recommendations(req, llm))
+        count = 0
+        try:
+            local_result = await get_local_recipes_with_smart_matching(req)
+            yield frame({"type": "local", "recipes": local_result.get("recipes", [])})
+            
+            try:
+                data = await llm_task
+                if data:
+                    local_recipes = catalog.get().lookup_many(data)
+                    for recipe, local_recipe in zip(data, local_recipes):
+                        with metrics.time_stage("local_enrichment"):
+                            formatted_recipe = format_llm_recipe(recipe, local_recipe)
+                        yield frame({"type": "recipe", "index": count, "recipe": formatted_recipe})
+                        count += 1
+            except Exception as e:
+                logger.error(f"스트리밍 추천 중 예상치 못한 오류: {e}")
+                yield frame({"type": "error", "message": "LLM 추천 중 오류가 발생했습니다."})
             
-        with open(current_recipes_file, 'r', encoding='utf-8') as f:
-            all_recipes = json.load(f)
+            yield frame({"type": "done", "source": "llm" if count else "local", "count": count})
+        finally:
+            # 클라이언트가 중간에 끊으면 진행 중인 LLM 호출도 취소
+            if not llm_task.done():
+                llm_task.cancel()
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+async def fetch_llm_recommendations(req: RecommendRequest, llm: Upstream) -> Optional[List[Dict]]:
+    """LLM 서버의 원본 추천 목록을 돌려줍니다. 차단기가 열려 있거나 실패하면 None"""
+    try:
+        logger.debug(f"LLM 서버 호출: {llm.base_url}")
         
-        for recipe in all_recipes:
-            if recipe.get('name', '').lower() == recipe_name.lower():
-                return recipe
+        response = await llm.post(
+            "/recommend",
+            hedge=True,
+            json={
+                "ingredients": req.ingredients,
+                "max_time": req.max_time,
+                "difficulty_max": req.difficulty_max
+            }
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            logger.info(f"LLM 서버에서 레시피 추천 성공: {len(data)}개 레시피")
+            if sampled(logger):
+                logger.debug("LLM 응답 데이터 구조", extra={"fields": {"payload": data}})
+            
+            if data:
+                return data
+            logger.warning("LLM 서버 응답에 레시피 데이터가 없음")
+            metrics.count_fallback("llm_call", "empty")
                 
-        return None
+        else:
+            logger.warning(f"LLM 서버 HTTP 오류: {response.status_code} - {response.text}")
+            metrics.count_fallback("llm_call", f"http_{response.status_code}")
+            
+    except CircuitBreakerOpen as e:
+        logger.warning(f"LLM 서버 차단 상태, 호출 생략: {e}")
+        metrics.count_fallback("llm_call", "circuit_open")
+        
+    except httpx.ConnectError as e:
+        logger.warning(f"LLM 서버 연결 실패: {e}")
+        metrics.count_fallback("llm_call", "connect_error")
+        
+    except httpx.TimeoutException:
+        logger.warning("LLM 서버 타임아웃")
+        metrics.count_fallback("llm_call", "timeout")
+        
+    except httpx.HTTPError as e:
+        logger.warning(f"LLM 서버 기타 오류: {e}")
+        metrics.count_fallback("llm_call", "http_error")
+    
+    return None
+
+def format_llm_recipes(data: List[Dict]) -> List[Dict]:
+    with metrics.time_stage("local_enrichment"):
+        # id/정규화된 이름 인덱스로 모든 결과를 한 번에 로컬 데이터와 매핑
+        local_recipes = catalog.get().lookup_many(data)
+        
+        formatted_recipes = []
+        for i, (recipe, local_recipe) in enumerate(zip(data, local_recipes)):
+            if sampled(logger):
+                logger.debug("레시피 %d 원본 데이터: %s", i + 1, recipe)
+            formatted_recipe = format_llm_recipe(recipe, local_recipe)
+            logger.debug(
+                "최종 변환된 레시피 %d: %s - 재료 %d개, 조리법 %d단계",
+                i + 1, formatted_recipe["name"], len(formatted_recipe["ingredients"]), len(formatted_recipe["steps"]),
+            )
+            formatted_recipes.append(formatted_recipe)
+        return formatted_recipes
+
+def format_llm_recipe(recipe: Dict, local_recipe: Optional[Dict]) -> Dict:
+    recipe_name = recipe.get("title", recipe.get("name", ""))
+    
+    if local_recipe:
+        recipe_ingredients = local_recipe.get("ingredients", [])
+        recipe_steps = local_recipe.get("steps", [])
+    else:
+        recipe_ingredients = ["재료 정보를 준비 중입니다"]
+        recipe_steps = ["조리 방법을 준비 중입니다"]
+        logger.warning(f"로컬에서 {recipe_name} 데이터를 찾지 못함")
+    
+    return {
+        "id": local_recipe["id"] if local_recipe else recipe.get("id"),
+        "name": recipe_name,
+        "summary": recipe.get("summary", "맛있는 요리"),
+        "time": recipe.get("cook_time_min", recipe.get("time", 30)),
+        "difficulty": recipe.get("difficulty", 2),
+        "ingredients": recipe_ingredients,  # 로컬에서 가져온 실제 재료
+        "steps": recipe_steps  # 로컬에서 가져온 실제 조리법
+    }
+
+async def find_local_recipe_by_name(recipe_name: str):
+    try:
+        return catalog.get().find_by_name(recipe_name)
         
     except Exception as e:
-        print(f"로컬 레시피 검색 오류: {e}")
+        logger.error(f"로컬 레시피 검색 오류: {e}")
         return None
 
+DIFFICULTY_MAP = {"초급": 1, "중급": 2, "고급": 3}
+
+async def get_local_recipes_with_smart_matching(req: RecommendRequest):
+    """
+    LLM 서버를 쓸 수 없을 때의 로컬 추천. 카탈로그 로드 시 만들어 둔 재료 토큰 역색인에서
+    사용자 재료가 히트한 레시피만 점수를 매기므로 카탈로그 크기와 무관하게 빠릅니다.
+    """
     try:
-        current_recipes_file = find_recipes_file()
+        snapshot = catalog.get()
         
-        if not current_recipes_file:
-            print("❌ 레시피 파일을 찾을 수 없어 기본 레시피 반환")
+        if not snapshot.recipes:
+            logger.error("❌ 레시피 파일을 찾을 수 없어 기본 레시피 반환")
             return await get_default_recipes(req)
-            
-        print(f"📖 레시피 파일 사용: {current_recipes_file}")
-        print(f"🔍 인식된 재료: {req.ingredients}")
-        
-        with open(current_recipes_file, 'r', encoding='utf-8') as f:
-            all_recipes = json.load(f)
-        
-        print(f"📚 총 {len(all_recipes)}개 레시피 로드됨")
         
-        recipe_names = [recipe.get('name', 'Unknown') for recipe in all_recipes[:5]]
-        print(f"📋 처음 5개 레시피: {recipe_names}")
+        all_recipes = snapshot.recipes
+        with metrics.time_stage("local_matching"):
+            scores = snapshot.ingredient_index.score(req.ingredients)
         
         matched_recipes = []
-        user_ingredients = [ing.lower().strip() for ing in req.ingredients]
-        print(f"🔍 매칭할 사용자 재료: {user_ingredients}")
-        
-        for recipe in all_recipes:
-            recipe_ingredients = [ing.lower() for ing in recipe.get('ingredients', [])]
-            recipe_name = recipe.get('name', 'Unknown')
-            
-            matches = 0
-            matched_items = []
+        for position, matches in scores.items():
+            recipe = all_recipes[position]
+            recipe_difficulty = DIFFICULTY_MAP.get(recipe.get('difficulty', '중급'), 2)
             
-            for user_ing in user_ingredients:
-                for recipe_ing in recipe_ingredients:
-                    if (user_ing in recipe_ing or 
-                        any(word in recipe_ing for word in user_ing.split()) or
-                        any(word in user_ing for word in recipe_ing.split())):
-                        matches += 1
-                        matched_items.append(f"{user_ing} → {recipe_ing}")
-                        break
-            
-            if matches > 0:
-                print(f"✅ {recipe_name}: {matches}개 재료 매칭 ({matched_items})")
-                
-                # 난이도 변환
-                difficulty_map = {"초급": 1, "중급": 2, "고급": 3}
-                recipe_difficulty = difficulty_map.get(recipe.get('difficulty', '중급'), 2)
-                
-                # 조건 필터링
-                if (recipe.get('time', 30) <= req.max_time and 
-                    recipe_difficulty <= req.difficulty_max):
-                    
-                    matched_recipes.append({
-                        "recipe": recipe,
-                        "match_score": matches,
-                        "difficulty_num": recipe_difficulty,
-                        "matched_items": matched_items
-                    })
+            # 조건 필터링
+            if (recipe.get('time', 30) <= req.max_time and 
+                recipe_difficulty <= req.difficulty_max):
+                matched_recipes.append({
+                    "recipe": recipe,
+                    "position": position,
+                    "match_score": matches,
+                    "difficulty_num": recipe_difficulty
+                })
         
-        print(f"🎯 필터링 후 매칭된 레시피: {len(matched_recipes)}개")
+        logger.info(f"🎯 로컬 매칭: 후보 {len(scores)}개, 필터링 후 {len(matched_recipes)}개")
         
         # 매칭되는 레시피가 없으면 조건 완화
         if not matched_recipes:
-            print("⚠️ 매칭되는 레시피가 없어 조건 완화해서 재검색")
+            logger.info("⚠️ 매칭되는 레시피가 없어 조건 완화해서 재검색")
             
             # 조건 완화: 시간 제한 무시하고 난이도만 체크
-            for recipe in all_recipes[:10]:  # 처음 10개만 체크
-                difficulty_map = {"초급": 1, "중급": 2, "고급": 3}
-                recipe_difficulty = difficulty_map.get(recipe.get('difficulty', '중급'), 2)
+            for position, recipe in enumerate(all_recipes[:10]):  # 처음 10개만 체크
+                recipe_difficulty = DIFFICULTY_MAP.get(recipe.get('difficulty', '중급'), 2)
                 
                 if recipe_difficulty <= req.difficulty_max:
                     matched_recipes.append({
                         "recipe": recipe,
+                        "position": position,
                         "match_score": 0,  # 매칭 점수 0
-                        "difficulty_num": recipe_difficulty,
-                        "matched_items": []
+                        "difficulty_num": recipe_difficulty
                     })
         
-        # 매칭 점수순 정렬
-        matched_recipes.sort(key=lambda x: x['match_score'], reverse=True)
-        
-        print(f"📊 정렬된 레시피 (상위 5개):")
-        for i, item in enumerate(matched_recipes[:5]):
-            print(f"   {i+1}. {item['recipe'].get('name')} (점수: {item['match_score']})")
+        # 매칭 점수순 상위 3개 (동점이면 카탈로그 순서)
+        top_recipes = heapq.nsmallest(3, matched_recipes, key=lambda x: (-x['match_score'], x['position']))
         
         result_recipes = []
-        for item in matched_recipes[:3]:
+        for item in top_recipes:
             recipe = item['recipe']
             
             recipe_ingredients = recipe.get('ingredients', [])
@@ -332,6 +378,7 @@ async def find_local_recipe_by_name(recipe_name: str):
                 summary = f"추천 레시피 (난이도 {item['difficulty_num']})"
             
             result_recipes.append({
+                "id": recipe.get('id'),
                 "name": recipe.get('name', ''),
                 "summary": summary,
                 "time": recipe.get('time', 30),
@@ -344,17 +391,15 @@ async def find_local_recipe_by_name(recipe_name: str):
             })
         
         if not result_recipes:
-            print("❌ 모든 시도 실패, 기본 레시피 반환")
+            logger.warning("❌ 모든 시도 실패, 기본 레시피 반환")
             return await get_default_recipes(req)
         
         final_names = [r['name'] for r in result_recipes]
-        print(f"🎉 최종 추천 레시피: {final_names}")
+        logger.info(f"🎉 최종 추천 레시피: {final_names}")
         return {"recipes": result_recipes}
         
     except Exception as e:
-        print(f"❌ 로컬 레시피 처리 중 오류: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ 로컬 레시피 처리 중 오류: {e}")
         return await get_default_recipes(req)
 
 async def get_default_recipes(req: RecommendRequest):
@@ -414,36 +459,93 @@ async def get_default_recipes(req: RecommendRequest):
     
     return {"recipes": filtered_recipes}
 
+RECIPE_FIELDS = ("id", "name", "ingredients", "time", "difficulty", "steps")
+
+def encode_cursor(recipe_id: str) -> str:
+    return base64.urlsafe_b64encode(recipe_id.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
 @router.get("/recipes")
-async def get_all_recipes():
+async def get_all_recipes(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="이전 응답의 next_cursor"),
+    limit: int = Query(10, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="반환할 필드 (예: name,time,difficulty). id는 항상 포함"),
+):
 
     try:
-        current_recipes_file = find_recipes_file()
-        if not current_recipes_file:
-            return {"recipes": []}
-            
-        with open(current_recipes_file, 'r', encoding='utf-8') as f:
-            recipes = json.load(f)
-            
-        return {"recipes": recipes[:10]}  # 처음 10개만 반환
+        snapshot = catalog.get()
+        
+        if fields:
+            selected = [field.strip() for field in fields.split(",") if field.strip()]
+            unknown = [field for field in selected if field not in RECIPE_FIELDS]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"지원하지 않는 필드입니다: {', '.join(unknown)}")
+            selected = ["id"] + [field for field in selected if field != "id"]
+        else:
+            selected = None
+        
+        # 같은 카탈로그 버전 + 같은 쿼리면 응답 본문이 바이트 단위로 같으므로 strong ETag 사용
+        etag_source = f"{snapshot.version}|{cursor}|{limit}|{','.join(selected or RECIPE_FIELDS)}"
+        etag = '"' + hashlib.sha1(etag_source.encode("utf-8")).hexdigest()[:20] + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        
+        start = 0
+        if cursor:
+            try:
+                start = snapshot.position_by_id[decode_cursor(cursor)] + 1
+            except (KeyError, ValueError, UnicodeDecodeError):
+                raise HTTPException(status_code=400, detail="유효하지 않은 cursor입니다.")
         
+        page = snapshot.recipes[start:start + limit]
+        if selected:
+            page = [{field: recipe.get(field) for field in selected} for recipe in page]
+        
+        next_cursor = encode_cursor(page[-1]["id"]) if page and start + limit < len(snapshot.recipes) else None
+        
+        return metrics.TimedJSONResponse(
+            {"recipes": page, "next_cursor": next_cursor, "total": len(snapshot.recipes)},
+            headers=headers,
+        )
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"레시피 목록 조회 오류: {str(e)}")
 
+class TranslateRequest(BaseModel):
+    ingredients: List[str]
+
 @router.get("/ingredients/translate/{ingredient}")
 async def translate_ingredient(ingredient: str):
 
     try:
-        ingredient_map_file = Path(__file__).parent.parent / "data" / "ingredient_kor_map.json"
-        
-        if not ingredient_map_file.exists():
-            return {"korean": ingredient}
-            
-        with open(ingredient_map_file, 'r', encoding='utf-8') as f:
-            ingredient_map = json.load(f)
-            
-        korean_name = ingredient_map.get(ingredient.lower(), ingredient)
-        return {"korean": korean_name}
+        return {"korean": ingredient_map_file.translator.translate(ingredient)}
         
     except Exception:
         return {"korean": ingredient}
+
+@router.post("/ingredients/translate")
+async def translate_ingredients(req: TranslateRequest):
+    """여러 재료를 한 번에 번역합니다. korean은 입력과 같은 순서입니다."""
+    if len(req.ingredients) > 500:
+        raise HTTPException(status_code=400, detail="한 번에 최대 500개까지 번역할 수 있습니다.")
+    
+    translator = ingredient_map_file.translator
+    korean = translator.translate_many(req.ingredients)
+    return {
+        "korean": korean,
+        "translations": dict(zip(req.ingredients, korean)),
+    }
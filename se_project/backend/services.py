@@ -1,56 +1,49 @@
 import aiofiles
 import os
 import json
-import httpx
 import asyncio
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-# VLM 서버 URL
-VLM_SERVER_URL = "http://vlm-server:8001"
+from recipe_catalog import catalog
+from structured_logging import get_logger
+from upload_proxy import UploadStream
+from upstream import Upstream, upstreams
 
-async def process_image(file):
+logger = get_logger(__name__)
+
+async def process_image(upload: UploadStream, vlm: Optional[Upstream] = None):
 
     try:
-        # VLM 서버로 이미지 전송
-        async with httpx.AsyncClient(timeout=60) as client:
-            files = {"file": (file.filename, await file.read(), file.content_type)}
-            response = await client.post(f"{VLM_SERVER_URL}/recognize", files=files)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("ingredients", [])
-            else:
-                print(f"VLM 서버 오류: {response.status_code}")
-                return ["계란", "양파", "토마토", "당근", "감자"]  # 기본값
+        # VLM 서버로 업로드 본문을 그대로 스트리밍 (lifespan에서 관리하는 공유 커넥션 풀 사용)
+        vlm = vlm or upstreams["vlm"]
+        await upload.inspect()
+        response = await vlm.post("/recognize", content=upload.body(), headers=upload.headers())
+        
+        if response.status_code == 200:
+            data = response.json()
+            return data.get("ingredients", [])
+        else:
+            logger.warning(f"VLM 서버 오류: {response.status_code}")
+            return ["계란", "양파", "토마토", "당근", "감자"]  # 기본값
                 
     except Exception as e:
-        print(f"VLM 호출 오류: {e}")
+        logger.warning(f"VLM 호출 오류: {e}")
         # 기본 재료 반환 (테스트용)
         return ["계란", "양파", "토마토", "당근", "감자"]
 
 def load_recipes() -> List[Dict]:
 
     try:
-
-        possible_paths = [
-            "/app/data/recipes_updated.json",  # Docker 볼륨 마운트
-            "../data/recipes_updated.json",    # 상대 경로
-            "./data/recipes_updated.json",     # 현재 디렉토리
-            "data/recipes_updated.json",       # 루트에서 실행 시
-            "../../../data/recipes_updated.json",  # 기존 파일 경로
-        ]
-        
-        for data_path in possible_paths:
-            if os.path.exists(data_path):
-                with open(data_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
+        recipes = catalog.get().recipes
+        if recipes:
+            return recipes
         
         # 파일을 찾을 수 없으면 기본 레시피 생성
         return create_default_recipes()
         
     except Exception as e:
-        print(f"레시피 로딩 오류: {e}")
+        logger.error(f"레시피 로딩 오류: {e}")
         return create_default_recipes()
 
 def create_default_recipes() -> List[Dict]:
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ingredient_normalizer import canonical_names
+from recipe_catalog import RecipeCatalog
+from structured_logging import get_logger
+from synonym_matcher import SynonymMatcher, korean_synonyms
+
+logger = get_logger(__name__)
+
+# 임베딩 캐시 디렉터리(EMBEDDING_CACHE_DIR)에 임베딩 저장소, ANN 색인과 함께 두는 빌드 산출물
+# - manifest.json: 어떤 카탈로그/모델/동의어 표로 만들었는지 (서비스 시작 시 읽어 /similarity-status에 표시)
+# - synonym-groups.json: 카탈로그 재료 문자열별 동의어 그룹 (시작 시 메모에 바로 넣음)
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+SYNONYM_TABLE_FILE = "synonym-groups.json"
+
+# 재료가 이보다 적으면 프로세스 풀을 띄우는 비용이 더 큼
+PARALLEL_MIN_TEXTS = 2000
+# 진행 상황을 남기는 임베딩 요청 단위
+FETCH_CHUNK = 1024
+
+
+def _write_json(path: Path, data, **kwargs):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_catalog(path: Optional[Path] = None) -> Tuple[Path, str, List[Dict]]:
+    """레시피 파일 경로, 버전(recipe_catalog와 같은 sha1 규칙), 레시피 목록"""
+    path = Path(path) if path else RecipeCatalog().find_file()
+    if path is None:
+        raise FileNotFoundError("레시피 파일을 찾을 수 없습니다 (RECIPES_FILE 또는 --recipes로 지정)")
+    raw = path.read_bytes()
+    recipes = json.loads(raw.decode("utf-8"))
+    if not isinstance(recipes, list):
+        raise ValueError("레시피 파일은 JSON 배열이어야 합니다")
+    return path, hashlib.sha1(raw).hexdigest()[:16], recipes
+
+
+def catalog_ingredients(recipes: Sequence[Dict]) -> List[str]:
+    """카탈로그의 재료 문자열 (등장 순서대로 중복 제거). 요청 시 임베딩 키와 같도록 원문 그대로 사용"""
+    texts: Dict[str, None] = {}
+    for recipe in recipes:
+        if not isinstance(recipe, dict):
+            continue
+        for ingredient in recipe.get("ingredients", []):
+            if isinstance(ingredient, str) and ingredient.strip():
+                texts[ingredient] = None
+    return list(texts)
+
+
+def _analyze(text: str) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+    return canonical_names(text), tuple(sorted(korean_synonyms.scan(text)))
+
+
+def analyze_ingredients(texts: List[str], workers: Optional[int] = None) -> Dict[str, Tuple[Tuple[str, ...], Tuple[int, ...]]]:
+    """재료 문자열별 (정규 이름들, 동의어 그룹들). CPU 작업이라 많으면 프로세스 풀에 나눠 계산"""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(texts) < PARALLEL_MIN_TEXTS:
+        return {text: _analyze(text) for text in texts}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_analyze, texts, chunksize=max(64, len(texts) // (workers * 8)))
+        return dict(zip(texts, results))
+
+
+def read_manifest(directory: Path) -> Optional[Dict]:
+    path = Path(directory) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        logger.error(f"빌드 매니페스트 로드 오류 {path}: {e}")
+        return None
+    if manifest.get("format") != FORMAT_VERSION:
+        logger.warning(f"빌드 매니페스트 형식이 달라 무시합니다: {manifest.get('format')}")
+        return None
+    return manifest
+
+
+def load_synonym_table(directory: Path, matcher: SynonymMatcher = korean_synonyms) -> int:
+    """저장된 재료별 동의어 그룹을 matcher 메모에 넣습니다. 동의어 표가 바뀌었으면 무시"""
+    path = Path(directory) / SYNONYM_TABLE_FILE
+    if not path.exists():
+        return 0
+    try:
+        table = json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        logger.error(f"동의어 표 로드 오류 {path}: {e}")
+        return 0
+    if table.get("fingerprint") != matcher.fingerprint:
+        logger.warning("동의어 그룹 표가 빌드 이후 바뀌어 저장된 동의어 표를 무시합니다")
+        return 0
+    return matcher.preload(table.get("groups", {}))
+
+
+def build_artifacts(
+    service,
+    recipes_path: Optional[Path] = None,
+    rebuild_index: bool = False,
+    workers: Optional[int] = None,
+) -> Dict:
+    """
+    카탈로그 전체 재료로 서비스 캐시 디렉터리의 산출물을 만들고 매니페스트를 돌려줍니다.
+
+    1. 카탈로그 재료 문자열을 모아 중복 제거
+    2. 정규 이름/동의어 그룹 계산 (프로세스 풀)
+    3. 재료 문자열과 정규 이름 중 임베딩이 없는 것만 배치로 받아 임베딩 저장소에 추가
+    4. ANN 색인 반영 (rebuild_index면 처음부터 다시 학습), 동의어 표와 매니페스트 저장
+    """
+    started = time.perf_counter()
+    path, version, recipes = read_catalog(recipes_path)
+    texts = catalog_ingredients(recipes)
+    logger.info(f"카탈로그 {path} (version {version}): 레시피 {len(recipes)}개, 재료 문자열 {len(texts)}개")
+
+    analyzed = analyze_ingredients(texts, workers)
+    names = list(dict.fromkeys(name for text in texts for name in analyzed[text][0]))
+    targets = list(dict.fromkeys(texts + names))
+    missing = [text for text in targets if text not in service.ingredient_embeddings]
+    logger.info(f"정규 이름 {len(names)}개, 임베딩 대상 {len(targets)}개 중 {len(missing)}개 새로 생성")
+
+    with service.deferred_cache_save():
+        for start in range(0, len(missing), FETCH_CHUNK):
+            service.get_embeddings(missing[start:start + FETCH_CHUNK])
+            logger.info(f"임베딩 생성 {min(start + FETCH_CHUNK, len(missing))}/{len(missing)}")
+        if rebuild_index:
+            service.ann_index.train()
+        else:
+            # 요청 경로에서는 재학습을 백그라운드로 미루므로 빌드에서는 끝날 때까지 기다림
+            service.ann_index.sync(train_inline=True)
+    failed = [text for text in targets if text not in service.ingredient_embeddings]
+    if failed:
+        logger.warning(f"임베딩을 받지 못한 재료 {len(failed)}개 (예: {failed[:5]})")
+
+    directory = service.cache_dir
+    matcher = service.synonym_matcher
+    directory.mkdir(parents=True, exist_ok=True)
+    table = {"fingerprint": matcher.fingerprint, "groups": {text: list(analyzed[text][1]) for text in texts}}
+    _write_json(directory / SYNONYM_TABLE_FILE, table)
+    matcher.preload(table["groups"])
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "model": service.embedding_model,
+        "dim": service.embedding_matrix.dim,
+        "catalog": {"path": str(path), "version": version, "recipes": len(recipes)},
+        "synonyms": matcher.fingerprint,
+        "ingredients": len(texts),
+        "canonical_names": len(names),
+        "embeddings": len(service.ingredient_embeddings),
+        "failed": len(failed),
+        "ann_index": service.ann_index.status(),
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+    _write_json(directory / MANIFEST_FILE, manifest, indent=2)
+    logger.info(f"빌드 완료: {directory} ({manifest['seconds']}초)")
+    return manifest
@@ -0,0 +1,198 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# 세 서비스(backend, LLM, VLM)가 같이 쓰는 구조화 로깅 모듈 (표준 라이브러리만 사용).
+# 로그 레코드는 QueueHandler로 큐에 넣기만 하고, 실제 stdout 쓰기는 QueueListener 스레드가 합니다.
+# 그래서 stdout이 막혀도 이벤트 루프가 멈추지 않습니다.
+#
+# 환경변수
+# - LOG_LEVEL: 기본 레벨 (기본 INFO)
+# - LOG_LEVELS: 모듈별 레벨 ("routes=DEBUG,upstream=WARNING")
+# - LOG_FORMAT: json | text (기본 json)
+# - LOG_SAMPLE_RATE: 디버그 페이로드 덤프 샘플링 비율 (기본 0.01)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_service = "backend"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+SAMPLE_RATE = _env_float("LOG_SAMPLE_RATE", 0.01)
+
+
+class RequestIdFilter(logging.Filter):
+    """레코드에 현재 요청 ID와 서비스 이름을 붙입니다 (QueueHandler에 걸어 요청 컨텍스트 안에서 실행)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.service = _service
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "service": getattr(record, "service", _service),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(service)s] %(name)s %(request_id)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = "-"
+        if not hasattr(record, "service"):
+            record.service = _service
+        return super().format(record)
+
+
+class _PreparedQueueHandler(logging.handlers.QueueHandler):
+    """메시지 포맷팅은 리스너 스레드에서 하도록 레코드를 그대로 큐에 넣습니다 (args/fields 유지)"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(service: str = "backend"):
+    """루트 로거를 큐 기반 핸들러로 교체합니다. 여러 번 호출해도 리스너는 하나만 유지됩니다."""
+    global _listener, _service
+    _service = service
+
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        stream_handler.setFormatter(TextFormatter())
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = _PreparedQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    for name, level in _parse_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """큐에 남은 로그를 모두 쓰고 리스너 스레드를 멈춥니다."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def sampled(logger: logging.Logger, rate: Optional[float] = None) -> bool:
+    """DEBUG가 켜져 있고 샘플에 뽑힌 경우에만 True (큰 페이로드 덤프용)"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    return random.random() < (SAMPLE_RATE if rate is None else rate)
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def request_id_headers() -> Dict[str, str]:
+    """업스트림 호출에 실어 보낼 상관관계 헤더"""
+    request_id = request_id_var.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+class RequestIdMiddleware:
+    """
+    X-Request-ID 헤더를 읽어(없으면 새로 만들어) 요청 컨텍스트에 저장하고 응답 헤더로 돌려줍니다.
+    스트리밍 응답을 감싸지 않도록 순수 ASGI 미들웨어로 구현했습니다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key.decode("latin-1").lower() == REQUEST_ID_HEADER.lower():
+                request_id = value.decode("latin-1").strip()[:128]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.lower().encode("latin-1"), request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
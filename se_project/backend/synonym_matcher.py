@@ -0,0 +1,142 @@
+import hashlib
+import json
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Tuple
+
+# 대표 재료 → 같은 재료로 취급하는 이름들
+KOREAN_INGREDIENT_GROUPS: Dict[str, List[str]] = {
+    "두부": ["두부", "순두부", "연두부", "부침두부", "모두부"],
+    "돼지고기": ["돼지고기", "삼겹살", "목살", "항정살", "등심", "안심", "앞다리살"],
+    "소고기": ["소고기", "등심", "안심", "갈비", "불고기용고기", "스테이크용고기"],
+    "닭고기": ["닭고기", "닭가슴살", "닭다리살", "닭날개", "통닭"],
+    "양파": ["양파", "대파", "쪽파", "실파", "양파즙"],
+    "마늘": ["마늘", "다진마늘", "마늘즙", "깐마늘"],
+    "고추": ["고추", "청양고추", "홍고추", "풋고추", "건고추"],
+    "버섯": ["버섯", "느타리버섯", "팽이버섯", "새송이버섯", "표고버섯", "양송이버섯"],
+    "감자": ["감자", "새감자", "자주감자", "수미감자"],
+    "당근": ["당근", "mini당근", "베이비당근"],
+    "배추": ["배추", "절임배추", "배추김치", "얼갈이배추"],
+    "무": ["무", "열무", "총각무", "무즙"],
+    "콩": ["콩", "완두콩", "검은콩", "백태", "서리태", "콩나물"],
+    "계란": ["계란", "달걀", "메추리알", "계란흰자", "계란노른자"],
+    "우유": ["우유", "저지방우유", "무지방우유", "연유", "생크림"],
+    "치즈": ["치즈", "모짜렐라치즈", "체다치즈", "크림치즈", "파마산치즈"],
+    "쌀": ["쌀", "현미", "찹쌀", "보리", "밥"],
+    "면": ["면", "라면", "우동면", "소바면", "스파게티면", "국수"],
+    "기름": ["기름", "올리브오일", "참기름", "들기름", "포도씨오일", "카놀라오일"],
+    "간장": ["간장", "진간장", "국간장", "양조간장"],
+    "된장": ["된장", "쌈장", "고추장", "춘장"],
+    "식초": ["식초", "사과식초", "현미식초", "발사믹식초"],
+    "설탕": ["설탕", "백설탕", "흑설탕", "올리고당", "꿀", "물엿"],
+    "소금": ["소금", "굵은소금", "천일염", "맛소금"],
+    "후추": ["후추", "흰후추", "검은후추", "후춧가루"],
+    "토마토": ["토마토", "방울토마토", "대추방울토마토", "토마토페이스트"],
+    "오이": ["오이", "미니오이", "피클"],
+    "상추": ["상추", "깻잎", "시금치", "양상추", "로메인"],
+    "생강": ["생강", "생강즙", "생강가루"],
+    "레몬": ["레몬", "라임", "레몬즙", "라임즙"],
+    "사과": ["사과", "사과즙", "건사과"],
+    "바나나": ["바나나", "바나나칩"],
+    "딸기": ["딸기", "냉동딸기", "딸기잼"],
+    "고구마": ["고구마", "밤고구마", "호박고구마", "자색고구마"],
+    "호박": ["호박", "애호박", "단호박", "늙은호박"],
+}
+
+
+class SynonymMatcher:
+    """
+    동의어 그룹 매칭기.
+
+    - groups_of: 동의어 → 그 동의어가 속한 그룹 번호들 (사용자 재료 조회용 역색인)
+    - 모든 동의어로 만든 Aho-Corasick 오토마톤으로 재료 문자열을 한 번 훑어
+      그 안에 등장하는 동의어들의 그룹 번호 집합을 구함 (groups_in)
+    - 재료 문자열별 결과는 메모해 두고, 카탈로그를 로드할 때 warm()으로 미리 채움.
+      요청 시점에는 사용자 재료의 그룹과 레시피 재료의 그룹 집합을 비교하기만 하면 됨
+    """
+
+    def __init__(self, groups: Dict[str, Sequence[str]], max_cached_texts: int = 200_000):
+        self.names: List[str] = list(groups)
+        self.groups_of: Dict[str, Tuple[int, ...]] = {}
+        for group, synonyms in enumerate(groups.values()):
+            for synonym in dict.fromkeys(synonyms):
+                self.groups_of[synonym] = self.groups_of.get(synonym, ()) + (group,)
+
+        # 그룹 표의 지문. 오프라인으로 미리 계산해 둔 재료별 그룹(preload)이 같은 표로 만든 것인지 확인용
+        self.fingerprint = hashlib.sha1(
+            json.dumps([[name, list(synonyms)] for name, synonyms in groups.items()], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+
+        self.max_cached_texts = max_cached_texts
+        self._groups_by_text: Dict[str, FrozenSet[int]] = {}
+        self._build_automaton()
+
+    def _build_automaton(self):
+        # 상태 0이 루트. goto[상태][문자] → 다음 상태
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[FrozenSet[int]] = [frozenset()]
+        for synonym, groups in self.groups_of.items():
+            if not synonym:
+                continue
+            state = 0
+            for char in synonym:
+                following = self._goto[state].get(char)
+                if following is None:
+                    following = len(self._goto)
+                    self._goto[state][char] = following
+                    self._goto.append({})
+                    self._output.append(frozenset())
+                state = following
+            self._output[state] = self._output[state] | frozenset(groups)
+
+        # 너비 우선으로 실패 링크를 만들고, 실패 링크 쪽 출력도 합쳐 둠
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._output[following] = self._output[following] | self._output[self._fail[following]]
+
+    def scan(self, text: str) -> FrozenSet[int]:
+        """text 안에 등장하는 동의어들의 그룹 번호 집합 (메모 없이 한 번 훑기)"""
+        found = set()
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return frozenset(found)
+
+    def groups_in(self, text: str) -> FrozenSet[int]:
+        groups = self._groups_by_text.get(text)
+        if groups is None:
+            if len(self._groups_by_text) >= self.max_cached_texts:
+                self._groups_by_text.clear()
+            groups = self._groups_by_text[text] = self.scan(text)
+        return groups
+
+    def warm(self, texts: Iterable[str]):
+        """카탈로그 재료 문자열들의 그룹을 미리 계산해 둡니다."""
+        for text in texts:
+            self.groups_in(text)
+
+    def preload(self, groups_by_text: Dict[str, Iterable[int]]) -> int:
+        """미리 계산해 둔 재료별 그룹(similarity_artifacts 빌드 결과)을 메모에 넣습니다."""
+        loaded = 0
+        for text, groups in groups_by_text.items():
+            if len(self._groups_by_text) >= self.max_cached_texts:
+                break
+            self._groups_by_text[text] = frozenset(groups)
+            loaded += 1
+        return loaded
+
+
+korean_synonyms = SynonymMatcher(KOREAN_INGREDIENT_GROUPS)
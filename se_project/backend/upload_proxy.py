@@ -0,0 +1,108 @@
+import os
+import re
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException, Request
+from starlette.requests import ClientDisconnect
+
+from resilience import RequestAborted
+
+# 이미지 업로드를 메모리에 모으지 않고 VLM 서버로 그대로 흘려보내는 프록시.
+# 클라이언트가 보낸 multipart 본문을 파싱/재조립하지 않고 청크 단위로 전달하며,
+# 첫 파트의 헤더만 미리 읽어 이미지 여부를 확인합니다.
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+# multipart 경계/파트 헤더 등 이미지 바이트 외에 허용하는 여유분
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# 첫 파트 헤더를 찾기 위해 미리 읽는 최대 크기
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+_CONTENT_TYPE = re.compile(rb"^content-type:\s*([^\r\n;]+)", re.IGNORECASE | re.MULTILINE)
+_FIELD_NAME = re.compile(rb'name="([^"]*)"', re.IGNORECASE)
+
+SIZE_ERROR = "파일 크기는 10MB 이하여야 합니다."
+
+
+class UploadTooLarge(RequestAborted):
+    """스트리밍 도중 업로드 크기 제한을 넘은 경우"""
+
+
+class UploadStream:
+    """
+    multipart/form-data 요청 본문을 한 번만 읽으면서 업스트림으로 전달하는 스트림.
+
+    - Content-Length가 있으면 본문을 읽기 전에 크기 제한을 확인
+    - inspect()로 첫 파트 헤더까지만 읽어 필드 이름과 이미지 Content-Type을 검증
+    - body()는 미리 읽은 청크부터 이어서 돌려주며, 누적 크기가 제한을 넘으면 UploadTooLarge
+    """
+
+    def __init__(self, request: Request, field: str = "file", max_bytes: int = MAX_UPLOAD_BYTES):
+        self.request = request
+        self.field = field
+        self.max_body_bytes = max_bytes + MULTIPART_OVERHEAD_BYTES
+        self.content_type = request.headers.get("content-type", "")
+        self.received = 0
+        self._prefix = b""
+        self._chunks: Optional[AsyncIterator[bytes]] = None
+
+        if not self.content_type.lower().startswith("multipart/form-data") or not _BOUNDARY.search(self.content_type):
+            raise HTTPException(status_code=400, detail="multipart/form-data 형식의 이미지 업로드가 필요합니다.")
+
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            raise HTTPException(status_code=400, detail=SIZE_ERROR)
+
+    async def _next_chunk(self) -> Optional[bytes]:
+        if self._chunks is None:
+            self._chunks = self.request.stream().__aiter__()
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+        except ClientDisconnect:
+            raise RequestAborted("클라이언트 연결이 업로드 도중 끊어졌습니다")
+        self.received += len(chunk)
+        if self.received > self.max_body_bytes:
+            raise UploadTooLarge(SIZE_ERROR)
+        return chunk
+
+    async def inspect(self) -> str:
+        """첫 파트 헤더를 읽어 검증하고 이미지 Content-Type을 돌려줍니다."""
+        buffer = b""
+        while b"\r\n\r\n" not in buffer:
+            if len(buffer) > MAX_PART_HEADER_BYTES:
+                raise HTTPException(status_code=400, detail="multipart 헤더가 너무 깁니다.")
+            chunk = await self._next_chunk()
+            if chunk is None:
+                raise HTTPException(status_code=400, detail="업로드된 파일이 없습니다.")
+            buffer += chunk
+        self._prefix = buffer
+
+        headers = buffer.split(b"\r\n\r\n", 1)[0]
+        name = _FIELD_NAME.search(headers)
+        if not name or name.group(1).decode("utf-8", "replace") != self.field:
+            raise HTTPException(status_code=400, detail=f"'{self.field}' 필드로 이미지를 업로드해주세요.")
+
+        content_type = _CONTENT_TYPE.search(headers)
+        part_type = content_type.group(1).decode("latin-1").strip().lower() if content_type else ""
+        if not part_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail="이미지 파일만 업로드 가능합니다.")
+        return part_type
+
+    async def body(self) -> AsyncIterator[bytes]:
+        if self._prefix:
+            prefix, self._prefix = self._prefix, b""
+            yield prefix
+        while True:
+            chunk = await self._next_chunk()
+            if chunk is None:
+                return
+            yield chunk
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": self.content_type}
+        content_length = self.request.headers.get("content-length")
+        if content_length:
+            headers["Content-Length"] = content_length
+        return headers
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+import metrics
+from resilience import CircuitBreaker, CircuitBreakerOpen, LatencyTracker, RequestAborted, hedged
+from structured_logging import get_logger, request_id_headers
+
+logger = get_logger(__name__)
+
+VLM_SERVER_URL = os.getenv("VLM_SERVER_URL", "http://vlm-server:8001")
+LLM_SERVER_URL = os.getenv("LLM_SERVER_URL", "http://llm-server:8002")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class Upstream:
+    """
+    업스트림 서버(VLM/LLM) 하나에 대한 커넥션 풀.
+    앱 lifespan 동안 하나의 httpx.AsyncClient를 재사용해 keep-alive 연결을 유지합니다.
+    설정은 `{NAME}_MAX_CONNECTIONS`처럼 업스트림별 환경변수가 우선이고,
+    없으면 `UPSTREAM_MAX_CONNECTIONS` 같은 공통 값을 사용합니다.
+    """
+
+    def __init__(self, name: str, base_url: str, timeout: float, connect_timeout: float = 10.0, slow_call_threshold: float = 10.0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        prefix = name.upper()
+
+        self.timeout = httpx.Timeout(
+            _env_float(f"{prefix}_TIMEOUT", timeout),
+            connect=_env_float(f"{prefix}_CONNECT_TIMEOUT", connect_timeout),
+        )
+        self.max_connections = _env_int(f"{prefix}_MAX_CONNECTIONS", _env_int("UPSTREAM_MAX_CONNECTIONS", 100))
+        self.max_keepalive_connections = _env_int(
+            f"{prefix}_MAX_KEEPALIVE", _env_int("UPSTREAM_MAX_KEEPALIVE", 20)
+        )
+        self.keepalive_expiry = _env_float(
+            f"{prefix}_KEEPALIVE_EXPIRY", _env_float("UPSTREAM_KEEPALIVE_EXPIRY", 30.0)
+        )
+        self.http2 = _env_bool(f"{prefix}_HTTP2", _env_bool("UPSTREAM_HTTP2", False))
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # 업스트림이 죽어 있으면 재시도 대신 바로 로컬 대체 경로로 보냄
+        self.breaker = CircuitBreaker(
+            name,
+            window_size=_env_int(f"{prefix}_BREAKER_WINDOW", 20),
+            min_calls=_env_int(f"{prefix}_BREAKER_MIN_CALLS", 5),
+            failure_rate_threshold=_env_float(f"{prefix}_BREAKER_FAILURE_RATE", 0.5),
+            slow_call_threshold=_env_float(f"{prefix}_SLOW_CALL_SECONDS", slow_call_threshold),
+            slow_call_rate_threshold=_env_float(f"{prefix}_BREAKER_SLOW_CALL_RATE", 0.8),
+            open_duration=_env_float(f"{prefix}_BREAKER_OPEN_SECONDS", 30.0),
+        )
+
+        # 헤지 요청: p95 지연을 넘기면 같은 요청을 한 번 더 보내 먼저 온 응답을 사용
+        self.latency = LatencyTracker()
+        self.hedging = _env_bool(f"{prefix}_HEDGE", False)
+        self.hedge_min_samples = _env_int(f"{prefix}_HEDGE_MIN_SAMPLES", 20)
+        self.hedge_min_delay = _env_float(f"{prefix}_HEDGE_MIN_DELAY", 0.05)
+        self.hedges_sent = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # lifespan 밖에서 호출되더라도 동작하도록 필요 시 지연 생성
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2 and not _http2_available():
+            logger.warning(f"⚠️ {self.name}: h2 패키지가 없어 HTTP/1.1로 연결합니다 (pip install httpx[http2])")
+            http2 = False
+
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+    async def start(self):
+        _ = self.client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedging or len(self.latency) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, self.latency.percentile(0.95))
+
+    def _count_hedge(self):
+        self.hedges_sent += 1
+        metrics.count_retry(f"{self.name}_call")
+
+    async def post(self, path: str, hedge: bool = False, **kwargs) -> httpx.Response:
+        """
+        차단기를 거쳐 POST 요청을 보냅니다. 차단기가 열려 있으면 CircuitBreakerOpen을 던지고,
+        hedge=True이고 헤지가 켜져 있으면 p95 지연 이후 두 번째 요청을 보냅니다.
+        (파일 스트림처럼 한 번만 읽을 수 있는 본문에는 hedge를 쓰면 안 됩니다.)
+        """
+        if not self.breaker.allow_request():
+            raise CircuitBreakerOpen(self.name, self.breaker.retry_after())
+
+        # 요청 ID를 헤더로 넘겨 VLM/LLM 서버 로그와 연결
+        correlation = request_id_headers()
+        if correlation:
+            kwargs["headers"] = {**correlation, **(kwargs.get("headers") or {})}
+
+        started = time.monotonic()
+        try:
+            delay = self.hedge_delay() if hedge else None
+            if delay is not None:
+                response = await hedged(lambda: self.client.post(path, **kwargs), delay, self._count_hedge)
+            else:
+                response = await self.client.post(path, **kwargs)
+        except (asyncio.CancelledError, RequestAborted):
+            # 클라이언트가 끊어 취소/중단된 호출은 업스트림 실패로 보지 않음
+            self.breaker.record_cancelled()
+            raise
+        except Exception:
+            self.breaker.record_failure(time.monotonic() - started)
+            raise
+
+        elapsed = time.monotonic() - started
+        metrics.observe_stage(f"{self.name}_call", elapsed)
+        if response.status_code >= 500:
+            self.breaker.record_failure(elapsed)
+        else:
+            self.breaker.record_success(elapsed)
+            self.latency.record(elapsed)
+        return response
+
+    def status(self) -> Dict:
+        p95 = self.latency.percentile(0.95)
+        return {
+            "url": self.base_url,
+            "connected": self._client is not None and not self._client.is_closed,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "circuit_breaker": self.breaker.status(),
+            "hedging": {
+                "enabled": self.hedging,
+                "p95_seconds": round(p95, 3) if p95 is not None else None,
+                "delay_seconds": self.hedge_delay(),
+                "hedges_sent": self.hedges_sent,
+            },
+        }
+
+
+upstreams: Dict[str, Upstream] = {
+    "vlm": Upstream("vlm", VLM_SERVER_URL, timeout=60.0, slow_call_threshold=30.0),
+    "llm": Upstream("llm", LLM_SERVER_URL, timeout=30.0, slow_call_threshold=10.0),
+}
+
+
+async def start_upstreams():
+    for upstream in upstreams.values():
+        await upstream.start()
+
+
+async def close_upstreams():
+    for upstream in upstreams.values():
+        await upstream.close()
@@ -0,0 +1,310 @@
+"""
+유사도 매칭/추천 API 벤치마크.
+
+카탈로그 크기별로 합성 카탈로그를 만들고 가짜 Ollama(stub_ollama.py)로 산출물을 빌드한 뒤
+(--build-index와 같은 경로), 아래 세 가지의 처리량, p50/p99 지연, 최대 메모리를 잽니다.
+
+- match_user_ingredients_to_recipes: 사용자 재료 vs 레시피 하나
+- enhanced_recipe_matching: 사용자 재료 vs 카탈로그 전체 (top-k)
+- enhanced_recommend_route: POST /api/v2/enhanced-recommend 전체 경로 (결과 캐시는 매번 비움)
+
+임베딩 캐시가 채워진 정상 상태를 재므로 측정 중 Ollama 요청 수(ollama_requests)는 0이어야 합니다.
+결과는 JSON으로 저장해 커밋 간에 비교합니다.
+
+    python run.py --sizes 46,1k,10k --output baselines/baseline.json
+    python run.py --compare baselines/baseline.json            # 다시 재고 기준과 비교
+    python run.py --load new.json --compare baselines/baseline.json
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import numpy as np
+
+from stub_ollama import DEFAULT_DIM, StubOllama
+from synthetic_catalog import user_queries, write_catalog
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = "46,1k,10k"
+# 비교 시 값이 커지면 나쁜 지표 / 작아지면 나쁜 지표
+HIGHER_IS_WORSE = ("p50_ms", "p99_ms", "peak_alloc_mb")
+LOWER_IS_WORSE = ("throughput",)
+# 메모리 측정(tracemalloc)은 느려서 시간 측정이 끝난 뒤 몇 번만 따로 실행
+MEMORY_CALLS = 3
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # 리눅스는 KB, macOS는 바이트
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(
+    call: Callable,
+    inputs: List,
+    stub: StubOllama,
+    min_time: float,
+    max_calls: int,
+    min_calls: int = 5,
+    before: Optional[Callable[[], None]] = None,
+) -> Dict:
+    """
+    inputs를 돌아가며 call(input)을 min_time초 이상(그리고 min_calls번 이상, 최대 max_calls번) 호출합니다.
+    before는 매 호출 전에 시간 밖에서 실행 (캐시 비우기 등)
+    """
+    latencies = []
+    requests_before = stub.requests
+    gc.collect()
+    started = time.perf_counter()
+    while len(latencies) < max_calls and (len(latencies) < min_calls or time.perf_counter() - started < min_time):
+        item = inputs[len(latencies) % len(inputs)]
+        if before:
+            before()
+        call_started = time.perf_counter()
+        call(item)
+        latencies.append(time.perf_counter() - call_started)
+    busy = sum(latencies)
+    ollama_requests = stub.requests - requests_before
+
+    tracemalloc.start()
+    for item in inputs[:MEMORY_CALLS]:
+        if before:
+            before()
+        tracemalloc.reset_peak()
+        call(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    milliseconds = [latency * 1000 for latency in latencies]
+    return {
+        "calls": len(latencies),
+        "seconds": round(busy, 3),
+        "throughput": round(len(latencies) / busy, 2) if busy else 0.0,
+        "mean_ms": round(float(np.mean(milliseconds)), 3),
+        "p50_ms": round(percentile(milliseconds, 50), 3),
+        "p99_ms": round(percentile(milliseconds, 99), 3),
+        "peak_alloc_mb": round(peak / 2**20, 2),
+        "ollama_requests": ollama_requests,
+    }
+
+
+def bench_size(size: int, args, stub: StubOllama, workdir: Path) -> Dict:
+    # 백엔드 모듈은 환경 변수(OLLAMA_HOST 등)를 읽은 뒤에 import
+    import enhanced_routes
+    import main
+    import recipe_catalog
+    import routes
+    import services
+    from fastapi.testclient import TestClient
+    from ingredient_similarity import IngredientSimilarityService
+    from result_cache import enhanced_recommend_cache
+    from similarity_artifacts import build_artifacts
+
+    setup = {"recipes": size}
+    started = time.perf_counter()
+    path = write_catalog(workdir / f"recipes-{size}.json", size, args.seed)
+    setup["catalog_write_seconds"] = round(time.perf_counter() - started, 2)
+
+    started = time.perf_counter()
+    catalog = recipe_catalog.RecipeCatalog([path])
+    snapshot = catalog.reload()
+    recipes = snapshot.recipes
+    # 전역 catalog는 처음 찾은 파일에 고정되므로 크기마다 새 카탈로그로 교체
+    for module in (recipe_catalog, enhanced_routes, main, routes, services):
+        module.catalog = catalog
+    setup["catalog_load_seconds"] = round(time.perf_counter() - started, 2)
+
+    # 같은 --workdir로 다시 돌려도 빈 캐시에서 빌드하도록
+    cache_dir = workdir / f"cache-{size}"
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.environ["EMBEDDING_CACHE_DIR"] = str(cache_dir)
+    service = IngredientSimilarityService(ollama_host=stub.url)
+    enhanced_routes.similarity_service = service
+
+    requests_before = stub.requests
+    started = time.perf_counter()
+    manifest = build_artifacts(service, path, rebuild_index=True, workers=args.workers)
+    setup["build_seconds"] = round(time.perf_counter() - started, 2)
+    setup["build_ollama_requests"] = stub.requests - requests_before
+    setup["ingredients"] = manifest["ingredients"]
+    setup["embeddings"] = manifest["embeddings"]
+    setup["ann_index"] = manifest["ann_index"]
+
+    queries = user_queries(args.queries, args.seed)
+    # 사용자 재료 임베딩도 미리 받아 측정 중에는 Ollama를 부르지 않게 함
+    service.get_embeddings(list(dict.fromkeys(item for query in queries for item in query)))
+
+    results = {}
+    pairs = [(query, recipes[(i * 7919) % len(recipes)]["ingredients"]) for i, query in enumerate(queries)]
+    results["match_user_ingredients_to_recipes"] = measure(
+        lambda pair: service.match_user_ingredients_to_recipes(*pair),
+        pairs, stub, args.min_time, args.max_calls * 20,
+    )
+    results["enhanced_recipe_matching"] = measure(
+        lambda query: service.enhanced_recipe_matching(
+            query, recipes, top_k=enhanced_routes.TOP_RECIPES, match_index=snapshot.match_index
+        ),
+        queries, stub, args.min_time, args.max_calls,
+    )
+
+    with TestClient(main.app) as client:
+        def post(query):
+            response = client.post("/api/v2/enhanced-recommend", json={"ingredients": query})
+            response.raise_for_status()
+
+        results["enhanced_recommend_route"] = measure(
+            post, queries, stub, args.min_time, args.max_calls, before=enhanced_recommend_cache.clear,
+        )
+
+    setup["peak_rss_mb"] = peak_rss_mb()
+    return {"setup": setup, "benchmarks": results}
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> int:
+    """기준 대비 변화를 출력하고 tolerance(비율)를 넘게 나빠진 지표 수를 돌려줍니다."""
+    regressions = 0
+    print(f"\n기준 {baseline['meta'].get('commit')} ({baseline['meta'].get('created_at')}) → "
+          f"현재 {current['meta'].get('commit')} ({current['meta'].get('created_at')})")
+    for size, result in current["sizes"].items():
+        old = baseline["sizes"].get(size)
+        if old is None:
+            print(f"[{size}] 기준에 없음")
+            continue
+        for name, stats in result["benchmarks"].items():
+            old_stats = old["benchmarks"].get(name)
+            if old_stats is None:
+                continue
+            changes = []
+            for metric in HIGHER_IS_WORSE + LOWER_IS_WORSE:
+                before, after = old_stats.get(metric), stats.get(metric)
+                if not before or after is None:
+                    continue
+                ratio = after / before - 1
+                worse = ratio > tolerance if metric in HIGHER_IS_WORSE else ratio < -tolerance
+                regressions += worse
+                changes.append(f"{metric} {before:g}→{after:g} ({ratio:+.0%}){' ❌' if worse else ''}")
+            print(f"[{size:>7}] {name:34} " + ", ".join(changes))
+    print(f"\n허용 범위 ±{tolerance:.0%}를 넘게 나빠진 지표: {regressions}개")
+    return regressions
+
+
+def print_summary(result: Dict):
+    for size, entry in result["sizes"].items():
+        setup = entry["setup"]
+        print(f"\n[{size}개 레시피] 재료 {setup['ingredients']}개, 임베딩 {setup['embeddings']}개, "
+              f"빌드 {setup['build_seconds']}초, 최대 RSS {setup['peak_rss_mb']} MB")
+        for name, stats in entry["benchmarks"].items():
+            print(f"  {name:34} {stats['throughput']:>10.1f}/s  p50 {stats['p50_ms']:>9.3f} ms  "
+                  f"p99 {stats['p99_ms']:>9.3f} ms  peak {stats['peak_alloc_mb']:>8.2f} MB  "
+                  f"ollama {stats['ollama_requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="유사도 매칭/추천 API 벤치마크")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"카탈로그 레시피 수 목록, 예: 46,1k,100k,1M (기본: {DEFAULT_SIZES})")
+    parser.add_argument("--queries", type=int, default=200, help="돌아가며 쓸 사용자 재료 목록 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=2.0, help="벤치마크마다 최소 측정 시간(초)")
+    parser.add_argument("--max-calls", type=int, default=500, help="카탈로그 전체 대상 벤치마크의 최대 호출 수")
+    parser.add_argument("--workers", type=int, help="산출물 빌드 시 정규화 프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="가짜 임베딩 차원수")
+    parser.add_argument("--latency", type=float, default=0.0, help="가짜 Ollama 요청당 지연(초)")
+    parser.add_argument("--workdir", type=Path, help="카탈로그/캐시를 만들 디렉터리 (기본: 임시 디렉터리)")
+    parser.add_argument("--output", type=Path, help="결과 JSON 저장 경로")
+    parser.add_argument("--load", type=Path, help="측정하지 않고 이 결과 JSON을 --compare 기준과 비교")
+    parser.add_argument("--compare", type=Path, help="비교할 기준 결과 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="회귀로 볼 변화 비율 (기본: 0.25)")
+    parser.add_argument("--verbose", action="store_true", help="백엔드 INFO 로그 출력")
+    args = parser.parse_args()
+
+    if args.load:
+        with open(args.load, "r", encoding="utf-8") as f:
+            result = json.load(f)
+    else:
+        result = run(args)
+        print_summary(result)
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"\n결과 저장: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        return 1 if compare(baseline, result, args.tolerance) else 0
+    return 0
+
+
+def run(args) -> Dict:
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="similarity-bench-"))
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {
+                "queries": args.queries, "seed": args.seed, "min_time": args.min_time,
+                "max_calls": args.max_calls, "dim": args.dim, "latency": args.latency,
+            },
+        },
+        "sizes": {},
+    }
+
+    with StubOllama(dim=args.dim, latency=args.latency) as stub:
+        os.environ["OLLAMA_HOST"] = stub.url
+        os.environ["EMBEDDING_CACHE_DIR"] = str(workdir / "cache-import")
+        if not args.verbose:
+            logging.disable(logging.WARNING)
+        for size in sizes:
+            print(f"{size}개 레시피 측정 중... ({workdir})", flush=True)
+            result["sizes"][str(size)] = bench_size(size, args, stub, workdir)
+    return result
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+"""
+Ollama 임베딩 API의 로컬 대역 (벤치마크/개발용).
+
+/api/embed(배치), /api/embeddings(단건), /api/tags를 흉내 냅니다. 임베딩은 텍스트의 글자
+1~2-gram마다 고정된 난수 벡터를 더해 만들기 때문에 항상 같은 값이 나오고, "마늘"과 "다진마늘"처럼
+글자를 공유하는 재료끼리는 코사인 유사도가 높습니다. latency로 요청마다 지연을 넣을 수 있습니다.
+
+    python stub_ollama.py --port 11434        # OLLAMA_HOST=http://localhost:11434 로 백엔드 실행
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_DIM = 768  # nomic-embed-text 차원수
+
+
+class StubEmbedder:
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+        self._grams: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _gram(self, gram: str) -> np.ndarray:
+        vector = self._grams.get(gram)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            with self._lock:
+                self._grams[gram] = vector
+        return vector
+
+    def embed(self, text: str) -> List[float]:
+        chars = "".join(str(text).split())
+        grams = list(chars) + [chars[i:i + 2] for i in range(len(chars) - 1)]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for gram in grams:
+            vector += self._gram(gram)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return np.round(vector, 6).tolist()
+
+
+class StubOllama:
+    """백그라운드 스레드에서 도는 가짜 Ollama 서버. with 문이나 start()/stop()으로 사용"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, dim: int = DEFAULT_DIM, latency: float = 0.0):
+        self.embedder = StubEmbedder(dim)
+        self.latency = latency
+        self.requests = 0
+        self.texts = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int, body: Dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._reply(200, {"models": [{"name": "nomic-embed-text:latest"}]})
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if stub.latency:
+                    time.sleep(stub.latency)
+                stub.requests += 1
+                if self.path == "/api/embed":
+                    texts = body.get("input", [])
+                    texts = [texts] if isinstance(texts, str) else texts
+                    stub.texts += len(texts)
+                    self._reply(200, {"model": body.get("model"), "embeddings": [stub.embedder.embed(t) for t in texts]})
+                elif self.path == "/api/embeddings":
+                    stub.texts += 1
+                    self._reply(200, {"embedding": stub.embedder.embed(body.get("prompt", ""))})
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOllama":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama 임베딩 API 대역 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="임베딩 차원수")
+    parser.add_argument("--latency", type=float, default=0.0, help="요청마다 넣을 지연(초)")
+    args = parser.parse_args()
+
+    stub = StubOllama(args.host, args.port, args.dim, args.latency)
+    print(f"stub ollama: {stub.url} (dim {args.dim})")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+벤치마크용 합성 한국어 레시피 카탈로그.
+
+실제 카탈로그(data/recipes_updated.json)의 재료 문자열과 동의어 그룹의 재료 이름을 섞어
+"다진 마늘 2큰술" 같은 문자열을 만듭니다. seed가 같으면 항상 같은 카탈로그가 나오므로
+커밋 간 결과를 비교할 수 있습니다. 크기가 실제 카탈로그 이하이면 실제 레시피를 그대로 씁니다.
+"""
+import json
+import random
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from synonym_matcher import KOREAN_INGREDIENT_GROUPS
+
+REAL_CATALOG = Path(__file__).resolve().parent.parent / "data" / "recipes_updated.json"
+
+PREFIXES = ["", "", "", "다진 ", "냉동 ", "국산 ", "손질한 ", "채 썬 ", "데친 ", "말린 "]
+AMOUNTS = ["1개", "2개", "반 개", "100g", "200g", "300g", "1큰술", "2큰술", "1작은술", "약간", "한 줌", "1컵", "1/2컵", "적당량"]
+DISHES = ["볶음", "조림", "찌개", "국", "무침", "구이", "덮밥", "전", "샐러드", "파스타", "죽", "탕"]
+DIFFICULTIES = ["초급", "초급", "중급", "고급"]
+
+
+def load_real_catalog() -> List[Dict]:
+    with open(REAL_CATALOG, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ingredient_vocabulary(real: Optional[List[Dict]] = None) -> List[str]:
+    """동의어 그룹의 재료 이름 + 실제 카탈로그 재료 문자열의 첫 단어 (중복 제거, 순서 고정)"""
+    real = load_real_catalog() if real is None else real
+    names = [name for group in KOREAN_INGREDIENT_GROUPS.values() for name in group]
+    names += [str(text).split()[0] for recipe in real for text in recipe.get("ingredients", []) if str(text).split()]
+    return list(dict.fromkeys(names))
+
+
+def iter_recipes(size: int, seed: int = 0) -> Iterator[Dict]:
+    """size개 레시피를 하나씩 만듭니다 (1M개도 한꺼번에 메모리에 올리지 않도록)"""
+    real = load_real_catalog()
+    if size <= len(real):
+        yield from real[:size]
+        return
+    yield from real
+
+    vocabulary = ingredient_vocabulary(real)
+    rng = random.Random(seed)
+    for number in range(len(real), size):
+        names = rng.sample(vocabulary, rng.randint(4, 10))
+        ingredients = [f"{rng.choice(PREFIXES)}{name} {rng.choice(AMOUNTS)}" for name in names]
+        dish = f"{names[0]}{rng.choice(DISHES)} {number}"
+        yield {
+            "name": dish,
+            "ingredients": ingredients,
+            "time": rng.choice([10, 15, 20, 30, 40, 60, 90]),
+            "difficulty": rng.choice(DIFFICULTIES),
+            "steps": [f"1. {names[0]}을(를) 손질합니다.", f"2. 나머지 재료와 함께 {dish}을(를) 완성합니다."],
+        }
+
+
+def write_catalog(path: Path, size: int, seed: int = 0) -> Path:
+    """합성 카탈로그를 JSON 배열로 스트리밍 저장"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, recipe in enumerate(iter_recipes(size, seed)):
+            f.write(",\n" if i else "\n")
+            json.dump(recipe, f, ensure_ascii=False)
+        f.write("\n]\n")
+    return path
+
+
+def user_queries(count: int, seed: int = 0, min_items: int = 2, max_items: int = 6) -> List[List[str]]:
+    """사용자 재료 목록 count개. 일부는 동의어/수식어가 붙은 형태로 넣어 유사도 매칭도 거치게 함"""
+    vocabulary = ingredient_vocabulary()
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(count):
+        names = rng.sample(vocabulary, rng.randint(min_items, max_items))
+        queries.append([f"{rng.choice(PREFIXES)}{name}".strip() for name in names])
+    return queries
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
+import metrics
 from .services import embed_query, search_candidates, fill_missing_meta, rerank_recipes, parse_recipes
 
 router = APIRouter()
@@ -12,6 +13,7 @@ class RecommendRequest(BaseModel):
     difficulty_max: int = Field(3, description="허용 최대 난이도 1~5")
 
 class Recipe(BaseModel):
+    id: Optional[str] = Field(None, description="백엔드 카탈로그와 공유하는 안정적인 레시피 ID")
     title: str
     summary: str
     cook_time_min: int
@@ -19,8 +21,10 @@ class Recipe(BaseModel):
 
 @router.post("/recommend", response_model=List[Recipe])
 def recommend(req: RecommendRequest):
-    vector = embed_query(req.ingredients)
-    candidates = search_candidates(vector)
+    with metrics.time_stage("query_embedding"):
+        vector = embed_query(req.ingredients)
+    with metrics.time_stage("candidate_search"):
+        candidates = search_candidates(vector)
 
     filtered = []
     for r in candidates:
@@ -30,5 +34,6 @@ def recommend(req: RecommendRequest):
     if not filtered:
         raise HTTPException(404, "조건을 만족하는 레시피가 없습니다.")
 
-    reranked_text = rerank_recipes(filtered[:25], req.ingredients)
+    with metrics.time_stage("rerank"):
+        reranked_text = rerank_recipes(filtered[:25], req.ingredients)
     return parse_recipes(reranked_text)
@@ -3,6 +3,12 @@ import hashlib
 from pathlib import Path
 from typing import List, Dict
 
+from ingredient_normalizer import normalizer
+from recipe_ids import make_recipe_id
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
 def load_recipes() -> List[Dict]:
 
     try:
@@ -12,7 +18,7 @@ def load_recipes() -> List[Dict]:
         with open(data_path, "r", encoding="utf-8") as f:
             return json.load(f)
     except Exception as e:
-        print(f"레시피 로딩 오류: {e}")
+        logger.error(f"레시피 로딩 오류: {e}")
         # 기본 레시피 반환
         return [
             {
@@ -61,6 +67,7 @@ def search_candidates(embedded_query: List[float]) -> List[Dict]:
     candidates = []
     for recipe in recipes:
         candidates.append({
+            "id": recipe.get("id") or make_recipe_id(recipe["name"]),
             "name": recipe["name"],
             "ingredients": recipe["ingredients"],
             "time": recipe.get("time", 30),
@@ -104,16 +111,20 @@ def calculate_ingredient_match_score(recipe_ingredients: List[str], user_ingredi
     if not recipe_ingredients or not user_ingredients:
         return 0.0
     
-    matches = 0
+    # 한쪽 이름이 다른 쪽에 포함되거나("고추" ↔ "청양고추"), 정규 재료 ID가 겹치면(표기 차이/대체 재료) 일치
+    # 재료 문자열별 정규 ID는 메모되므로 같은 레시피 파일에 대해서는 집합 비교만 남음
     user_ingredients_lower = [ing.lower() for ing in user_ingredients]
+    user_ids = set()
+    for user_ing in user_ingredients:
+        user_ids |= normalizer.query_ids(user_ing)
     
+    matches = 0
     for recipe_ing in recipe_ingredients:
         recipe_ing_lower = recipe_ing.lower()
-        for user_ing in user_ingredients_lower:
-            if user_ing in recipe_ing_lower or recipe_ing_lower in user_ing:
-                matches += 1
-                break
-    
+        if normalizer.ingredient_ids(recipe_ing) & user_ids or any(
+            user_ing in recipe_ing_lower or recipe_ing_lower in user_ing for user_ing in user_ingredients_lower
+        ):
+            matches += 1
     return matches / len(recipe_ingredients)
 
 def parse_recipes(recipe_list: List[Dict]) -> List[Dict]:
@@ -122,6 +133,7 @@ def parse_recipes(recipe_list: List[Dict]) -> List[Dict]:
     
     for recipe in recipe_list:
         parsed_recipe = {
+            "id": recipe.get("id") or make_recipe_id(recipe.get("name", "Unknown")),
             "title": recipe.get("name", "Unknown"),
             "summary": f"{recipe.get('name', 'Unknown')} - {recipe.get('difficulty', '중급')} 난이도",
             "cook_time_min": recipe.get("cook_time_min", recipe.get("time", 30)),
@@ -3,17 +3,32 @@ import sys
 import os
 
 # Docker 컨테이너 내 경로 설정
+# (공유 모듈 metrics.py/structured_logging.py/ingredient_normalizer.py/recipe_ids.py는 이미지의 /app에 복사되고, 로컬 실행 시에는 저장소의 backend 폴더에서 import)
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "backend")
+if os.path.isdir(BACKEND_DIR) and BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
 from fastapi import FastAPI
+import metrics
+from structured_logging import RequestIdMiddleware, setup_logging
 from .llm.routes import router as llm_router
 
-app = FastAPI(title="LLM Recipe Recommender")
+setup_logging("llm")
+metrics.set_service("llm")
+
+app = FastAPI(title="LLM Recipe Recommender", default_response_class=metrics.TimedJSONResponse)
 
+app.add_middleware(RequestIdMiddleware)
 app.include_router(llm_router)
 
 @app.get("/health")
 def health():
     return {"status": "ok", "service": "LLM Recipe Recommender"}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return metrics.metrics_response()
+
 @app.get("/")
 def root():
     return {"message": "LLM Recipe Recommender is running!"}
@@ -4,34 +4,50 @@ import json
 import logging
 import os
 import re
+import sys
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from pydantic import BaseModel
 from PIL import Image
 from pathlib import Path
 import uvicorn
 
+# 번역 인덱스/메트릭/로깅 모듈은 backend 폴더의 파일을 공유합니다
+# (Docker 이미지에는 /app에 복사되고, 로컬 실행 시에는 저장소의 backend 폴더에서 import)
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+if BACKEND_DIR.exists() and str(BACKEND_DIR) not in sys.path:
+    sys.path.append(str(BACKEND_DIR))
+
+import metrics
+from ingredient_translation import IngredientTranslator, load_translator
+from structured_logging import RequestIdMiddleware, sampled, setup_logging
+
+setup_logging("vlm")
+metrics.set_service("vlm")
 logger = logging.getLogger("vlm")
-logging.basicConfig(level=logging.INFO)
 
 app = FastAPI(title="VLM Food Recognition API")
+# 백엔드가 보낸 X-Request-ID를 로그에 남겨 요청 단위로 추적
+app.add_middleware(RequestIdMiddleware)
 
 MAP_PATH = Path("/app/data/ingredient_kor_map.json")
 if not MAP_PATH.exists():
     MAP_PATH = Path(__file__).parent.parent.parent / "data" / "ingredient_kor_map.json"
 
-def load_ingredient_map():
+def load_ingredient_translator() -> IngredientTranslator:
     try:
         logger.info(f"Loading ingredient map from: {MAP_PATH.resolve()}")
-        with open(MAP_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_translator(MAP_PATH)
     except Exception as e:
         logger.error(f"한글 번역 맵 로딩 실패: {e}")
-        return {}
+        return IngredientTranslator()
 
-ingredient_kor_map = load_ingredient_map()
+ingredient_translator = load_ingredient_translator()
 
 def translate_ingredients(ingredients: list[str]) -> list[str]:
-    return [ingredient_kor_map.get(i.lower(), i) for i in ingredients]
+    return ingredient_translator.translate_many(ingredients)
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 class ImageRequest(BaseModel):
     image_base64: str
@@ -135,18 +151,21 @@ async def recognize(file: UploadFile = File(...)):
     if not file.content_type or not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="이미지 파일만 업로드 가능합니다.")
 
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="파일 크기는 10MB 이하여야 합니다.")
-
     tmp_path = f"tmp_upload_{asyncio.current_task().get_name() if asyncio.current_task() else 'default'}.jpg"
     resized_path = None
 
     try:
+        # 업로드 전체를 메모리에 올리지 않고 청크 단위로 임시 파일에 기록
+        written = 0
         with open(tmp_path, "wb") as f:
-            f.write(content)
-
-        resized_path = resize_image(tmp_path)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=400, detail="파일 크기는 10MB 이하여야 합니다.")
+                f.write(chunk)
+
+        with metrics.time_stage("image_resize"):
+            resized_path = resize_image(tmp_path)
         return await process_image(resized_path)
     finally:
         for path in [tmp_path, resized_path]:
@@ -163,7 +182,7 @@ async def recognize_json(req: ImageRequest):
 
     try:
         img_data = base64.b64decode(req.image_base64)
-        if len(img_data) > 10 * 1024 * 1024:
+        if len(img_data) > MAX_UPLOAD_BYTES:
             raise HTTPException(status_code=400, detail="파일 크기는 10MB 이하여야 합니다.")
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid base64 image data")
@@ -172,7 +191,8 @@ async def recognize_json(req: ImageRequest):
         with open(tmp_path, "wb") as f:
             f.write(img_data)
 
-        resized_path = resize_image(tmp_path)
+        with metrics.time_stage("image_resize"):
+            resized_path = resize_image(tmp_path)
         return await process_image(resized_path)
     finally:
         for path in [tmp_path, resized_path]:
@@ -209,9 +229,12 @@ async def process_image(tmp_path: str):
 
     for attempt in range(3):
         try:
-            logger.info(f"시도 {attempt + 1}/3: 모델 호출 시작")
-            resp = await call_with_timeout(messages)
-            logger.info(f"시도 {attempt + 1}/3: 모델 호출 성공")
+            logger.debug("시도 %d/3: 모델 호출 시작", attempt + 1)
+            if attempt > 0:
+                metrics.count_retry("vision_model")
+            with metrics.time_stage("vision_model"):
+                resp = await call_with_timeout(messages)
+            logger.debug("시도 %d/3: 모델 호출 성공", attempt + 1)
             break
         except Exception as e:
             logger.error(f"시도 {attempt + 1}/3: 오류 발생 - {e}")
@@ -226,11 +249,13 @@ async def process_image(tmp_path: str):
     if resp is None:
         # 모든 시도 실패시 더미 데이터 사용
         logger.info("응답 없음, 더미 데이터 사용")
+        metrics.count_fallback("vision_model", "no_response")
         ingredients = extract_ingredients_from_image_name(tmp_path)
         return {"ingredients": translate_ingredients(ingredients)}
 
     content = resp.get("message", {}).get("content", "")
-    logger.info(f"Raw response content: {content}")
+    if sampled(logger):
+        logger.debug("Raw response content: %s", content)
     content = content.replace("\n", "").replace("\r", "").strip()
 
     json_patterns = [
@@ -259,10 +284,12 @@ async def process_image(tmp_path: str):
         
         if food_words:
             logger.info(f"단어에서 음식 재료 추출: {food_words[:5]}")
+            metrics.count_fallback("response_parsing", "word_extraction")
             return {"ingredients": translate_ingredients(food_words[:5])}
         
         # 파싱 실패시 더미 데이터 사용
         logger.info("파싱 실패, 더미 데이터 사용")
+        metrics.count_fallback("response_parsing", "dummy_data")
         ingredients = extract_ingredients_from_image_name(tmp_path)
         return {"ingredients": translate_ingredients(ingredients)}
 
@@ -276,6 +303,7 @@ async def process_image(tmp_path: str):
     except Exception as e:
         logger.error(f"JSON 파싱 오류: {e} / 추출된 문자열: {json_str}")
         # 파싱 실패시 더미 데이터 사용
+        metrics.count_fallback("response_parsing", "dummy_data")
         ingredients = extract_ingredients_from_image_name(tmp_path)
 
     return {"ingredients": translate_ingredients(ingredients)}
@@ -284,6 +312,10 @@ async def process_image(tmp_path: str):
 async def health_check():
     return {"status": "healthy", "message": "VLM API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return metrics.metrics_response()
+
 @app.get("/model-status")
 async def model_status():
     try: